@@ -0,0 +1,320 @@
+"""
+Load test for the Relationship Memory API against a local mock LLM.
+
+Starts backend/bench/mock_llm.py and backend.main:app as subprocesses
+(the app's OpenAI client is pointed at the mock via OPENAI_BASE_URL),
+drives it with a configurable concurrency and question mix across the
+accounts in ACCOUNT_REGISTRY, and prints a JSON report:
+
+    python -m backend.bench.load_test --concurrency 200 --requests 5000
+    python -m backend.bench.load_test --endpoint stream --mix unique --no-cache
+    python -m backend.bench.load_test --target-url http://localhost:8000   # existing server
+
+Report fields: rps, latency_ms {p50, p95, p99, mean, max}, ttft_ms
+(stream only), errors and errors_by_kind.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+CANONICAL_QUESTIONS = [
+    "What did we agree on payment terms?",
+    "What are the red flags to watch?",
+    "Who is the key contact and how do they like to communicate?",
+    "What's at stake with this account?",
+    "How should I handle my first conversation?",
+    "What is the current relationship health?",
+    "Summarize the delivery and logistics history.",
+    "What upside is there with this account?",
+]
+
+
+# --------------------------------------------------------------------
+# Process management
+# --------------------------------------------------------------------
+def _start(module_app: str, port: int, env: Dict[str, str], workers: int = 1) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", module_app,
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, env={**os.environ, **env})
+
+
+def _wait_ready(url: str, proc: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"process for {url} exited with code {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def _stop(proc: Optional[subprocess.Popen]) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# --------------------------------------------------------------------
+# Workload
+# --------------------------------------------------------------------
+def _question(mix: str, questions: List[str], seq: int) -> str:
+    base = random.choice(questions)
+    if mix == "unique" or (mix == "mixed" and random.random() < 0.2):
+        # defeat the answer cache / coalescing with a unique suffix
+        return f"{base} (ref {seq})"
+    return base
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def _summary_ms(values: List[float]) -> Optional[dict]:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "p50": round(_percentile(values, 50) * 1000, 2),
+        "p95": round(_percentile(values, 95) * 1000, 2),
+        "p99": round(_percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+    }
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, body: dict) -> tuple:
+    """Returns (ok, latency_s, ttft_s or None, error_kind or None)."""
+    start = time.perf_counter()
+    try:
+        if endpoint == "stream":
+            ttft = None
+            async with client.stream("POST", "/ask/stream", json=body) as resp:
+                if resp.status_code != 200:
+                    return False, time.perf_counter() - start, None, f"http_{resp.status_code}"
+                async for line in resp.aiter_lines():
+                    if line.startswith("event: token") and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif line.startswith("event: error"):
+                        return False, time.perf_counter() - start, ttft, "stream_error"
+            return True, time.perf_counter() - start, ttft, None
+
+        resp = await client.post("/ask", json=body)
+        if resp.status_code != 200:
+            return False, time.perf_counter() - start, None, f"http_{resp.status_code}"
+        return True, time.perf_counter() - start, None, None
+    except httpx.HTTPError as exc:
+        return False, time.perf_counter() - start, None, type(exc).__name__
+
+
+async def run_load(
+    base_url: str,
+    endpoint: str,
+    concurrency: int,
+    total_requests: int,
+    duration: Optional[float],
+    companies: List[str],
+    questions: List[str],
+    mix: str,
+) -> dict:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors: Counter = Counter()
+    seq = iter(range(10**12))
+    issued = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    started = time.perf_counter()
+    stop_at = started + duration if duration else None
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+
+        async def worker():
+            nonlocal issued
+            while True:
+                if stop_at is not None:
+                    if time.perf_counter() >= stop_at:
+                        return
+                elif issued >= total_requests:
+                    return
+                issued += 1
+                n = next(seq)
+                body = {
+                    "question": _question(mix, questions, n),
+                    "company_id": random.choice(companies),
+                }
+                ok, latency, ttft, error = await _one_request(client, endpoint, body)
+                if ok:
+                    latencies.append(latency)
+                    if ttft is not None:
+                        ttfts.append(ttft)
+                else:
+                    errors[error] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - started
+    completed = len(latencies)
+    return {
+        "requests": completed + sum(errors.values()),
+        "completed": completed,
+        "errors": sum(errors.values()),
+        "errors_by_kind": dict(errors),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _summary_ms(latencies),
+        "ttft_ms": _summary_ms(ttfts),
+    }
+
+
+# --------------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test /ask against a mock LLM.")
+    parser.add_argument("--endpoint", choices=["ask", "stream"], default="ask")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="run for N seconds instead")
+    parser.add_argument("--mix", choices=["canonical", "unique", "mixed"], default="mixed",
+                        help="canonical: repeated questions; unique: never repeats; mixed: 80/20")
+    parser.add_argument("--questions-file", help="one question per line (default: built-in set)")
+    parser.add_argument("--companies", help="comma-separated company_ids (default: all in ACCOUNT_REGISTRY)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+
+    parser.add_argument("--target-url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra env for the app process (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the answer cache in the app")
+
+    parser.add_argument("--mock-port", type=int, default=18001)
+    parser.add_argument("--mock-latency-ms", type=float, default=400)
+    parser.add_argument("--mock-jitter-ms", type=float, default=100)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=80)
+    parser.add_argument("--mock-completion-tokens", type=int, default=60)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    if args.questions_file:
+        with open(args.questions_file, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = CANONICAL_QUESTIONS
+    if args.companies:
+        companies = [c.strip() for c in args.companies.split(",") if c.strip()]
+    else:
+        from backend.services.qa_service import ACCOUNT_REGISTRY
+        companies = list(ACCOUNT_REGISTRY)
+
+    mock_proc = app_proc = None
+    # everything the app writes (briefings, graph store, portfolio index)
+    # goes here, never into the real backend/data
+    scratch = tempfile.TemporaryDirectory(prefix="load_test_")
+    try:
+        if args.target_url:
+            base_url = args.target_url.rstrip("/")
+        else:
+            mock_proc = _start("backend.bench.mock_llm:app", args.mock_port, {
+                "MOCK_LLM_LATENCY_MS": str(args.mock_latency_ms),
+                "MOCK_LLM_JITTER_MS": str(args.mock_jitter_ms),
+                "MOCK_LLM_TOKENS_PER_SEC": str(args.mock_tokens_per_sec),
+                "MOCK_LLM_COMPLETION_TOKENS": str(args.mock_completion_tokens),
+                "MOCK_LLM_ERROR_RATE": str(args.mock_error_rate),
+            })
+            _wait_ready(f"http://127.0.0.1:{args.mock_port}/health", mock_proc)
+
+            app_env = {
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+                "OPENAI_API_KEY": "bench",
+                # the harness is a single client; don't measure the rate limiter
+                "RATE_LIMIT_CLIENT_RPS": "0",
+                "RATE_LIMIT_COMPANY_RPS": "0",
+                "BRIEFINGS_DIR": os.path.join(scratch.name, "briefings"),
+                "KG_STORE_PATH": os.path.join(scratch.name, "graph.db"),
+                "KNOWLEDGE_GRAPH_DIR": os.path.join(scratch.name, "graphs"),
+                "PORTFOLIO_INDEX_PATH": os.path.join(scratch.name, "portfolio.json"),
+            }
+            if args.no_cache:
+                app_env["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+            for item in args.app_env:
+                key, _, value = item.partition("=")
+                app_env[key] = value
+            app_proc = _start("backend.main:app", args.app_port, app_env, args.app_workers)
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            _wait_ready(f"{base_url}/metrics", app_proc)
+
+        if args.warmup:
+            asyncio.run(run_load(base_url, args.endpoint, min(args.concurrency, args.warmup),
+                                 args.warmup, None, companies, questions, args.mix))
+
+        result = asyncio.run(run_load(
+            base_url, args.endpoint, args.concurrency, args.requests, args.duration,
+            companies, questions, args.mix,
+        ))
+    finally:
+        _stop(app_proc)
+        _stop(mock_proc)
+        scratch.cleanup()
+
+    report = {
+        "config": {
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "mix": args.mix,
+            "companies": companies,
+            "no_cache": args.no_cache,
+            "app_workers": args.app_workers,
+            "target_url": args.target_url,
+            "mock": {
+                "latency_ms": args.mock_latency_ms,
+                "jitter_ms": args.mock_jitter_ms,
+                "tokens_per_sec": args.mock_tokens_per_sec,
+                "completion_tokens": args.mock_completion_tokens,
+                "error_rate": args.mock_error_rate,
+            },
+        },
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# --------------------------------------------------------------------
+# Mock OpenAI chat-completions server (for benchmarks only)
+# --------------------------------------------------------------------
+# Implements POST /v1/chat/completions (plain and stream=True) closely
+# enough for the openai SDK. Behaviour is set through env vars so the
+# load-test harness can start it as a subprocess:
+#
+#   MOCK_LLM_LATENCY_MS         time to first token (default 400)
+#   MOCK_LLM_JITTER_MS          +/- uniform jitter on the latency (default 100)
+#   MOCK_LLM_TOKENS_PER_SEC     generation speed after first token (default 80)
+#   MOCK_LLM_COMPLETION_TOKENS  tokens per answer (default 60)
+#   MOCK_LLM_ERROR_RATE         fraction of requests failing (default 0.0)
+#   MOCK_LLM_ERROR_STATUS       status code for failures (default 500)
+
+LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", 400))
+JITTER_MS = float(os.getenv("MOCK_LLM_JITTER_MS", 100))
+TOKENS_PER_SEC = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", 80))
+COMPLETION_TOKENS = int(os.getenv("MOCK_LLM_COMPLETION_TOKENS", 60))
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", 0.0))
+ERROR_STATUS = int(os.getenv("MOCK_LLM_ERROR_STATUS", 500))
+
+app = FastAPI(title="Mock LLM")
+
+_WORDS = (
+    "Net 45 was agreed verbally but Martin still expects Net 30 to be revisited "
+    "before Q1 so confirm the Thursday dispatch window first and keep updates short"
+).split()
+
+
+def _prompt_tokens(messages) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+def _first_token_delay() -> float:
+    return max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000
+
+
+def _tokens():
+    for i in range(COMPLETION_TOKENS - 1):
+        yield _WORDS[i % len(_WORDS)] + " "
+    yield "Why this matters: renewal risk."
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": _prompt_tokens(body.get("messages", [])),
+        "completion_tokens": COMPLETION_TOKENS,
+        "total_tokens": _prompt_tokens(body.get("messages", [])) + COMPLETION_TOKENS,
+    }
+
+    if random.random() < ERROR_RATE:
+        await asyncio.sleep(_first_token_delay() / 2)
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"message": "mock upstream error", "type": "server_error"}},
+        )
+
+    if not body.get("stream"):
+        await asyncio.sleep(_first_token_delay() + COMPLETION_TOKENS / TOKENS_PER_SEC)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(_tokens())},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    async def events():
+        await asyncio.sleep(_first_token_delay())
+        for token in _tokens():
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(1 / TOKENS_PER_SEC)
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": usage,
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from backend.kg.export import pack, write_gz, write_viewer
+from backend.kg.graph import build_graph
+from backend.kg.layout import KG_LAYOUT_SEED, communities, compute_layout
+from backend.kg.store import KG_STORE_PATH, GraphDB
+
+
+# --------------------------------------------------------------------
+# Offline graph analytics, precomputed per account
+# --------------------------------------------------------------------
+# Over the whole stored graph (store.py), once per run:
+#
+#   degree       undirected, over all accounts' relations
+#   pagerank     NumPy power iteration on the directed graph
+#   betweenness  networkx, sampled over KG_BETWEENNESS_SAMPLES sources
+#                on large graphs
+#   community    Louvain (layout.communities)
+#
+# then, per account: its company entity (the ORG named like the
+# account, else its best-connected ORG), the ego subgraph within
+# KG_EGO_RADIUS hops (nearest, then most central, nodes first, at most
+# KG_EGO_MAX_NODES), the most connected people in it, and the ego graph
+# laid out in the shared viewer's format (export.py). Written to
+#
+#   KG_ANALYTICS_DIR/accounts/<company_id>.<etag>.json          analytics + ego graph
+#   KG_ANALYTICS_DIR/accounts/<company_id>.<etag>.graph.json.gz viewer data
+#   KG_ANALYTICS_DIR/accounts/<company_id>.<etag>.details.json.gz
+#   KG_ANALYTICS_DIR/viewer/                                    the static viewer
+#   KG_ANALYTICS_DIR/manifest.json              company_id -> ETags + file names
+#
+# and served by /accounts/{company_id}/graph (services/graph_analytics.py).
+# Account files are named by content and never rewritten in place: a run
+# only becomes visible when manifest.json is swapped, so a file is always
+# served under its own ETag. Files referenced by neither the new nor the
+# previous manifest are removed afterwards. A run over all accounts
+# rebuilds the manifest (accounts gone from the store drop out); --company
+# updates just those entries.
+#
+#   python -m backend.kg.analytics --radius 2
+
+KG_ANALYTICS_DIR = os.getenv(
+    "KG_ANALYTICS_DIR", str(Path(__file__).resolve().parent.parent / "data" / "graph_analytics")
+)
+KG_EGO_RADIUS = int(os.getenv("KG_EGO_RADIUS", 2))
+KG_EGO_MAX_NODES = int(os.getenv("KG_EGO_MAX_NODES", 150))
+KG_TOP_PEOPLE = int(os.getenv("KG_TOP_PEOPLE", 10))
+KG_BETWEENNESS_SAMPLES = int(os.getenv("KG_BETWEENNESS_SAMPLES", 200))
+
+# what is written per account (the manifest holds an ETag for each)
+ACCOUNT_FILES = {"analytics": ".json", "graph": ".graph.json.gz", "details": ".details.json.gz"}
+
+_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def pagerank(n: int, edges, alpha: float = 0.85, tol: float = 1e-10, max_iter: int = 100):
+    """PageRank of n nodes over an (m, 2) array of directed (source, target) edges."""
+    import numpy as np
+
+    if n == 0:
+        return np.zeros(0)
+    rank = np.full(n, 1.0 / n)
+    if not len(edges):
+        return rank
+    src, dst = edges[:, 0], edges[:, 1]
+    out_degree = np.bincount(src, minlength=n).astype(float)
+    dangling = out_degree == 0
+    for _ in range(max_iter):
+        flow = np.bincount(dst, weights=rank[src] / out_degree[src], minlength=n)
+        new = alpha * (flow + rank[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(new - rank).sum() < n * tol:
+            return new
+        rank = new
+    return rank
+
+
+def centrality(G, seed: int = KG_LAYOUT_SEED, samples: int = KG_BETWEENNESS_SAMPLES) -> Dict[str, dict]:
+    """node -> {degree, pagerank, betweenness, community} over the whole graph."""
+    import networkx as nx
+    import numpy as np
+
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    directed = np.array([(index[u], index[v]) for u, v in G.edges() if u != v], dtype=int).reshape(-1, 2)
+    ranks = pagerank(len(nodes), directed)
+
+    U = nx.Graph(G.to_undirected())
+    U.remove_edges_from(nx.selfloop_edges(U))
+    k = samples if 0 < samples < U.number_of_nodes() else None
+    between = nx.betweenness_centrality(U, k=k, seed=seed, normalized=True)
+    community = communities(G, seed)
+    return {
+        node: {
+            "degree": U.degree(node),
+            "pagerank": round(float(ranks[index[node]]), 6),
+            "betweenness": round(float(between.get(node, 0.0)), 6),
+            "community": community.get(node, -1),
+        }
+        for node in nodes
+    }
+
+
+def company_entity(company_id: str, kg: dict, metrics: Dict[str, dict]) -> Optional[str]:
+    """The account's own entity: the ORG named like the account, else its best-connected ORG."""
+    key = _ALNUM_RE.sub("", company_id.lower())
+    orgs = [e for e in kg["entities"] if e.get("label") == "ORG"] or kg["entities"]
+    if not orgs:
+        return None
+    for e in orgs:
+        name = _ALNUM_RE.sub("", (e.get("name") or "").lower())
+        if key and name and (name.startswith(key) or key.startswith(name)):
+            return e["id"]
+    return max(orgs, key=lambda e: (metrics.get(e["id"], {}).get("degree", 0), e["id"]))["id"]
+
+
+def ego_nodes(U, center: str, radius: int, metrics: Dict[str, dict], max_nodes: int):
+    """(node -> distance, truncated): BFS to radius; nearest, then highest PageRank, kept."""
+    import networkx as nx
+
+    distance = nx.single_source_shortest_path_length(U, center, cutoff=radius)
+    ranked = sorted(distance, key=lambda n: (distance[n], -metrics[n]["pagerank"], str(n)))
+    kept = ranked[:max_nodes]
+    return {n: distance[n] for n in kept}, len(ranked) > len(kept)
+
+
+def _ego_kg(full_kg: dict, nodes: Dict[str, int]) -> dict:
+    return {
+        "entities": [e for e in full_kg["entities"] if e["id"] in nodes],
+        "relations": [r for r in full_kg["relations"] if r["head"] in nodes and r["tail"] in nodes],
+    }
+
+
+def account_analytics(company_id: str, center: str, ego: dict, distance: Dict[str, int],
+                      truncated: bool, metrics: Dict[str, dict], radius: int) -> dict:
+    entities = []
+    for e in ego["entities"]:
+        m = metrics[e["id"]]
+        entities.append({
+            "id": e["id"], "name": e.get("name", ""), "label": e.get("label", ""),
+            "distance": distance[e["id"]], **m,
+        })
+    entities.sort(key=lambda e: (e["distance"], -e["pagerank"], e["id"]))
+    people = [e for e in entities if e["label"] == "PERSON" and e["id"] != center]
+    people.sort(key=lambda e: (-e["degree"], -e["pagerank"], e["id"]))
+    sizes: Dict[int, int] = {}
+    for e in entities:
+        sizes[e["community"]] = sizes.get(e["community"], 0) + 1
+    by_id = {e["id"]: e for e in entities}
+    return {
+        "company_id": company_id,
+        "center": {"id": center, "name": by_id[center]["name"]},
+        "radius": radius,
+        "stats": {"nodes": len(entities), "relations": len(ego["relations"]), "truncated": truncated},
+        "top_people": [
+            {k: p[k] for k in ("id", "name", "degree", "pagerank", "betweenness", "distance")}
+            for p in people[:KG_TOP_PEOPLE]
+        ],
+        "communities": [
+            {"id": cid, "size": size} for cid, size in sorted(sizes.items(), key=lambda c: (-c[1], c[0]))
+        ],
+        "entities": entities,
+        "relations": [
+            {k: r.get(k) for k in ("head", "rel", "tail", "page")} for r in ego["relations"]
+        ],
+    }
+
+
+def _write_json(path: Path, data) -> str:
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    os.replace(tmp, path)
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _etag(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:32]
+
+
+def _content_addressed(written: Path, company_id: str, suffix: str) -> Tuple[str, str]:
+    """Move a freshly written file to <company_id>.<etag><suffix>; (etag, file name)."""
+    etag = _etag(written)
+    name = f"{company_id}.{etag}{suffix}"
+    os.replace(written, written.parent / name)
+    return etag, name
+
+
+def _referenced(manifest: dict) -> Set[str]:
+    return {name for entry in manifest.values() for name in entry.get("files", {}).values()}
+
+
+def run(db: GraphDB, out_dir: str = KG_ANALYTICS_DIR, radius: int = KG_EGO_RADIUS,
+        max_nodes: int = KG_EGO_MAX_NODES, company_ids: Optional[List[str]] = None) -> dict:
+    """Compute and persist analytics for company_ids (default: every account in the store)."""
+    import networkx as nx
+
+    started = time.perf_counter()
+    full_kg = db.dump()
+    G = build_graph(full_kg)
+    metrics = centrality(G)
+    U = nx.Graph(G.to_undirected())
+    analysed = time.perf_counter() - started
+
+    root = Path(out_dir)
+    accounts_dir = root / "accounts"
+    accounts_dir.mkdir(parents=True, exist_ok=True)
+    write_viewer(str(root / "viewer"))
+    manifest_path = root / "manifest.json"
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    # all accounts: start over, so accounts no longer in the store drop out
+    manifest = dict(previous) if company_ids else {}
+
+    skipped = []
+    for company_id in company_ids or db.companies():
+        kg = db.company_graph(company_id)
+        center = company_entity(company_id, kg, metrics) if kg else None
+        if center is None or center not in U:
+            skipped.append(company_id)
+            continue
+        distance, truncated = ego_nodes(U, center, radius, metrics, max_nodes)
+        ego = _ego_kg(full_kg, distance)
+        summary = account_analytics(company_id, center, ego, distance, truncated, metrics, radius)
+
+        G_ego = build_graph(ego)
+        graph, details = pack(G_ego, compute_layout(G_ego))
+        graph["details"] = "details"  # /accounts/{company_id}/graph/details, relative to the data URL
+        written = {kind: accounts_dir / f".{company_id}{suffix}" for kind, suffix in ACCOUNT_FILES.items()}
+        _write_json(written["analytics"], summary)
+        write_gz(written["graph"], graph)
+        write_gz(written["details"], details)
+        entry: dict = {"files": {}, "nodes": summary["stats"]["nodes"]}
+        for kind, suffix in ACCOUNT_FILES.items():
+            entry[kind], entry["files"][kind] = _content_addressed(written[kind], company_id, suffix)
+        manifest[company_id] = entry
+
+    _write_json(manifest_path, manifest)  # last: readers see complete account files
+    # keep the previous run's files too: a reader may not have reloaded the manifest yet
+    keep = _referenced(manifest) | _referenced(previous)
+    for path in accounts_dir.iterdir():
+        if path.is_file() and path.name not in keep and not path.name.startswith("."):
+            path.unlink(missing_ok=True)
+    return {
+        "nodes": G.number_of_nodes(),
+        "relations": G.number_of_edges(),
+        "accounts": len(manifest),
+        "skipped": skipped,
+        "analysis_s": round(analysed, 3),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute per-account graph analytics.")
+    parser.add_argument("--store", default=KG_STORE_PATH)
+    parser.add_argument("--out", default=KG_ANALYTICS_DIR)
+    parser.add_argument("--radius", type=int, default=KG_EGO_RADIUS)
+    parser.add_argument("--max-nodes", type=int, default=KG_EGO_MAX_NODES)
+    parser.add_argument("--company", action="append", help="only these accounts (repeatable)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.store):
+        parser.error(f"no graph store at {args.store} (run the pipeline or `store ingest` first)")
+    report = run(GraphDB(args.store), args.out, args.radius, args.max_nodes, args.company)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from backend.kg.schema import KnowledgeGraph, MAX_OUTPUT_TOKENS, PROMPT
+
+
+# --------------------------------------------------------------------
+# Content-addressed extraction cache
+# --------------------------------------------------------------------
+# Keyed by what determines the result, not by file name or mtime:
+#
+#   content hash   sha256 of the PDF bytes
+#   upload         content hash -> OpenAI file id (uploads.json)
+#   extraction     sha256(content hash, prompt, schema, model, token cap)
+#                  -> validated KnowledgeGraph JSON (graphs/<key>.json)
+#
+# so a renamed, copied or touched PDF is neither uploaded nor extracted
+# again, and changing the prompt/schema/model misses cleanly. Graph
+# entries are evicted least-recently-used once the cache exceeds
+# KG_CACHE_MAX_BYTES, upload ids once there are more than
+# KG_CACHE_MAX_UPLOADS of them (a dropped id only costs a re-upload).
+
+KG_CACHE_DIR = os.getenv(
+    "KG_CACHE_DIR", str(Path(__file__).resolve().parent.parent / "data" / "kg_cache")
+)
+KG_CACHE_MAX_BYTES = int(os.getenv("KG_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+KG_CACHE_MAX_UPLOADS = int(os.getenv("KG_CACHE_MAX_UPLOADS", 10_000))
+
+# bump to invalidate every cached extraction (e.g. post-processing changed)
+CACHE_VERSION = 1
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def extraction_key(digest: str, model: str, prompt: str = PROMPT, **params) -> str:
+    """Cache key of one extraction: PDF content + everything that shapes the output."""
+    spec = {
+        "version": CACHE_VERSION,
+        "content": digest,
+        "model": model,
+        "prompt": prompt,
+        "schema": KnowledgeGraph.model_json_schema(),
+        "max_output_tokens": MAX_OUTPUT_TOKENS,
+        **params,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Upload ids and parsed graphs on local disk. Safe to use from the
+    pipeline's worker threads; refresh=True skips reads (writes still
+    happen), to force re-upload and re-extraction.
+    """
+
+    def __init__(self, directory: str = KG_CACHE_DIR, max_bytes: int = KG_CACHE_MAX_BYTES,
+                 refresh: bool = False, max_uploads: int = KG_CACHE_MAX_UPLOADS):
+        self.directory = Path(directory)
+        self.graphs_dir = self.directory / "graphs"
+        self.uploads_path = self.directory / "uploads.json"
+        self.max_bytes = max_bytes
+        self.max_uploads = max_uploads
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self.graphs_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.uploads_path, encoding="utf-8") as f:
+                self._uploads: Dict[str, str] = json.load(f)
+        except (OSError, ValueError):
+            self._uploads = {}
+        self._size = sum(p.stat().st_size for p in self.graphs_dir.glob("*.json"))
+        self.hits = {"upload": 0, "graph": 0}
+        self.misses = {"upload": 0, "graph": 0}
+        self.evictions = 0
+
+    # ---- uploads ----------------------------------------------------
+
+    def get_upload(self, digest: str) -> Optional[str]:
+        with self._lock:
+            file_id = None if self.refresh else self._uploads.get(digest)
+            if file_id:
+                # most recently used last; persisted with the next put
+                self._uploads[digest] = self._uploads.pop(digest)
+        (self.hits if file_id else self.misses)["upload"] += 1
+        return file_id
+
+    def put_upload(self, digest: str, file_id: str) -> None:
+        with self._lock:
+            self._uploads.pop(digest, None)
+            self._uploads[digest] = file_id
+            while len(self._uploads) > self.max_uploads:
+                del self._uploads[next(iter(self._uploads))]
+                self.evictions += 1
+            self._write_json(self.uploads_path, self._uploads)
+
+    def drop_upload(self, digest: str) -> None:
+        """Forget a file id the API no longer knows (deleted/expired)."""
+        with self._lock:
+            if self._uploads.pop(digest, None) is not None:
+                self._write_json(self.uploads_path, self._uploads)
+
+    # ---- graphs -----------------------------------------------------
+
+    def _graph_path(self, key: str) -> Path:
+        return self.graphs_dir / f"{key}.json"
+
+    def get_graph(self, key: str) -> Optional[dict]:
+        if self.refresh:
+            self.misses["graph"] += 1
+            return None
+        path = self._graph_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                kg = KnowledgeGraph.model_validate(json.load(f)).model_dump()
+        except FileNotFoundError:
+            self.misses["graph"] += 1
+            return None
+        except ValueError:
+            # corrupt or from an incompatible schema: treat as a miss
+            with self._lock:
+                self._remove(path)
+            self.misses["graph"] += 1
+            return None
+        os.utime(path)  # LRU by mtime
+        self.hits["graph"] += 1
+        return kg
+
+    def put_graph(self, key: str, kg: dict) -> None:
+        path = self._graph_path(key)
+        with self._lock:
+            old = path.stat().st_size if path.exists() else 0
+            self._write_json(path, kg)
+            self._size += path.stat().st_size - old
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._size <= self.max_bytes:
+            return
+        entries = sorted(
+            ((p.stat().st_mtime_ns, p) for p in self.graphs_dir.glob("*.json")),
+            key=lambda e: e[0],
+        )
+        for _, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            self._remove(path)
+            self.evictions += 1
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._size -= size
+        except OSError:
+            pass
+
+    @staticmethod
+    def _write_json(path: Path, data) -> None:
+        tmp = path.with_suffix(f".tmp{os.getpid()}.{time.monotonic_ns()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "uploads": len(self._uploads),
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,177 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.kg.graph import build_graph, community_summaries
+from backend.kg.layout import layout_for
+from backend.kg.resolution import TEXT_FIELDS
+
+
+# --------------------------------------------------------------------
+# Compact viewer export: one shared static viewer + per-graph data
+# --------------------------------------------------------------------
+# pyvis' write_html inlines vis.js and every tooltip into each graph's
+# HTML. The export instead writes, into one directory:
+#
+#   index.html, viewer.js, vis-network.*   the viewer, once (cacheable)
+#   data/<name>.graph.json.gz              node/edge arrays, interned
+#                                          strings, positions, clusters
+#   data/<name>.details.json.gz            entity text fields and relation
+#                                          evidence, fetched on first click
+#   layouts/<name>.json                    layout.py state (incremental)
+#
+# and a graph is opened as index.html?data=data/<name>.graph.json.gz.
+# The .gz files can be served as-is; the viewer inflates them itself when
+# the server doesn't send Content-Encoding.
+#
+#   python -m backend.kg.export backend/data/graphs/*.json --out frontend/public/graphs
+
+KG_VIEWER_DIR = os.getenv("KG_VIEWER_DIR", os.path.join("out", "viewer"))
+FORMAT_VERSION = 1
+
+VIEWER_ASSETS = Path(__file__).resolve().parent / "viewer"
+VIS_VERSION = "vis-9.1.2"
+
+
+class _Strings:
+    """String interning: each distinct string stored once, referenced by index."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __call__(self, value) -> int:
+        value = "" if value is None else str(value)
+        i = self._index.get(value)
+        if i is None:
+            i = self._index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def pack(G, layout: dict) -> Tuple[dict, dict]:
+    """(graph data, details) for a networkx graph and its layout."""
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    positions = layout.get("positions", {})
+    community = layout.get("communities", {})
+
+    s = _Strings()
+    graph = {
+        "v": FORMAT_VERSION,
+        "nodes": {
+            "id": [s(node) for node in nodes],
+            "name": [s(G.nodes[node].get("name") or node) for node in nodes],
+            "label": [s(G.nodes[node].get("label") or "OTHER") for node in nodes],
+            "x": [round(positions.get(node, (0, 0))[0]) for node in nodes],
+            "y": [round(positions.get(node, (0, 0))[1]) for node in nodes],
+            "community": [community.get(node, -1) for node in nodes],
+        },
+        "edges": {"source": [], "target": [], "rel": [], "page": []},
+        "clusters": community_summaries(G, layout),
+    }
+
+    d = _Strings()
+    details = {
+        "v": FORMAT_VERSION,
+        "fields": list(TEXT_FIELDS),
+        "nodes": [[d(G.nodes[node].get(field, "")) for field in TEXT_FIELDS] for node in nodes],
+        "edges": [],
+    }
+    edges = graph["edges"]
+    for u, v, attrs in G.edges(data=True):
+        edges["source"].append(index[u])
+        edges["target"].append(index[v])
+        edges["rel"].append(s(attrs.get("rel") or "REL"))
+        page = attrs.get("page")
+        edges["page"].append(int(page) if page is not None else -1)
+        details["edges"].append(d(attrs.get("evidence", "")))
+
+    graph["strings"] = s.values
+    details["strings"] = d.values
+    return graph, details
+
+
+def write_gz(path: Path, data: dict) -> int:
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    # mtime=0: identical graphs give identical bytes (stable ETags/caches)
+    with open(tmp, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(raw)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def _vis_files() -> List[Path]:
+    try:
+        import pyvis
+    except ImportError as exc:
+        raise RuntimeError("the viewer export requires the 'pyvis' package (for vis-network)") from exc
+    lib = Path(pyvis.__file__).resolve().parent / "lib" / VIS_VERSION
+    return [lib / "vis-network.min.js", lib / "vis-network.css"]
+
+
+def write_viewer(directory: str) -> None:
+    """Copy the static viewer into directory (files already up to date are left alone)."""
+    target = Path(directory)
+    target.mkdir(parents=True, exist_ok=True)
+    for src in [VIEWER_ASSETS / "index.html", VIEWER_ASSETS / "viewer.js", *_vis_files()]:
+        dst = target / src.name
+        if not dst.exists() or dst.read_bytes() != src.read_bytes():
+            shutil.copyfile(src, dst)
+
+
+def export_graph(G, directory: str, name: str, layout: Optional[dict] = None) -> dict:
+    """Write one graph's data files; returns their paths and sizes."""
+    root = Path(directory)
+    if layout is None:
+        layout = layout_for(G, str(root / "layouts" / f"{name}.json"))
+    graph, details = pack(G, layout)
+    graph_path = root / "data" / f"{name}.graph.json.gz"
+    details_path = root / "data" / f"{name}.details.json.gz"
+    graph["details"] = details_path.name  # relative to the graph file
+    return {
+        "graph": str(graph_path),
+        "graph_bytes": write_gz(graph_path, graph),
+        "details": str(details_path),
+        "details_bytes": write_gz(details_path, details),
+        "url": f"index.html?data=data/{graph_path.name}",
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export knowledge graphs for the shared static viewer.")
+    parser.add_argument("graphs", nargs="*", help="KnowledgeGraph JSON files (name = file stem)")
+    parser.add_argument("--store", metavar="DB", help="export accounts from the graph store instead")
+    parser.add_argument("--company", action="append", default=[], help="with --store: company ids")
+    parser.add_argument("--out", default=KG_VIEWER_DIR)
+    args = parser.parse_args(argv)
+
+    sources = []
+    for file in args.graphs:
+        with open(file, encoding="utf-8") as f:
+            sources.append((Path(file).stem, json.load(f)))
+    if args.store:
+        from backend.kg.store import GraphDB
+
+        db = GraphDB(args.store)
+        for company_id in args.company:
+            kg = db.company_graph(company_id)
+            if kg is not None:
+                sources.append((company_id, kg))
+    if not sources:
+        parser.error("nothing to export")
+
+    write_viewer(args.out)
+    for name, kg in sources:
+        print(name, json.dumps(export_graph(build_graph(kg), args.out, name)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
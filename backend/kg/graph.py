@@ -0,0 +1,208 @@
+import json
+import os
+from typing import Optional
+
+
+# --------------------------------------------------------------------
+# NetworkX graph + pyvis HTML rendering of an extracted KnowledgeGraph
+# --------------------------------------------------------------------
+# networkx/pyvis are imported on use, so the pipeline (and the backend)
+# can import this package without the visualisation dependencies.
+#
+# With a precomputed layout (layout.py) nodes are drawn at fixed
+# positions with physics off, so opening the file costs no simulation;
+# graphs above KG_LOD_NODES open collapsed to one node per community and
+# expand on click. Without one, the browser runs PHYSICS_OPTIONS.
+
+KG_LOD_NODES = int(os.getenv("KG_LOD_NODES", 300))
+
+PHYSICS_OPTIONS = """
+{
+  "layout": { "randomSeed": 42 },
+  "nodes": {
+    "shape": "dot",
+    "scaling": { "min": 8, "max": 36 },
+    "font": { "size": 14 }
+  },
+  "edges": {
+    "arrows": { "to": { "enabled": true, "scaleFactor": 0.7 } },
+    "smooth": { "enabled": true, "type": "dynamic"}
+  },
+  "physics": {
+    "solver": "forceAtlas2Based",
+    "stabilization": { "iterations": 300 },
+    "forceAtlas2Based": {
+      "gravitationalConstant": -80,
+      "centralGravity": 0.01,
+      "springLength": 250,
+      "springConstant": 0.01,
+      "damping": 0.85,
+      "avoidOverlap": 1
+    }
+  }
+}
+"""
+
+
+STATIC_OPTIONS = """
+{
+  "nodes": {
+    "shape": "dot",
+    "scaling": { "min": 8, "max": 36 },
+    "font": { "size": 14 }
+  },
+  "edges": {
+    "arrows": { "to": { "enabled": true, "scaleFactor": 0.7 } },
+    "smooth": false
+  },
+  "physics": { "enabled": false },
+  "interaction": { "hideEdgesOnDrag": true, "hideEdgesOnZoom": true }
+}
+"""
+
+# level of detail: communities start collapsed, clicking one opens it
+LOD_SCRIPT = """
+<script type="text/javascript">
+  (function () {
+    var communities = %s;
+    Object.keys(communities).forEach(function (cid) {
+      var c = communities[cid];
+      network.cluster({
+        joinCondition: function (node) { return String(node.community) === cid; },
+        clusterNodeProperties: {
+          id: "community:" + cid, label: c.label, title: c.title, shape: "dot",
+          size: 12 + 3 * Math.sqrt(c.size), color: "#9aa5b1", borderWidth: 2
+        }
+      });
+    });
+    network.on("selectNode", function (params) {
+      if (params.nodes.length === 1 && network.isCluster(params.nodes[0])) {
+        network.openCluster(params.nodes[0]);
+      }
+    });
+  })();
+</script>
+"""
+
+
+def build_graph(kg: dict):
+    """MultiDiGraph of a KnowledgeGraph dict (keeps multiple edges with evidence)."""
+    import networkx as nx
+
+    G = nx.MultiDiGraph()
+
+    # Add nodes
+    for e in kg.get("entities", []):
+        eid = e.get("id") or e["name"].lower().strip()
+        G.add_node(
+            eid,
+            name=e.get("name", ""),
+            label=e.get("label", ""),
+            information=e.get("information", ""),
+            payment=e.get("payment", ""),
+            logistics=e.get("logistics", ""),
+            health=e.get("health", ""),
+            preferences=e.get("preferences", ""),
+            red_flags=e.get("red_flags", "")
+        )
+
+    # Add edges with evidence + page; an edge to an undeclared id would
+    # silently add an empty node, so those are counted instead
+    # (resolution.py re-points them by name where it can)
+    dangling = 0
+    for r in kg.get("relations", []):
+        head = r["head"]; tail = r["tail"]
+        if head not in G or tail not in G:
+            dangling += 1
+            continue
+        G.add_edge(
+            head, tail,
+            rel=r.get("rel","REL"),
+            page=r.get("page"),
+            evidence=r.get("evidence","")
+        )
+    G.graph["dangling_relations"] = dangling
+    return G
+
+
+def community_summaries(G, layout: dict) -> dict:
+    """community id -> label (best-connected member, +n), tooltip, size; singletons left out."""
+    members = {}
+    for node, cid in layout.get("communities", {}).items():
+        if node in G:
+            members.setdefault(cid, []).append(node)
+    summaries = {}
+    for cid, nodes in members.items():
+        if len(nodes) < 2:
+            continue
+        ranked = sorted(nodes, key=lambda n: (-G.degree(n), str(n)))
+        names = [G.nodes[n].get("name") or str(n) for n in ranked]
+        summaries[str(cid)] = {
+            "label": f"{names[0]} +{len(nodes) - 1}",
+            "title": "\n".join(names[:8]) + ("\n…" if len(names) > 8 else ""),
+            "size": len(nodes),
+        }
+    return summaries
+
+
+def render_html(G, path: str = "knowledge_graph.html", layout: Optional[dict] = None) -> str:
+    """Interactive HTML (hover shows evidence); returns the written path."""
+    from pyvis.network import Network
+
+    positions = (layout or {}).get("positions", {})
+    community = (layout or {}).get("communities", {})
+
+    net = Network(height="720px", width="100%", directed=True, bgcolor="#ffffff")
+
+    for n, attrs in G.nodes(data=True):
+        # build tooltip text with all your extended fields
+        lines = [
+            f"Name: {attrs.get('name','')}",
+            f"Label: {attrs.get('label','')}",
+            f"Information: {attrs.get('information','')}",
+            f"Payment: {attrs.get('payment','')}",
+            f"Logistics: {attrs.get('logistics','')}",
+            f"Health: {attrs.get('health','')}",
+            f"Preferences: {attrs.get('preferences','')}",
+            f"Red Flags: {attrs.get('red_flags','')}",
+        ]
+        tooltip = "\n".join([s for s in lines if s and not s.endswith(': ')])  # no empty fields
+
+        fixed = {}
+        if n in positions:
+            fixed = {"x": positions[n][0], "y": positions[n][1], "physics": False}
+        net.add_node(
+            n,
+            label=attrs.get("name", n),
+            title=tooltip,                # ← this is the hover text
+            shape="dot",
+            color="#6aa9ff" if attrs.get("label") == "ORG" else "#ffb366",
+            community=community.get(n, -1),
+            **fixed
+        )
+    for u, v, d in G.edges(data=True):
+        net.add_edge(
+            u, v,
+            label=d.get('rel',''),
+            title=f"p.{d.get('page','?')}: {d.get('evidence','')}"
+        )
+
+    # Configure physics for better layout
+    # forceAtlas2Based parameters:
+    # gravitationalConstant = more negative → stronger repulsion
+    # spring_length = length of connecting arrows
+    # centralGravity = pull to center; lower → more spread
+    # springConstant = weaker spring → more spacing
+    net.set_options(STATIC_OPTIONS if positions else PHYSICS_OPTIONS)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    net.write_html(path, notebook=False, local=True)
+    if positions and G.number_of_nodes() > KG_LOD_NODES:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        script = LOD_SCRIPT % json.dumps(community_summaries(G, layout), ensure_ascii=False)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html.replace("</body>", script + "</body>", 1))
+    return path
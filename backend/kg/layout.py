@@ -0,0 +1,215 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# --------------------------------------------------------------------
+# Precomputed graph layouts (NumPy) and community clustering
+# --------------------------------------------------------------------
+# The viewer used to run forceAtlas2 physics in the browser every time
+# the HTML was opened. Layouts are computed here instead, once, and
+# rendered as fixed positions with physics off:
+#
+# - Fruchterman-Reingold, vectorized over (chunk x n) blocks so memory
+#   stays bounded, seeded so the same graph always gets the same picture;
+# - graphs above KG_LAYOUT_EXACT_MAX nodes are laid out hierarchically:
+#   Louvain communities as super-nodes first, then each community on its
+#   own around its centre;
+# - incremental: with a previous layout (saved next to the HTML), known
+#   nodes keep their positions and only new ones are placed -- next to
+#   their neighbours -- and relaxed, so a graph that grows doesn't
+#   reshuffle.
+#
+# The community of every node is part of the layout; graph.render_html
+# uses it to show large graphs collapsed per community (expand on click).
+
+KG_LAYOUT_SEED = int(os.getenv("KG_LAYOUT_SEED", 42))
+KG_LAYOUT_ITERATIONS = int(os.getenv("KG_LAYOUT_ITERATIONS", 200))
+KG_LAYOUT_EDGE_LENGTH = float(os.getenv("KG_LAYOUT_EDGE_LENGTH", 150))  # canvas units
+KG_LAYOUT_EXACT_MAX = int(os.getenv("KG_LAYOUT_EXACT_MAX", 800))
+
+LAYOUT_VERSION = 1
+_CHUNK = 256  # rows per repulsion block (_CHUNK x n floats)
+
+
+def _np():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError("precomputed layouts require the 'numpy' package") from exc
+    return numpy
+
+
+def force_layout(pos, edges, movable=None, iterations: int = KG_LAYOUT_ITERATIONS,
+                 k: float = KG_LAYOUT_EDGE_LENGTH, temperature: Optional[float] = None):
+    """
+    Fruchterman-Reingold on an (n, 2) float array, in place: k is the
+    ideal edge length, edges an (m, 2) int array, only rows in movable
+    (default all) move. The step size cools linearly from temperature.
+    """
+    np = _np()
+    n = len(pos)
+    movable = np.arange(n) if movable is None else np.asarray(movable, dtype=int)
+    if n < 2 or iterations <= 0 or not len(movable):
+        return pos
+    t0 = temperature if temperature is not None else k * np.sqrt(n) / 4
+    head, tail = (edges[:, 0], edges[:, 1]) if len(edges) else (None, None)
+
+    for it in range(iterations):
+        t = t0 * (1 - it / iterations) + 1e-3
+        disp = np.zeros((n, 2))
+        x, y = pos[:, 0], pos[:, 1]
+        for start in range(0, len(movable), _CHUNK):
+            rows = movable[start:start + _CHUNK]
+            dx = x[rows, None] - x[None, :]
+            dy = y[rows, None] - y[None, :]
+            w = dx * dx
+            w += dy * dy
+            np.maximum(w, 1e-2, out=w)
+            np.divide(k * k, w, out=w)  # k^2/d along the unit vector: delta * k^2/d^2
+            disp[rows, 0] = (dx * w).sum(1)
+            disp[rows, 1] = (dy * w).sum(1)
+        if head is not None:
+            delta = pos[head] - pos[tail]
+            pull = delta * (np.sqrt((delta ** 2).sum(-1)) / k)[:, None]  # d^2/k, together
+            np.add.at(disp, head, -pull)
+            np.add.at(disp, tail, pull)
+        disp = disp[movable]
+        length = np.maximum(np.sqrt((disp ** 2).sum(-1)), 1e-9)
+        pos[movable] += disp * (np.minimum(length, t) / length)[:, None]
+    return pos
+
+
+def communities(G, seed: int = KG_LAYOUT_SEED) -> Dict[str, int]:
+    """node -> community id (Louvain; 0 is the largest community)."""
+    import networkx as nx
+
+    U = nx.Graph(G.to_undirected())
+    U.remove_edges_from(nx.selfloop_edges(U))
+    found = nx.community.louvain_communities(U, seed=seed) if U.number_of_edges() else [{n} for n in U]
+    ordered = sorted(found, key=lambda c: (-len(c), min(map(str, c))))
+    return {node: cid for cid, members in enumerate(ordered) for node in members}
+
+
+def _edge_array(nodes: List[str], pairs, index: Dict[str, int]):
+    np = _np()
+    unique = {
+        (min(index[u], index[v]), max(index[u], index[v]))
+        for u, v in pairs if u != v and u in index and v in index
+    }
+    return np.array(sorted(unique), dtype=int).reshape(-1, 2)
+
+
+def _fresh(n: int, edges, community, rng, k: float, iterations: int):
+    """Positions for n nodes from scratch (hierarchical above KG_LAYOUT_EXACT_MAX)."""
+    np = _np()
+    if n <= KG_LAYOUT_EXACT_MAX:
+        pos = rng.normal(scale=k * np.sqrt(n) / 2, size=(n, 2))
+        return force_layout(pos, edges, iterations=iterations, k=k)
+
+    groups: Dict[int, list] = {}
+    for i, c in enumerate(community):
+        groups.setdefault(c, []).append(i)
+    cids = sorted(groups)
+    slot = {c: j for j, c in enumerate(cids)}
+    radius = np.array([k * np.sqrt(len(groups[c])) for c in cids])
+
+    # communities as super-nodes, linked where any of their members are
+    cross = edges[community[edges[:, 0]] != community[edges[:, 1]]] if len(edges) else edges
+    super_edges = np.array(sorted({
+        (min(slot[community[u]], slot[community[v]]), max(slot[community[u]], slot[community[v]]))
+        for u, v in cross
+    }), dtype=int).reshape(-1, 2)
+    centres = rng.normal(scale=radius.mean() * np.sqrt(len(cids)), size=(len(cids), 2))
+    force_layout(centres, super_edges, iterations=iterations, k=2 * radius.mean())
+    if 1 < len(cids) <= 4000:
+        # spread the centres until (nearly) no two communities overlap
+        d = np.sqrt(((centres[:, None] - centres[None]) ** 2).sum(-1))
+        need = (radius[:, None] + radius[None]) / np.maximum(d, 1e-6)
+        np.fill_diagonal(need, 0)
+        centres *= max(1.0, float(np.percentile(need.max(1), 95)))
+
+    pos = np.zeros((n, 2))
+    local_of = np.full(n, -1)
+    for c in cids:
+        members = np.array(groups[c])
+        local_of[members] = np.arange(len(members))
+        inner = edges[(community[edges[:, 0]] == c) & (community[edges[:, 1]] == c)] if len(edges) else edges
+        local = rng.normal(scale=k * np.sqrt(len(members)) / 2, size=(len(members), 2))
+        steps = iterations if len(members) <= KG_LAYOUT_EXACT_MAX else max(
+            10, iterations * KG_LAYOUT_EXACT_MAX // len(members)
+        )
+        force_layout(local, local_of[inner], iterations=steps, k=k)
+        pos[members] = local - local.mean(0) + centres[slot[c]]
+    return pos
+
+
+def compute_layout(G, previous: Optional[dict] = None, seed: int = KG_LAYOUT_SEED,
+                   iterations: int = KG_LAYOUT_ITERATIONS, k: float = KG_LAYOUT_EDGE_LENGTH) -> dict:
+    """
+    {"positions": {node: [x, y]}, "communities": {node: id}} for a
+    networkx graph. With a previous layout covering at least half the
+    nodes, those keep their positions and only the new nodes are placed.
+    """
+    np = _np()
+    rng = np.random.default_rng(seed)
+    nodes = sorted(G.nodes, key=str)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = _edge_array(nodes, G.edges(), index)
+    community_of = communities(G, seed)
+    community = np.array([community_of[node] for node in nodes], dtype=int)
+
+    known = dict((previous or {}).get("positions", {}))
+    placed = [i for i, node in enumerate(nodes) if node in known]
+    if nodes and len(placed) * 2 >= len(nodes):
+        pos = np.zeros((len(nodes), 2))
+        for i in placed:
+            pos[i] = known[nodes[i]]
+        is_placed = np.zeros(len(nodes), dtype=bool)
+        is_placed[placed] = True
+        new = [i for i in range(len(nodes)) if not is_placed[i]]
+        neighbours: Dict[int, list] = {}
+        for u, v in edges:
+            neighbours.setdefault(u, []).append(v)
+            neighbours.setdefault(v, []).append(u)
+        centre, spread = pos[placed].mean(0), pos[placed].std(0).mean() + k
+        for i in new:
+            anchors = [j for j in neighbours.get(i, []) if is_placed[j]]
+            base = pos[anchors].mean(0) if anchors else centre + rng.normal(scale=spread, size=2)
+            pos[i] = base + rng.normal(scale=k / 2, size=2)
+            is_placed[i] = True
+        force_layout(pos, edges, movable=new, iterations=min(iterations, 100), k=k, temperature=k)
+    else:
+        pos = _fresh(len(nodes), edges, community, rng, k, iterations)
+
+    return {
+        "version": LAYOUT_VERSION,
+        "seed": seed,
+        "positions": {node: [round(float(x), 1), round(float(y), 1)] for node, (x, y) in zip(nodes, pos)},
+        "communities": {node: int(c) for node, c in zip(nodes, community)},
+    }
+
+
+def load_layout(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            layout = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return layout if layout.get("version") == LAYOUT_VERSION else None
+
+
+def layout_for(G, path: Optional[str] = None, seed: int = KG_LAYOUT_SEED) -> dict:
+    """compute_layout, incremental on (and saved to) path if given."""
+    previous = load_layout(path) if path else None
+    if previous is not None and previous.get("seed") != seed:
+        previous = None
+    layout = compute_layout(G, previous, seed)
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(layout, f)
+        os.replace(tmp, path)
+    return layout
@@ -0,0 +1,652 @@
+"""
+Knowledge-graph extraction pipeline over many PDFs.
+
+    python -m backend.kg.pipeline contracts/               # every *.pdf below
+    python -m backend.kg.pipeline "accounts/**/*.pdf" --extract-workers 8
+    python kg4.py pdf_test2.pdf --html --open              # one file, like before
+
+Each PDF runs through three stages, each with its own bounded queue and
+worker pool, so uploads, extractions and graph builds of different files
+overlap:
+
+    upload   client.files.create                   (--upload-workers)
+    extract  client.responses.parse -> KnowledgeGraph (--extract-workers)
+    build    upsert into the graph store, NetworkX graph, optional
+             pyvis HTML / viewer data with a
+             precomputed layout                    (--build-workers)
+
+The company_id of a PDF is its file stem; the extracted graph is written
+to KNOWLEDGE_GRAPH_DIR/<company_id>.json, where /ask's graph fast path
+picks it up.
+
+Uploads and extractions are cached by PDF content hash (+ prompt/schema/
+model, see cache.py): an unchanged PDF is never uploaded or extracted
+twice, whatever its name. --refresh-cache forces both, --no-cache skips
+the cache.
+
+PDFs longer than --window-pages are split locally into overlapping page
+windows (windows.py) that are uploaded and extracted concurrently and
+merged into one graph, so wall-clock time follows the longest window and
+a failed window is retried on its own.
+
+Built graphs are upserted into the persistent graph store (store.py,
+--store, default KG_STORE_PATH), one growing graph across all accounts
+that the backend reads from; --no-store skips it. --analytics then
+recomputes the per-account subgraphs and centrality the backend serves
+at /accounts/{company_id}/graph (analytics.py).
+
+--merge-into PATH resolves entities across all the files' graphs
+(resolution.py: "M. Vogel" in one PDF is "Martin Vogel" in another) and
+writes the combined graph to PATH.
+
+Progress is appended to <out>/checkpoint.jsonl after every stage. A rerun
+resumes each file at the first unfinished stage (an uploaded file is not
+uploaded again, an extracted one not re-extracted); files that changed
+since (size/mtime) start over. Per-file stage timings and failures are
+written to <out>/report.json.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+import webbrowser
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from openai import NotFoundError
+
+from backend.kg import analytics, resolution
+from backend.kg.cache import KG_CACHE_DIR, ExtractionCache, content_hash, extraction_key
+from backend.kg.export import export_graph, write_viewer
+from backend.kg.graph import build_graph, render_html
+from backend.kg.layout import layout_for
+from backend.kg.schema import EXTRACTION_MODEL, MAX_OUTPUT_TOKENS, PROMPT, KnowledgeGraph
+from backend.kg.store import KG_STORE_PATH, GraphDB
+from backend.kg.windows import (
+    KG_WINDOW_MODE,
+    KG_WINDOW_OVERLAP,
+    KG_WINDOW_PAGES,
+    KG_WINDOW_WORKERS,
+    Window,
+    merge_graphs,
+    page_count,
+    split_pdf,
+    window_prompt,
+)
+
+KG_OUT_DIR = os.getenv("KG_OUT_DIR", "out")
+KNOWLEDGE_GRAPH_DIR = os.getenv(
+    "KNOWLEDGE_GRAPH_DIR", str(Path(__file__).resolve().parent.parent / "data" / "graphs")
+)
+KG_UPLOAD_WORKERS = int(os.getenv("KG_UPLOAD_WORKERS", 8))
+KG_EXTRACT_WORKERS = int(os.getenv("KG_EXTRACT_WORKERS", 4))
+KG_BUILD_WORKERS = int(os.getenv("KG_BUILD_WORKERS", 2))
+KG_QUEUE_SIZE = int(os.getenv("KG_QUEUE_SIZE", 32))
+KG_EXTRACT_TIMEOUT = float(os.getenv("KG_EXTRACT_TIMEOUT", 600.0))
+KG_MAX_RETRIES = int(os.getenv("KG_MAX_RETRIES", 2))
+
+STAGES = ("upload", "extract", "build")
+
+
+def company_id_for(path: Path) -> str:
+    """company_id of a PDF: its file stem, lowercased, safe for file names."""
+    return re.sub(r"[^a-z0-9_-]+", "_", path.stem.lower()).strip("_") or "account"
+
+
+def find_pdfs(inputs: List[str]) -> List[Path]:
+    """PDFs from files, directories (searched recursively) and glob patterns."""
+    found: Dict[str, Path] = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = [p for p in path.rglob("*") if p.suffix.lower() == ".pdf"]
+        elif any(ch in item for ch in "*?["):
+            candidates = [Path(p) for p in glob.glob(item, recursive=True)]
+        else:
+            candidates = [path]
+        for p in candidates:
+            if p.is_file():
+                found.setdefault(str(p.resolve()), p)
+    return sorted(found.values())
+
+
+async def _gather(coros) -> None:
+    """Run all to completion, then raise the first failure (if any)."""
+    for result in await asyncio.gather(*coros, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+
+
+def _fingerprint(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class Checkpoint:
+    """
+    Append-only JSONL of per-file progress; the last record for a path
+    wins. Records only count while the file's fingerprint is unchanged.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._records: Dict[str, dict] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    self._records.setdefault(record["path"], {}).update(record)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def get(self, path: str, fingerprint: str) -> dict:
+        record = self._records.get(path, {})
+        return record if record.get("fingerprint") == fingerprint else {}
+
+    def record(self, path: str, **fields) -> None:
+        entry = {"path": path, **fields}
+        self._records.setdefault(path, {}).update(entry)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@dataclass
+class Job:
+    path: Path
+    company_id: str
+    fingerprint: str
+    content_hash: Optional[str] = None
+    cache_hit: Optional[str] = None  # "graph" | "upload"
+    file_id: Optional[str] = None
+    graph_path: Optional[str] = None
+    status: str = "pending"  # done | skipped | failed
+    failed_stage: Optional[str] = None
+    error: Optional[str] = None
+    resumed_from: Optional[str] = None
+    entities: int = 0
+    relations: int = 0
+    html_path: Optional[str] = None
+    pages: Optional[int] = None
+    windows: List[Window] = field(default_factory=list)  # [] = whole file in one call
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def report(self) -> dict:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "windows"}
+        out["path"] = str(self.path)
+        out["timings"] = {k: round(v, 3) for k, v in self.timings.items()}
+        out["windows"] = len(self.windows)
+        if self.status == "failed" and self.windows:
+            out["failed_windows"] = [w.label for w in self.windows if w.kg is None]
+        return out
+
+
+class Pipeline:
+    def __init__(
+        self,
+        client,
+        out_dir: str = KG_OUT_DIR,
+        graph_dir: str = KNOWLEDGE_GRAPH_DIR,
+        upload_workers: int = KG_UPLOAD_WORKERS,
+        extract_workers: int = KG_EXTRACT_WORKERS,
+        build_workers: int = KG_BUILD_WORKERS,
+        queue_size: int = KG_QUEUE_SIZE,
+        html: bool = False,
+        model: str = EXTRACTION_MODEL,
+        cache: Optional[ExtractionCache] = None,
+        window_mode: str = KG_WINDOW_MODE,
+        window_pages: int = KG_WINDOW_PAGES,
+        window_overlap: int = KG_WINDOW_OVERLAP,
+        window_workers: int = KG_WINDOW_WORKERS,
+        store: Optional[GraphDB] = None,
+        viewer_dir: Optional[str] = None,
+    ):
+        self.client = client
+        self.out_dir = Path(out_dir)
+        self.graph_dir = Path(graph_dir)
+        self.workers = {"upload": upload_workers, "extract": extract_workers, "build": build_workers}
+        self.queue_size = queue_size
+        self.html = html
+        self.model = model
+        self.cache = cache
+        self.window_mode = window_mode
+        self.window_pages = window_pages
+        self.window_overlap = window_overlap
+        self.window_workers = window_workers
+        self.store = store
+        self.viewer_dir = viewer_dir
+        self.checkpoint: Optional[Checkpoint] = None
+
+    # ---- stages -----------------------------------------------------
+
+    async def _read(self, job: Job) -> bytes:
+        data = await asyncio.to_thread(job.path.read_bytes)
+        job.content_hash = await asyncio.to_thread(content_hash, data)
+        return data
+
+    def _plan(self, job: Job, data: bytes) -> List[Window]:
+        """Page windows for this PDF, or [] to extract it in one call."""
+        if self.window_mode == "never":
+            return []
+        try:
+            job.pages = page_count(data)
+        except RuntimeError:
+            if self.window_mode == "always":
+                raise
+            return []  # auto without pypdf: whole file
+        if job.pages <= self.window_pages:
+            return []
+        return split_pdf(data, self.window_pages, self.window_overlap)
+
+    def _cache_key(self, job: Job) -> str:
+        if job.windows:
+            return extraction_key(
+                job.content_hash, self.model, windows=[self.window_pages, self.window_overlap]
+            )
+        return extraction_key(job.content_hash, self.model)
+
+    def _window_key(self, job: Job, window: Window) -> str:
+        return extraction_key(
+            job.content_hash, self.model, prompt=window_prompt(window, job.pages), pages=window.label
+        )
+
+    async def _from_cache(self, job: Job) -> bool:
+        """Serve the whole extraction from the cache (no API calls)."""
+        kg = await asyncio.to_thread(self.cache.get_graph, self._cache_key(job))
+        if kg is None:
+            return False
+        job.cache_hit = "graph"
+        job.graph_path = await asyncio.to_thread(self._save_graph, job.company_id, kg)
+        self.checkpoint.record(str(job.path), fingerprint=job.fingerprint, graph_path=job.graph_path)
+        return True
+
+    async def _upload_bytes(self, name: str, data: bytes, cache_key: Optional[str]) -> str:
+        pdf = await self.client.files.create(file=(name, data), purpose="assistants")
+        if self.cache is not None and cache_key is not None:
+            await asyncio.to_thread(self.cache.put_upload, cache_key, pdf.id)
+        return pdf.id
+
+    async def upload(self, job: Job) -> None:
+        data = await self._read(job)
+        job.windows = await asyncio.to_thread(self._plan, job, data)
+        if self.cache is not None:
+            if await self._from_cache(job):
+                job.windows = []
+                return
+            if not job.windows:
+                job.file_id = await asyncio.to_thread(self.cache.get_upload, job.content_hash)
+                if job.file_id:
+                    job.cache_hit = "upload"
+
+        if job.windows:
+            # window file ids live in the upload cache only; a resumed run
+            # starts over at upload, where cached windows cost nothing
+            await _gather([self._upload_window(job, w) for w in job.windows])
+            return
+        if not job.file_id:
+            job.file_id = await self._upload_bytes(job.path.name, data, job.content_hash)
+        self.checkpoint.record(str(job.path), fingerprint=job.fingerprint, file_id=job.file_id)
+
+    async def _upload_window(self, job: Job, window: Window) -> None:
+        if window.kg is not None or window.file_id:
+            return
+        if self.cache is not None:
+            window.kg = await asyncio.to_thread(self.cache.get_graph, self._window_key(job, window))
+            if window.kg is not None:
+                window.data = None
+                return
+            window.file_id = await asyncio.to_thread(
+                self.cache.get_upload, f"{job.content_hash}:{window.label}"
+            )
+            if window.file_id:
+                return
+        async with self._window_slots:
+            window.file_id = await self._upload_bytes(
+                f"{job.path.stem}.p{window.label}.pdf", window.data, f"{job.content_hash}:{window.label}"
+            )
+
+    async def extract(self, job: Job) -> None:
+        if job.graph_path:
+            return  # served from the cache at upload
+        if job.windows:
+            # a retry of this stage only redoes the windows that failed
+            await _gather([self._extract_window(job, w) for w in job.windows if w.kg is None])
+            kg = merge_graphs(job.windows)
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put_graph, self._cache_key(job), kg)
+        elif self.cache is not None:
+            if job.content_hash is None:  # resumed from a checkpoint
+                await self._read(job)
+                if await self._from_cache(job):
+                    return
+            try:
+                kg = await self._parse(job.file_id, PROMPT)
+            except NotFoundError:
+                if job.cache_hit != "upload":
+                    raise
+                # the cached file id was deleted upstream: upload again
+                await asyncio.to_thread(self.cache.drop_upload, job.content_hash)
+                job.cache_hit = None
+                data = await asyncio.to_thread(job.path.read_bytes)
+                job.file_id = await self._upload_bytes(job.path.name, data, job.content_hash)
+                kg = await self._parse(job.file_id, PROMPT)
+            await asyncio.to_thread(self.cache.put_graph, self._cache_key(job), kg)
+        else:
+            kg = await self._parse(job.file_id, PROMPT)
+        job.graph_path = await asyncio.to_thread(self._save_graph, job.company_id, kg)
+        self.checkpoint.record(str(job.path), fingerprint=job.fingerprint, graph_path=job.graph_path)
+
+    async def _extract_window(self, job: Job, window: Window) -> None:
+        prompt = window_prompt(window, job.pages)
+        if window.file_id is None:
+            await self._upload_window(job, window)
+            if window.kg is not None:
+                return
+        async with self._window_slots:
+            try:
+                kg = await self._parse(window.file_id, prompt)
+            except NotFoundError:
+                if self.cache is None:
+                    raise
+                # cached window file id deleted upstream: upload it again
+                await asyncio.to_thread(self.cache.drop_upload, f"{job.content_hash}:{window.label}")
+                window.file_id = await self._upload_bytes(
+                    f"{job.path.stem}.p{window.label}.pdf", window.data,
+                    f"{job.content_hash}:{window.label}",
+                )
+                kg = await self._parse(window.file_id, prompt)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put_graph, self._window_key(job, window), kg)
+        window.kg = kg
+        window.data = None
+
+    async def _parse(self, file_id: str, prompt: str) -> dict:
+        response = await self.client.responses.parse(  # ← Pydantic-parsed output
+            model=self.model,
+            input=[{
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": prompt},
+                    {"type": "input_file", "file_id": file_id},
+                ],
+            }],
+            text_format=KnowledgeGraph,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+            timeout=KG_EXTRACT_TIMEOUT,
+        )
+        kg_obj: Optional[KnowledgeGraph] = response.output_parsed
+        if kg_obj is None:
+            raise ValueError(f"no parsed output (status={getattr(response, 'status', '?')})")
+        return kg_obj.model_dump()
+
+    def _save_graph(self, company_id: str, kg: dict) -> str:
+        self.graph_dir.mkdir(parents=True, exist_ok=True)
+        path = self.graph_dir / f"{company_id}.json"
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(kg, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return str(path)
+
+    async def build(self, job: Job) -> None:
+        job.entities, job.relations, job.html_path = await asyncio.to_thread(self._build, job)
+        self.checkpoint.record(
+            str(job.path), fingerprint=job.fingerprint, done=True, html=job.html_path is not None
+        )
+
+    def _build(self, job: Job):
+        with open(job.graph_path, encoding="utf-8") as f:
+            kg = json.load(f)
+        if self.store is not None:
+            # the account's graph as stored: entities resolved across documents
+            self.store.upsert_document(
+                job.company_id, kg, company_id=job.company_id,
+                source=str(job.path), content_hash=job.content_hash,
+            )
+            kg = self.store.company_graph(job.company_id)
+        G = build_graph(kg)
+        html_path = None
+        if self.html or self.viewer_dir:
+            # positions computed here (incrementally over the last run's), not in the browser
+            layout = layout_for(G, str(self.out_dir / "layouts" / f"{job.company_id}.json"))
+            if self.viewer_dir:
+                export_graph(G, self.viewer_dir, job.company_id, layout)
+            if self.html:
+                html_path = render_html(G, str(self.out_dir / "html" / f"{job.company_id}.html"), layout)
+        return G.number_of_nodes(), G.number_of_edges(), html_path
+
+    # ---- orchestration ------------------------------------------------
+
+    async def _run_stage(self, stage: str, job: Job) -> bool:
+        """Run one stage (with retries); False if the file failed."""
+        fn = getattr(self, stage)
+        start = time.perf_counter()
+        for attempt in range(KG_MAX_RETRIES + 1):
+            try:
+                await fn(job)
+                break
+            except Exception as exc:
+                if attempt < KG_MAX_RETRIES and stage != "build":
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                job.status = "failed"
+                job.failed_stage = stage
+                job.error = f"{type(exc).__name__}: {exc}"
+                self.checkpoint.record(
+                    str(job.path), fingerprint=job.fingerprint, failed=stage, error=job.error
+                )
+                return False
+            finally:
+                job.timings[stage] = time.perf_counter() - start
+        return True
+
+    async def _worker(self, stage: str, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            job = await inbox.get()
+            try:
+                if await self._run_stage(stage, job):
+                    if outbox is not None:
+                        await outbox.put(job)
+                    else:
+                        job.status = "done"
+            finally:
+                inbox.task_done()
+
+    def _resume_stage(self, job: Job) -> Optional[str]:
+        """First stage this file still needs, from the checkpoint (None: finished)."""
+        record = self.checkpoint.get(str(job.path), job.fingerprint)
+        if record.get("done") and (not self.html or record.get("html")):
+            return None
+        if record.get("graph_path") and Path(record["graph_path"]).exists():
+            job.graph_path = record["graph_path"]
+            return "build"
+        if record.get("file_id"):
+            job.file_id = record["file_id"]
+            return "extract"
+        return "upload"
+
+    async def run(self, pdfs: List[Path]) -> dict:
+        self.checkpoint = Checkpoint(self.out_dir / "checkpoint.jsonl")
+        # window uploads/extractions in flight, across all files
+        self._window_slots = asyncio.Semaphore(max(1, self.window_workers))
+        if self.viewer_dir:
+            write_viewer(self.viewer_dir)
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES}
+        workers = [
+            asyncio.create_task(self._worker(
+                stage, queues[stage], queues[STAGES[i + 1]] if i + 1 < len(STAGES) else None
+            ))
+            for i, stage in enumerate(STAGES)
+            for _ in range(max(1, self.workers[stage]))
+        ]
+
+        started = time.perf_counter()
+        jobs = [Job(p, company_id_for(p), _fingerprint(p)) for p in pdfs]
+        try:
+            for job in jobs:
+                stage = self._resume_stage(job)
+                if stage is None:
+                    job.status = "skipped"
+                    continue
+                if stage != "upload":
+                    job.resumed_from = stage
+                await queues[stage].put(job)  # blocks while the stage is backed up
+            for stage in STAGES:
+                await queues[stage].join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.checkpoint.close()
+
+        report = self._report(jobs, time.perf_counter() - started)
+        if self.cache is not None:
+            report["cache"] = self.cache.stats()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / "report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+    def _report(self, jobs: List[Job], elapsed: float) -> dict:
+        stage_seconds = {}
+        for stage in STAGES:
+            values = sorted(j.timings[stage] for j in jobs if stage in j.timings)
+            if values:
+                stage_seconds[stage] = {
+                    "count": len(values),
+                    "total": round(sum(values), 3),
+                    "p50": round(values[len(values) // 2], 3),
+                    "max": round(values[-1], 3),
+                }
+        return {
+            "files": len(jobs),
+            "done": sum(j.status == "done" for j in jobs),
+            "skipped": sum(j.status == "skipped" for j in jobs),
+            "failed": sum(j.status == "failed" for j in jobs),
+            "cache_hits": {
+                kind: sum(j.cache_hit == kind for j in jobs) for kind in ("graph", "upload")
+            },
+            "elapsed_s": round(elapsed, 3),
+            "stage_seconds": stage_seconds,
+            "failures": {str(j.path): f"{j.failed_stage}: {j.error}" for j in jobs if j.status == "failed"},
+            "per_file": [j.report() for j in jobs if j.status != "skipped"],
+        }
+
+
+def merge_company_graphs(paths: List[Path], output: str) -> dict:
+    """Resolve the graphs at paths (missing ones skipped) into output; returns the stats."""
+    graphs = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                graphs.append(json.load(f))
+        except FileNotFoundError:
+            continue
+    kg, stats = resolution.merge(graphs)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(kg, f, ensure_ascii=False)
+    return {"path": output, **stats.__dict__}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Extract knowledge graphs from PDFs.")
+    parser.add_argument("inputs", nargs="*", default=["pdf_test2.pdf"],
+                        help="PDF files, directories or glob patterns")
+    parser.add_argument("--out", default=KG_OUT_DIR, help="checkpoint/report/html directory")
+    parser.add_argument("--graph-dir", default=KNOWLEDGE_GRAPH_DIR,
+                        help="where <company_id>.json graphs are written")
+    parser.add_argument("--upload-workers", type=int, default=KG_UPLOAD_WORKERS)
+    parser.add_argument("--extract-workers", type=int, default=KG_EXTRACT_WORKERS)
+    parser.add_argument("--build-workers", type=int, default=KG_BUILD_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=KG_QUEUE_SIZE)
+    parser.add_argument("--model", default=EXTRACTION_MODEL)
+    parser.add_argument("--html", action="store_true", help="render <out>/html/<company_id>.html")
+    parser.add_argument("--viewer", metavar="DIR",
+                        help="export compact data for the shared static viewer (export.py) into DIR")
+    parser.add_argument("--open", action="store_true", help="open the HTML of a single file")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--windows", choices=("auto", "always", "never"), default=KG_WINDOW_MODE,
+                        help="split PDFs into page windows (auto: longer than --window-pages)")
+    parser.add_argument("--window-pages", type=int, default=KG_WINDOW_PAGES)
+    parser.add_argument("--window-overlap", type=int, default=KG_WINDOW_OVERLAP)
+    parser.add_argument("--window-workers", type=int, default=KG_WINDOW_WORKERS,
+                        help="window uploads/extractions in flight across all files")
+    parser.add_argument("--cache-dir", default=KG_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="re-upload and re-extract, overwriting cached results")
+    parser.add_argument("--store", default=KG_STORE_PATH,
+                        help="persistent graph store every built graph is upserted into")
+    parser.add_argument("--no-store", action="store_true", help="don't write the graph store")
+    parser.add_argument("--analytics", action="store_true",
+                        help="recompute the per-account graph analytics from the store afterwards")
+    parser.add_argument("--merge-into", metavar="PATH",
+                        help="also write one graph with entities resolved across all files")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+
+    load_dotenv()
+
+    pdfs = find_pdfs(args.inputs)
+    if not pdfs:
+        parser.error(f"no PDFs found in {', '.join(args.inputs)}")
+    if args.restart:
+        (Path(args.out) / "checkpoint.jsonl").unlink(missing_ok=True)
+
+    async def run() -> dict:
+        client = AsyncOpenAI()  # reads OPENAI_API_KEY
+        try:
+            pipeline = Pipeline(
+                client,
+                out_dir=args.out,
+                graph_dir=args.graph_dir,
+                upload_workers=args.upload_workers,
+                extract_workers=args.extract_workers,
+                build_workers=args.build_workers,
+                queue_size=args.queue_size,
+                html=args.html or args.open,
+                model=args.model,
+                cache=None if args.no_cache else ExtractionCache(
+                    args.cache_dir, refresh=args.refresh_cache
+                ),
+                window_mode=args.windows,
+                window_pages=args.window_pages,
+                window_overlap=args.window_overlap,
+                window_workers=args.window_workers,
+                store=None if args.no_store else GraphDB(args.store),
+                viewer_dir=args.viewer,
+            )
+            return await pipeline.run(pdfs)
+        finally:
+            await client.close()
+
+    report = asyncio.run(run())
+    if args.analytics and not args.no_store:
+        report["analytics"] = analytics.run(GraphDB(args.store))
+    if args.merge_into:
+        report["resolution"] = merge_company_graphs(
+            [Path(args.graph_dir) / f"{company_id_for(p)}.json" for p in pdfs], args.merge_into
+        )
+    summary = {k: v for k, v in report.items() if k != "per_file"}
+    print(json.dumps(summary, indent=2))
+
+    if args.open and len(pdfs) == 1 and report["per_file"] and report["per_file"][0]["html_path"]:
+        webbrowser.open("file://" + os.path.abspath(report["per_file"][0]["html_path"]))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,407 @@
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# --------------------------------------------------------------------
+# Entity resolution across extracted knowledge graphs
+# --------------------------------------------------------------------
+# Extractions name the same entity differently -- "Martin Vogel",
+# "M. Vogel", "Vogel, Martin", "Mr. Vogel"; "Altus Components GmbH",
+# "Altus Components" -- and their ids only agree by luck, so relations
+# from different documents or page windows end up on separate (or
+# dangling) nodes. EntityResolver merges them:
+#
+# 1. every name is normalized into tokens (accents folded, honorifics
+#    and legal-form suffixes dropped, "Last, First" reordered);
+# 2. a blocking index maps cheap keys -- the full normalized name,
+#    surname + first initial for people, first token for everything
+#    else -- to the entities carrying them; only entities sharing a
+#    block are compared, so the work stays near-linear;
+# 3. safe matches (same name, same first + last name) are unioned into
+#    clusters; less specific names ("M. Vogel", "Altus", "Vogel") then
+#    join the cluster they refine only if exactly one fits -- "M. Vogel"
+#    next to both Martin and Maria Vogel stays on its own;
+# 4. each cluster becomes one entity
+#    (text fields combined, the most specific name and label kept) and
+#    relations are re-pointed to it and deduped. Relation ends that name
+#    no entity of their graph are looked up by name before being dropped
+#    as dangling.
+#
+#   python -m backend.kg.resolution backend/data/graphs/*.json -o merged.json
+
+# fuzzy blocks larger than this (very common surnames/first words) are not
+# compared pairwise; exact-name matches are still merged
+KG_RESOLUTION_MAX_BLOCK = int(os.getenv("KG_RESOLUTION_MAX_BLOCK", 200))
+
+TEXT_FIELDS = ("information", "payment", "logistics", "health", "preferences", "red_flags")
+FIELD_SEPARATOR = " | "
+_EMPTY_VALUES = frozenset({"", "0", "none", "n/a", "unknown", "null", "-"})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_HONORIFICS = frozenset("mr mrs ms miss dr prof herr frau sir".split())
+_ORG_SUFFIXES = frozenset(
+    "gmbh ag inc incorporated ltd limited llc co corp corporation company se kg kgaa "
+    "sa sas bv nv plc oy ab as spa srl".split()
+)
+
+
+def present(value) -> bool:
+    return value is not None and str(value).strip().lower() not in _EMPTY_VALUES
+
+
+def merge_text(current: str, value: str) -> str:
+    """current plus value if it says something new (distinct values joined)."""
+    if not present(value):
+        return current
+    value = str(value).strip()
+    if not present(current):
+        return value
+    if value in current.split(FIELD_SEPARATOR):
+        return current
+    return current + FIELD_SEPARATOR + value
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.replace("ß", "ss"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def name_tokens(name: str, label: Optional[str] = None) -> List[str]:
+    """Normalized name tokens; people as [first, ..., last]."""
+    name = name or ""
+    if label in ("PERSON", "OTHER", None) and name.count(",") == 1:
+        last, first = name.split(",")
+        if first.strip() and len(last.split()) <= 2:
+            name = f"{first} {last}"  # "Vogel, Martin" -> "Martin Vogel"
+    tokens = [t for t in _TOKEN_RE.findall(_fold(name)) if t not in _HONORIFICS]
+    if label == "ORG":
+        stripped = [t for t in tokens if t not in _ORG_SUFFIXES]
+        tokens = stripped or tokens
+    return tokens
+
+
+def _labels_compatible(a: Optional[str], b: Optional[str]) -> bool:
+    return a == b or a in (None, "OTHER") or b in (None, "OTHER")
+
+
+@dataclass
+class Mention:
+    graph: int
+    entity: dict
+    label: Optional[str]
+    tokens: List[str]
+
+    @property
+    def full(self) -> str:
+        return " ".join(self.tokens)
+
+
+def _is_initial(token: str) -> bool:
+    return len(token) == 1
+
+
+def same_entity(a: Mention, b: Mention) -> bool:
+    """
+    Safe pairwise match: the same entity whatever else is in the cluster
+    (identical names; people with the same first and last name; near-
+    identical token sets otherwise).
+    """
+    if not _labels_compatible(a.label, b.label) or not a.tokens or not b.tokens:
+        return False
+    if a.tokens == b.tokens:
+        return True
+    if "PERSON" in (a.label, b.label):
+        # "Martin A. Vogel" ~ "Martin Vogel"; initials are handled by refines()
+        return (
+            len(a.tokens) >= 2 and len(b.tokens) >= 2
+            and a.tokens[-1] == b.tokens[-1] and a.tokens[0] == b.tokens[0]
+            and not _is_initial(a.tokens[0])
+        )
+    if "ORG" in (a.label, b.label):
+        return False  # subsets are handled by refines()
+    sa, sb = set(a.tokens), set(b.tokens)
+    return len(sa & sb) / len(sa | sb) >= 0.8
+
+
+def refines(short: Mention, long: Mention) -> bool:
+    """
+    short is a less specific form of long ("M. Vogel" of "Martin Vogel",
+    "Altus" of "Altus Components"). Only safe when long is the one such
+    candidate: "M. Vogel" may be Martin or Maria.
+    """
+    if not _labels_compatible(short.label, long.label) or not short.tokens or not long.tokens:
+        return False
+    if "PERSON" in (short.label, long.label):
+        return (
+            len(short.tokens) >= 2 and len(long.tokens) >= 2
+            and short.tokens[-1] == long.tokens[-1]
+            and _is_initial(short.tokens[0]) and not _is_initial(long.tokens[0])
+            and long.tokens[0].startswith(short.tokens[0])
+        )
+    return set(short.tokens) < set(long.tokens)
+
+
+def blocking_keys(tokens: List[str], label: Optional[str]) -> List[tuple]:
+    """Index keys of a name; only names sharing a key are ever compared."""
+    if not tokens:
+        return []
+    keys = [("full", " ".join(tokens))]
+    if label in ("PERSON", "OTHER", None) and len(tokens) >= 2:
+        keys.append(("person", tokens[-1], tokens[0][0]))
+    elif label != "PERSON":
+        keys.append(("first", tokens[0]))
+    return keys
+
+
+def combine(mentions: Sequence[Mention]) -> dict:
+    """One entity from its mentions: most specific name, most common label, distinct field values."""
+    # the most specific name: most tokens, then longest, then first seen
+    best = max(mentions, key=lambda m: (
+        len(m.tokens), "," not in (m.entity.get("name") or ""), len(m.entity.get("name") or "")
+    ))
+    merged = dict(best.entity)
+    merged["id"] = best.entity.get("id") or "_".join(best.tokens) or "entity"
+    labels = Counter(m.label for m in mentions if m.label not in (None, "OTHER"))
+    merged["label"] = labels.most_common(1)[0][0] if labels else (best.label or "OTHER")
+    for name in TEXT_FIELDS:
+        value = ""
+        for m in mentions:
+            value = merge_text(value, m.entity.get(name, ""))
+        merged[name] = value
+    return merged
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> bool:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        self.parent[max(ra, rb)] = min(ra, rb)
+        return True
+
+
+@dataclass
+class ResolutionStats:
+    graphs: int = 0
+    entities_in: int = 0
+    entities_out: int = 0
+    relations_in: int = 0
+    relations_out: int = 0
+    comparisons: int = 0
+    merges: int = 0
+    skipped_blocks: int = 0
+    dangling_relations: int = 0
+    seconds: float = 0.0
+
+
+class EntityResolver:
+    """
+    Collect graphs with add(), then resolve() them into one KnowledgeGraph
+    dict. Input graphs are not modified.
+    """
+
+    def __init__(self, max_block: int = KG_RESOLUTION_MAX_BLOCK):
+        self.max_block = max_block
+        self._mentions: List[Mention] = []
+        self._relations: List[Tuple[int, dict]] = []
+        self._local: List[Dict[str, int]] = []  # per graph: entity id -> mention
+        self.stats = ResolutionStats()
+
+    def add(self, kg: dict) -> int:
+        g = len(self._local)
+        local: Dict[str, int] = {}
+        for e in kg.get("entities", []):
+            label = e.get("label")
+            tokens = name_tokens(e.get("name") or e.get("id", ""), label)
+            local[e.get("id") or " ".join(tokens)] = len(self._mentions)
+            self._mentions.append(Mention(g, e, label, tokens))
+        self._local.append(local)
+        self._relations.extend((g, r) for r in kg.get("relations", []))
+        return g
+
+    # ---- blocking -------------------------------------------------------
+
+    def _blocks(self) -> Dict[tuple, List[int]]:
+        blocks: Dict[tuple, List[int]] = {}
+        for i, m in enumerate(self._mentions):
+            for key in blocking_keys(m.tokens, m.label):
+                blocks.setdefault(key, []).append(i)
+        return blocks
+
+    def _cluster(self) -> _UnionFind:
+        uf = _UnionFind(len(self._mentions))
+        fuzzy: List[List[int]] = []
+        for key, members in self._blocks().items():
+            if len(members) < 2:
+                continue
+            if key[0] == "full":
+                self._merge_identical(uf, members)
+            elif len(members) > self.max_block:
+                self.stats.skipped_blocks += 1
+            else:
+                fuzzy.append(members)
+
+        # safe matches first, so ambiguity below is judged between whole clusters
+        for members in fuzzy:
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if uf.find(i) == uf.find(j):
+                        continue
+                    self.stats.comparisons += 1
+                    if same_entity(self._mentions[i], self._mentions[j]):
+                        self._union(uf, i, j)
+
+        # less specific names join the one cluster they refine, if there is only one
+        for members in fuzzy:
+            for i in members:
+                roots = set()
+                for j in members:
+                    if i != j:
+                        self.stats.comparisons += 1
+                        if refines(self._mentions[i], self._mentions[j]):
+                            roots.add(uf.find(j))
+                roots.discard(uf.find(i))
+                if len(roots) == 1:
+                    self._union(uf, i, roots.pop())
+        self._merge_surname_only(uf)
+        return uf
+
+    def _union(self, uf: _UnionFind, i: int, j: int) -> None:
+        if uf.union(i, j):
+            self.stats.merges += 1
+
+    def _merge_identical(self, uf: _UnionFind, members: List[int]) -> None:
+        """Identical normalized names: one union per label, no pairwise work."""
+        anchors: Dict[Optional[str], int] = {}
+        for i in members:
+            anchor = anchors.setdefault(self._mentions[i].label, i)
+            if anchor != i:
+                self._union(uf, anchor, i)
+        typed = [a for label, a in anchors.items() if label not in (None, "OTHER")]
+        if len(typed) == 1:
+            for label, a in anchors.items():
+                if label in (None, "OTHER"):
+                    self._union(uf, typed[0], a)
+
+    def _merge_surname_only(self, uf: _UnionFind) -> None:
+        """"Vogel" / "Mr. Vogel" joins the one person with that surname, if unambiguous."""
+        by_surname: Dict[str, set] = {}
+        for i, m in enumerate(self._mentions):
+            if m.label == "PERSON" and len(m.tokens) >= 2:
+                by_surname.setdefault(m.tokens[-1], set()).add(uf.find(i))
+        for i, m in enumerate(self._mentions):
+            if m.label == "PERSON" and len(m.tokens) == 1:
+                roots = by_surname.get(m.tokens[0], set())
+                if len(roots) == 1:
+                    self._union(uf, next(iter(roots)), i)
+
+    # ---- merge ----------------------------------------------------------
+
+    def resolve(self) -> dict:
+        started = time.perf_counter()
+        self.stats.graphs = len(self._local)
+        self.stats.entities_in = len(self._mentions)
+        self.stats.relations_in = len(self._relations)
+        uf = self._cluster()
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(len(self._mentions)):
+            clusters.setdefault(uf.find(i), []).append(i)
+
+        canonical: Dict[int, str] = {}  # root -> merged entity id
+        entities: Dict[str, dict] = {}
+        by_full: Dict[str, set] = {}
+        for root, members in clusters.items():
+            merged = self._merge_cluster(members)
+            eid = merged["id"]
+            n = 1
+            while eid in entities:
+                n += 1
+                eid = f"{merged['id']}_{n}"
+            merged["id"] = eid
+            entities[eid] = merged
+            canonical[root] = eid
+            for i in members:
+                if self._mentions[i].tokens:
+                    by_full.setdefault(self._mentions[i].full, set()).add(eid)
+
+        relations: List[dict] = []
+        seen = set()
+        for g, r in self._relations:
+            head = self._endpoint(g, r.get("head"), uf, canonical, by_full)
+            tail = self._endpoint(g, r.get("tail"), uf, canonical, by_full)
+            if head is None or tail is None:
+                self.stats.dangling_relations += 1
+                continue
+            key = (head, (r.get("rel") or "").strip().upper(), tail, r.get("page"))
+            if key in seen:
+                continue
+            seen.add(key)
+            relations.append({**r, "head": head, "tail": tail})
+
+        self.stats.entities_out = len(entities)
+        self.stats.relations_out = len(relations)
+        self.stats.seconds = round(time.perf_counter() - started, 3)
+        return {"entities": list(entities.values()), "relations": relations}
+
+    def _merge_cluster(self, members: List[int]) -> dict:
+        return combine([self._mentions[i] for i in members])
+
+    def _endpoint(self, g: int, ref, uf, canonical, by_full) -> Optional[str]:
+        if ref is None:
+            return None
+        i = self._local[g].get(ref)
+        if i is not None:
+            return canonical[uf.find(i)]
+        # id not declared in its graph: try it as a name ("martin_vogel")
+        matches = by_full.get(" ".join(name_tokens(str(ref).replace("_", " "))))
+        if matches and len(matches) == 1:
+            return next(iter(matches))
+        return None
+
+
+def merge(graphs: Sequence[dict], max_block: int = KG_RESOLUTION_MAX_BLOCK) -> Tuple[dict, ResolutionStats]:
+    """Resolve entities across graphs into one graph (+ stats)."""
+    resolver = EntityResolver(max_block)
+    for kg in graphs:
+        resolver.add(kg)
+    return resolver.resolve(), resolver.stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Merge knowledge graphs, resolving duplicate entities.")
+    parser.add_argument("graphs", nargs="+", help="KnowledgeGraph JSON files")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--max-block", type=int, default=KG_RESOLUTION_MAX_BLOCK)
+    args = parser.parse_args(argv)
+
+    graphs = []
+    for path in args.graphs:
+        with open(path, encoding="utf-8") as f:
+            graphs.append(json.load(f))
+    kg, stats = merge(graphs, args.max_block)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(kg, f, ensure_ascii=False, indent=2)
+    print(json.dumps(stats.__dict__, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
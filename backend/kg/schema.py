@@ -0,0 +1,44 @@
+from typing import List, Optional, Literal
+from pydantic import BaseModel, Field
+
+
+# --------------------------------------------------------------------
+# Extraction schema (Pydantic-parsed Responses API output)
+# --------------------------------------------------------------------
+
+class Entity(BaseModel):
+    id: str
+    name: str
+    information: str
+    payment: str
+    logistics: str
+    health: str
+    preferences: str
+    red_flags: str
+    label: Optional[Literal["ORG","PERSON","PRODUCT","PROCESS","TOOL","GPE","OTHER"]] = "OTHER"
+
+class Relation(BaseModel):
+    head: str  # entity id
+    rel: str   # e.g., PARTNERED_WITH, USES, ACQUIRED
+    tail: str  # entity id
+    page: Optional[int] = None
+    evidence: Optional[str] = Field(default=None, description="Short quote/sentence")
+
+class KnowledgeGraph(BaseModel):
+    entities: List[Entity] = Field(default_factory=list)
+    relations: List[Relation] = Field(default_factory=list)
+
+
+EXTRACTION_MODEL = "gpt-5"  # gpt-4o-2024-08-06
+MAX_OUTPUT_TOKENS = 10000
+
+PROMPT = (
+    "From the attached PDF, extract ENTITIES and RELATIONS for a knowledge graph. "
+    "Prefer Companies and People and try to find out their relation. " \
+    "For People, try to extract information about their position, their preferences and red flags"
+    "For Organisations, try to extract information about payments, logistics and the health of relationship"
+    "Return ONLY fields that fit the provided schema. "
+    "For relations, include a short evidence. "
+    "For rel in relations, try to summarize the evidence in a few words. "
+    "If uncertain, omit and fill with zeros."
+)
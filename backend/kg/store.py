@@ -0,0 +1,543 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from backend.kg import resolution
+from backend.kg.resolution import Mention, TEXT_FIELDS, blocking_keys, combine, name_tokens
+
+
+# --------------------------------------------------------------------
+# Persistent graph store (SQLite)
+# --------------------------------------------------------------------
+# One growing graph for the whole customer base, in a single local file.
+# Documents are upserted one at a time: a document's entities are
+# resolved against the entities already stored (resolution.py rules,
+# candidates found through the stored blocking keys, so nothing is
+# loaded wholesale), its mentions and relations replace whatever that
+# document contributed before, and the touched entities are recombined
+# from all their mentions.
+#
+#   documents    doc_id -> company_id, source, content hash
+#   entities     merged entity (id, name, label, text fields); index on label
+#   mentions     one document's view of an entity (page provenance of
+#                the entity, and what it is recombined from)
+#   entity_keys  blocking keys -> entity ids
+#   relations    head, rel, tail, page, evidence, doc_id; indexes on
+#                head, tail, rel and doc_id
+#
+# Queries (neighbors, neighborhood, shortest_path, company_graph) walk
+# the relation indexes level by level and never read the whole graph.
+#
+#   python -m backend.kg.store ingest backend/data/graphs/*.json
+#   python -m backend.kg.store neighborhood martin_vogel --radius 2 --html out/vogel.html
+
+KG_STORE_PATH = os.getenv(
+    "KG_STORE_PATH", str(Path(__file__).resolve().parent.parent / "data" / "graph.db")
+)
+KG_STORE_MAX_NODES = int(os.getenv("KG_STORE_MAX_NODES", 500))
+
+_SQL_CHUNK = 500  # ids per IN (...) clause
+
+_FIELD_COLUMNS = ", ".join(f"{name} TEXT NOT NULL DEFAULT ''" for name in TEXT_FIELDS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id       TEXT PRIMARY KEY,
+    company_id   TEXT NOT NULL,
+    source       TEXT,
+    content_hash TEXT,
+    entities     INTEGER NOT NULL DEFAULT 0,
+    relations    INTEGER NOT NULL DEFAULT 0,
+    updated_ns   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_company ON documents(company_id);
+
+CREATE TABLE IF NOT EXISTS entities (
+    id    TEXT PRIMARY KEY,
+    name  TEXT NOT NULL,
+    label TEXT NOT NULL,
+    {_FIELD_COLUMNS}
+);
+CREATE INDEX IF NOT EXISTS entities_label ON entities(label);
+
+CREATE TABLE IF NOT EXISTS mentions (
+    doc_id    TEXT NOT NULL,
+    local_id  TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    label     TEXT NOT NULL,
+    {_FIELD_COLUMNS},
+    PRIMARY KEY (doc_id, local_id)
+);
+CREATE INDEX IF NOT EXISTS mentions_entity ON mentions(entity_id);
+
+CREATE TABLE IF NOT EXISTS entity_keys (
+    key       TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    PRIMARY KEY (key, entity_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entity_keys_entity ON entity_keys(entity_id);
+
+CREATE TABLE IF NOT EXISTS relations (
+    id       INTEGER PRIMARY KEY,
+    doc_id   TEXT NOT NULL,
+    head     TEXT NOT NULL,
+    rel      TEXT NOT NULL,
+    tail     TEXT NOT NULL,
+    page     INTEGER,
+    evidence TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS relations_head ON relations(head, rel);
+CREATE INDEX IF NOT EXISTS relations_tail ON relations(tail, rel);
+CREATE INDEX IF NOT EXISTS relations_rel ON relations(rel);
+CREATE INDEX IF NOT EXISTS relations_doc ON relations(doc_id);
+"""
+
+_ENTITY_COLUMNS = "id, name, label, " + ", ".join(TEXT_FIELDS)
+_MENTION_COLUMNS = "doc_id, local_id, entity_id, name, label, " + ", ".join(TEXT_FIELDS)
+_RELATION_COLUMNS = "head, rel, tail, page, evidence, doc_id"
+
+
+def _key(key: tuple) -> str:
+    return "|".join(key)
+
+
+def _chunks(items: Sequence, size: int = _SQL_CHUNK) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(n: int) -> str:
+    return ",".join("?" * n)
+
+
+def _mention(entity: dict) -> Mention:
+    label = entity.get("label")
+    return Mention(0, entity, label, name_tokens(entity.get("name") or entity.get("id", ""), label))
+
+
+class GraphDB:
+    """
+    The store. One connection per thread (WAL: readers never block on the
+    writer); writes are serialized by a lock and run in one transaction
+    per document.
+    """
+
+    def __init__(self, path: str = KG_STORE_PATH):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- writes -------------------------------------------------------
+
+    def upsert_document(self, doc_id: str, kg: dict, company_id: Optional[str] = None,
+                        source: Optional[str] = None, content_hash: Optional[str] = None) -> dict:
+        """
+        Replace what doc_id contributed with kg. Entities resolve to stored
+        ones where they match (ids stay stable across re-ingests);
+        returns {"entities", "relations", "new_entities"}.
+        """
+        kg, _ = resolution.merge([kg])  # one entity per name within the document
+        with self._write() as conn:
+            touched = self._drop_document(conn, doc_id)
+            local_ids: Dict[str, str] = {}
+            new = 0
+            for e in kg["entities"]:
+                mention = _mention(e)
+                eid = self._match(conn, mention)
+                if eid is None:
+                    eid = self._new_id(conn, e["id"])
+                    conn.execute(f"INSERT INTO entities ({_ENTITY_COLUMNS}) VALUES ({_placeholders(3 + len(TEXT_FIELDS))})",
+                                 (eid, e.get("name") or eid, e.get("label") or "OTHER", *("",) * len(TEXT_FIELDS)))
+                    new += 1
+                local_ids[e["id"]] = eid
+                touched.add(eid)
+                conn.execute(
+                    f"INSERT INTO mentions ({_MENTION_COLUMNS}) VALUES ({_placeholders(5 + len(TEXT_FIELDS))})",
+                    (doc_id, e["id"], eid, e.get("name") or eid, e.get("label") or "OTHER",
+                     *(str(e.get(name) or "") for name in TEXT_FIELDS)),
+                )
+            relations = [
+                (doc_id, local_ids[r["head"]], (r.get("rel") or "REL").strip().upper(),
+                 local_ids[r["tail"]], r.get("page"), r.get("evidence") or "")
+                for r in kg["relations"]
+                if r.get("head") in local_ids and r.get("tail") in local_ids
+            ]
+            conn.executemany(
+                "INSERT INTO relations (doc_id, head, rel, tail, page, evidence) VALUES (?, ?, ?, ?, ?, ?)",
+                relations,
+            )
+            for eid in touched:
+                self._recombine(conn, eid)
+            conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, company_id or doc_id, source, content_hash,
+                 len(local_ids), len(relations), time.time_ns()),
+            )
+        return {"entities": len(local_ids), "relations": len(relations), "new_entities": new}
+
+    def delete_document(self, doc_id: str) -> bool:
+        with self._write() as conn:
+            existed = conn.execute("SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            for eid in self._drop_document(conn, doc_id):
+                self._recombine(conn, eid)
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        return existed is not None
+
+    def _drop_document(self, conn, doc_id: str) -> set:
+        touched = {row[0] for row in conn.execute(
+            "SELECT DISTINCT entity_id FROM mentions WHERE doc_id = ?", (doc_id,)
+        )}
+        conn.execute("DELETE FROM mentions WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM relations WHERE doc_id = ?", (doc_id,))
+        return touched
+
+    def _match(self, conn, mention: Mention) -> Optional[str]:
+        """Stored entity this mention is, by the resolver's rules; None if new."""
+        keys = [_key(k) for k in blocking_keys(mention.tokens, mention.label)]
+        if not keys:
+            return None
+        ids = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT entity_id FROM entity_keys WHERE key IN ({_placeholders(len(keys))})", keys
+        )]
+        if not ids:
+            return None
+        candidates = [
+            (row["id"], _mention(dict(row)))
+            for chunk in _chunks(ids)
+            for row in conn.execute(
+                f"SELECT id, name, label FROM entities WHERE id IN ({_placeholders(len(chunk))})", chunk
+            )
+        ]
+        candidates.sort(key=lambda c: c[0])
+        for eid, stored in candidates:
+            if resolution.same_entity(mention, stored):
+                return eid
+        fits = {eid for eid, stored in candidates
+                if resolution.refines(mention, stored) or resolution.refines(stored, mention)}
+        return fits.pop() if len(fits) == 1 else None
+
+    def _new_id(self, conn, base: str) -> str:
+        eid, n = base, 1
+        while conn.execute("SELECT 1 FROM entities WHERE id = ?", (eid,)).fetchone():
+            n += 1
+            eid = f"{base}_{n}"
+        return eid
+
+    def _recombine(self, conn, eid: str) -> None:
+        """Rebuild an entity (and its keys) from its mentions; drop it if it has none."""
+        conn.execute("DELETE FROM entity_keys WHERE entity_id = ?", (eid,))
+        rows = conn.execute(f"SELECT {_MENTION_COLUMNS} FROM mentions WHERE entity_id = ?", (eid,)).fetchall()
+        if not rows:
+            conn.execute("DELETE FROM entities WHERE id = ?", (eid,))
+            return
+        mentions = [_mention({**dict(row), "id": eid}) for row in rows]
+        merged = combine(mentions)
+        conn.execute(
+            f"UPDATE entities SET name = ?, label = ?, {', '.join(f'{n} = ?' for n in TEXT_FIELDS)} WHERE id = ?",
+            (merged["name"], merged["label"], *(merged[n] for n in TEXT_FIELDS), eid),
+        )
+        keys = {_key(k) for m in mentions for k in blocking_keys(m.tokens, m.label)}
+        conn.executemany("INSERT OR IGNORE INTO entity_keys VALUES (?, ?)", [(k, eid) for k in keys])
+
+    # ---- reads --------------------------------------------------------
+
+    def entity(self, eid: str) -> Optional[dict]:
+        row = self._conn().execute(f"SELECT {_ENTITY_COLUMNS} FROM entities WHERE id = ?", (eid,)).fetchone()
+        return dict(row) if row else None
+
+    def entities(self, ids: Iterable[str]) -> List[dict]:
+        ids = list(ids)
+        out = []
+        for chunk in _chunks(ids):
+            out.extend(dict(row) for row in self._conn().execute(
+                f"SELECT {_ENTITY_COLUMNS} FROM entities WHERE id IN ({_placeholders(len(chunk))})", chunk
+            ))
+        return out
+
+    def find_entities(self, name: Optional[str] = None, label: Optional[str] = None,
+                      limit: int = 50) -> List[dict]:
+        """By name (normalized, as the resolver sees it) and/or label."""
+        conn = self._conn()
+        if name:
+            keys = [_key(k) for k in blocking_keys(name_tokens(name, label), label)]
+            ids = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT entity_id FROM entity_keys WHERE key IN ({_placeholders(len(keys))})", keys
+            )] if keys else []
+            found = [e for e in self.entities(ids) if label is None or e["label"] == label]
+            return sorted(found, key=lambda e: e["id"])[:limit]
+        sql = f"SELECT {_ENTITY_COLUMNS} FROM entities"
+        params: list = []
+        if label:
+            sql += " WHERE label = ?"
+            params.append(label)
+        return [dict(row) for row in conn.execute(sql + " ORDER BY id LIMIT ?", (*params, limit))]
+
+    def mentions(self, eid: str) -> List[dict]:
+        """Per-document provenance of an entity."""
+        return [dict(row) for row in self._conn().execute(
+            f"SELECT {_MENTION_COLUMNS} FROM mentions WHERE entity_id = ? ORDER BY doc_id", (eid,)
+        )]
+
+    def relations_of(self, ids: Iterable[str], rel: Optional[str] = None,
+                     direction: str = "both") -> List[dict]:
+        """Relations touching any of ids (direction: out | in | both)."""
+        ids = list(ids)
+        sides = {"out": ("head",), "in": ("tail",), "both": ("head", "tail")}[direction]
+        seen, out = set(), []
+        for chunk in _chunks(ids):
+            for side in sides:
+                sql = f"SELECT id, {_RELATION_COLUMNS} FROM relations WHERE {side} IN ({_placeholders(len(chunk))})"
+                params = list(chunk)
+                if rel:
+                    sql += " AND rel = ?"
+                    params.append(rel.upper())
+                for row in self._conn().execute(sql, params):
+                    if row["id"] not in seen:
+                        seen.add(row["id"])
+                        out.append({k: row[k] for k in row.keys() if k != "id"})
+        return out
+
+    def neighbors(self, eid: str, rel: Optional[str] = None, direction: str = "both") -> dict:
+        relations = self.relations_of([eid], rel, direction)
+        ids = {eid} | {r["head"] for r in relations} | {r["tail"] for r in relations}
+        return {"entities": self.entities(ids), "relations": relations}
+
+    def neighborhood(self, eid: str, radius: int = 1, rel: Optional[str] = None,
+                     max_nodes: int = KG_STORE_MAX_NODES) -> dict:
+        """KnowledgeGraph dict of everything within radius hops (capped at max_nodes)."""
+        if self.entity(eid) is None:
+            return {"entities": [], "relations": []}
+        nodes = {eid}
+        frontier = [eid]
+        truncated = False
+        for _ in range(max(0, radius)):
+            if not frontier:
+                break
+            reached = []
+            for r in self.relations_of(frontier, rel):
+                for other in (r["head"], r["tail"]):
+                    if other not in nodes:
+                        if len(nodes) >= max_nodes:
+                            truncated = True
+                            break
+                        nodes.add(other)
+                        reached.append(other)
+            frontier = reached
+        return {**self.subgraph(nodes, rel), "truncated": truncated}
+
+    def subgraph(self, ids: Iterable[str], rel: Optional[str] = None) -> dict:
+        """The entities and the relations among them."""
+        ids = set(ids)
+        relations = [
+            r for r in self.relations_of(sorted(ids), rel, "out") if r["tail"] in ids
+        ]
+        return {"entities": self.entities(ids), "relations": relations}
+
+    def shortest_path(self, src: str, dst: str, max_depth: int = 4,
+                      rel: Optional[str] = None) -> Optional[dict]:
+        """
+        Shortest undirected path as {"entities": [...in order], "relations":
+        [...along it]}; None if there is none within max_depth hops.
+        Bidirectional BFS, one indexed query per level and side.
+        """
+        if src == dst:
+            return {"entities": self.entities([src]), "relations": []} if self.entity(src) else None
+        parents = {src: {src: None}, dst: {dst: None}}  # side -> node -> (prev, relation)
+        frontiers = {src: [src], dst: [dst]}
+        for _ in range(max_depth):
+            side = min((src, dst), key=lambda s: len(frontiers[s]))
+            other = dst if side == src else src
+            if not frontiers[side]:
+                return None
+            reached = []
+            for r in self.relations_of(frontiers[side], rel):
+                for here, there in ((r["head"], r["tail"]), (r["tail"], r["head"])):
+                    if here in parents[side] and there not in parents[side]:
+                        parents[side][there] = (here, r)
+                        reached.append(there)
+                        if there in parents[other]:
+                            return self._path(there, parents[src], parents[dst])
+            frontiers[side] = reached
+        return None
+
+    def _path(self, meet: str, from_src: dict, from_dst: dict) -> dict:
+        nodes, relations = deque([meet]), deque()
+        node = meet
+        while from_src[node] is not None:
+            node, r = from_src[node]
+            nodes.appendleft(node)
+            relations.appendleft(r)
+        node = meet
+        while from_dst[node] is not None:
+            node, r = from_dst[node]
+            nodes.append(node)
+            relations.append(r)
+        by_id = {e["id"]: e for e in self.entities(nodes)}
+        return {"entities": [by_id[n] for n in nodes], "relations": list(relations)}
+
+    def company_graph(self, company_id: str) -> Optional[dict]:
+        """KnowledgeGraph dict of one account's documents (merged entity fields)."""
+        conn = self._conn()
+        docs = [row[0] for row in conn.execute(
+            "SELECT doc_id FROM documents WHERE company_id = ?", (company_id,)
+        )]
+        if not docs:
+            return None
+        ids: Dict[str, None] = {}
+        rows = []
+        for chunk in _chunks(docs):
+            marks = _placeholders(len(chunk))
+            ids.update((row[0], None) for row in conn.execute(
+                f"SELECT DISTINCT entity_id FROM mentions WHERE doc_id IN ({marks})", chunk
+            ))
+            rows.extend(conn.execute(
+                f"SELECT id, {_RELATION_COLUMNS} FROM relations WHERE doc_id IN ({marks})", chunk
+            ))
+        rows.sort(key=lambda row: row["id"])
+        relations = [{k: row[k] for k in row.keys() if k != "id"} for row in rows]
+        return {"entities": self.entities(ids), "relations": relations}
+
+    def company_version(self, company_id: str) -> Optional[int]:
+        """Changes whenever one of the account's documents is upserted; None if it has none."""
+        row = self._conn().execute(
+            "SELECT MAX(updated_ns) FROM documents WHERE company_id = ?", (company_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def companies(self) -> List[str]:
+        return [row[0] for row in self._conn().execute(
+            "SELECT DISTINCT company_id FROM documents ORDER BY company_id"
+        )]
+
+    def dump(self) -> dict:
+        """The whole graph as one KnowledgeGraph dict -- for offline jobs (analytics.py)."""
+        conn = self._conn()
+        return {
+            "entities": [dict(row) for row in conn.execute(f"SELECT {_ENTITY_COLUMNS} FROM entities")],
+            "relations": [dict(row) for row in conn.execute(
+                f"SELECT {_RELATION_COLUMNS} FROM relations ORDER BY id"
+            )],
+        }
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]  # noqa: E731
+        return {
+            "path": self.path,
+            "documents": count("documents"),
+            "entities": count("entities"),
+            "mentions": count("mentions"),
+            "relations": count("relations"),
+            "labels": dict(conn.execute("SELECT label, COUNT(*) FROM entities GROUP BY label").fetchall()),
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+_open: Dict[str, GraphDB] = {}
+_open_lock = threading.Lock()
+
+
+def graph_db(path: str = KG_STORE_PATH) -> Optional[GraphDB]:
+    """The shared store at path for readers (backend): None until a graph was ingested there."""
+    key = os.path.abspath(path)
+    db = _open.get(key)
+    if db is None:
+        if not os.path.exists(key):
+            return None
+        with _open_lock:
+            db = _open.get(key)
+            if db is None:
+                db = _open[key] = GraphDB(path)
+    return db
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Persistent knowledge-graph store.")
+    parser.add_argument("--db", default=KG_STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="upsert KnowledgeGraph JSON files (doc/company id = file stem)")
+    ingest.add_argument("graphs", nargs="+")
+    sub.add_parser("stats")
+    find = sub.add_parser("find")
+    find.add_argument("name", nargs="?")
+    find.add_argument("--label")
+    near = sub.add_parser("neighborhood", help="print (or --html render) an entity's neighborhood")
+    near.add_argument("entity_id")
+    near.add_argument("--radius", type=int, default=1)
+    near.add_argument("--rel")
+    near.add_argument("--max-nodes", type=int, default=KG_STORE_MAX_NODES)
+    near.add_argument("--html")
+    path = sub.add_parser("path")
+    path.add_argument("src")
+    path.add_argument("dst")
+    path.add_argument("--max-depth", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    db = GraphDB(args.db)
+    if args.command == "ingest":
+        for file in args.graphs:
+            with open(file, encoding="utf-8") as f:
+                kg = json.load(f)
+            stem = Path(file).stem
+            print(stem, json.dumps(db.upsert_document(stem, kg, company_id=stem, source=file)))
+        result = db.stats()
+    elif args.command == "stats":
+        result = db.stats()
+    elif args.command == "find":
+        result = db.find_entities(args.name, args.label)
+    elif args.command == "neighborhood":
+        result = db.neighborhood(args.entity_id, args.radius, args.rel, args.max_nodes)
+        if args.html:
+            from backend.kg.graph import build_graph, render_html
+            from backend.kg.layout import compute_layout
+
+            G = build_graph(result)
+            print(render_html(G, args.html, compute_layout(G)))
+            return 0
+    else:
+        result = db.shortest_path(args.src, args.dst, args.max_depth)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+// Knowledge-graph viewer shared by every exported graph (backend/kg/export.py).
+//
+//   index.html?data=data/acme.graph.json.gz
+//   index.html?data=/accounts/acme/graph/viewer&fallback=/knowledge_graph.html
+//
+// The graph file holds node/edge arrays with interned strings and
+// precomputed positions; the free-text details (entity fields, relation
+// evidence) live in a second file that is fetched on the first click.
+// Files may be served gzipped with or without Content-Encoding.
+(function () {
+  "use strict";
+
+  var LOD_NODES = 300;
+  var COLORS = { ORG: "#6aa9ff" };
+  var DEFAULT_COLOR = "#ffb366";
+
+  var params = new URLSearchParams(window.location.search);
+  var dataUrl = params.get("data");
+  var fallback = safeFallback(params.get("fallback"));  // page to show when the graph can't be loaded
+
+  // Only http(s) pages on this origin or on the embedding page's origin
+  // (the frontend that framed the viewer); anything else -- javascript:,
+  // data:, other sites -- is ignored.
+  function safeFallback(value) {
+    if (!value) return null;
+    var url;
+    try {
+      url = new URL(value, window.location.href);
+    } catch (err) {
+      return null;
+    }
+    if (url.protocol !== "http:" && url.protocol !== "https:") return null;
+    var origins = [window.location.origin];
+    try {
+      if (document.referrer) origins.push(new URL(document.referrer).origin);
+    } catch (err) { /* no usable referrer */ }
+    return origins.indexOf(url.origin) >= 0 ? url.href : null;
+  }
+  var status = document.getElementById("status");
+  var panel = document.getElementById("details");
+
+  function fetchJson(url) {
+    return fetch(url).then(function (response) {
+      if (!response.ok) throw new Error(response.status + " " + url);
+      return response.arrayBuffer();
+    }).then(function (buffer) {
+      var bytes = new Uint8Array(buffer);
+      if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+        var stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream("gzip"));
+        return new Response(stream).text().then(JSON.parse);
+      }
+      return JSON.parse(new TextDecoder().decode(bytes));
+    });
+  }
+
+  function escapeHtml(text) {
+    var div = document.createElement("div");
+    div.textContent = text;
+    return div.innerHTML;
+  }
+
+  function draw(data) {
+    var s = data.strings;
+    var n = data.nodes;
+    var e = data.edges;
+    var nodes = new vis.DataSet(n.name.map(function (name, i) {
+      var label = s[n.label[i]];
+      return {
+        id: i,
+        label: s[name],
+        title: s[name] + " (" + label + ")",
+        x: n.x[i],
+        y: n.y[i],
+        color: COLORS[label] || DEFAULT_COLOR,
+        community: n.community[i]
+      };
+    }));
+    var edges = new vis.DataSet(e.source.map(function (source, i) {
+      return {
+        id: i,
+        from: source,
+        to: e.target[i],
+        label: s[e.rel[i]],
+        title: e.page[i] >= 0 ? "p." + e.page[i] : ""
+      };
+    }));
+    var network = new vis.Network(document.getElementById("graph"), { nodes: nodes, edges: edges }, {
+      nodes: { shape: "dot", scaling: { min: 8, max: 36 }, font: { size: 14 } },
+      edges: { arrows: { to: { enabled: true, scaleFactor: 0.7 } }, smooth: false },
+      physics: { enabled: false },
+      interaction: { hideEdgesOnDrag: true, hideEdgesOnZoom: true, hover: true }
+    });
+
+    // level of detail: communities start collapsed, a click opens one
+    if (n.name.length > LOD_NODES) {
+      Object.keys(data.clusters || {}).forEach(function (cid) {
+        var c = data.clusters[cid];
+        network.cluster({
+          joinCondition: function (node) { return String(node.community) === cid; },
+          clusterNodeProperties: {
+            id: "community:" + cid, label: c.label, title: c.title, shape: "dot",
+            size: 12 + 3 * Math.sqrt(c.size), color: "#9aa5b1", borderWidth: 2
+          }
+        });
+      });
+    }
+
+    var details = null;
+    function loadDetails() {
+      if (!details) details = fetchJson(new URL(data.details, new URL(dataUrl, window.location.href)).href);
+      return details;
+    }
+
+    function show(html) {
+      panel.innerHTML = html;
+      panel.style.display = html ? "block" : "none";
+    }
+
+    network.on("click", function (params) {
+      if (params.nodes.length === 1 && network.isCluster(params.nodes[0])) {
+        network.openCluster(params.nodes[0]);
+        return;
+      }
+      if (params.nodes.length === 1) {
+        var i = params.nodes[0];
+        loadDetails().then(function (d) {
+          var rows = d.fields.map(function (field, f) {
+            var text = d.strings[d.nodes[i][f]];
+            return text ? "<dt>" + escapeHtml(field) + "</dt><dd>" + escapeHtml(text) + "</dd>" : "";
+          }).join("");
+          show("<h3>" + escapeHtml(s[n.name[i]]) + "</h3><div>" + escapeHtml(s[n.label[i]]) + "</div><dl>" + rows + "</dl>");
+        });
+      } else if (params.edges.length === 1 && typeof params.edges[0] === "number") {
+        var j = params.edges[0];
+        loadDetails().then(function (d) {
+          show("<h3>" + escapeHtml(s[n.name[e.source[j]]] + " " + s[e.rel[j]] + " " + s[n.name[e.target[j]]]) +
+               "</h3><div>" + (e.page[j] >= 0 ? "p." + e.page[j] + ": " : "") +
+               escapeHtml(d.strings[d.edges[j]] || "") + "</div>");
+        });
+      } else {
+        show("");
+      }
+    });
+    status.textContent = "";
+  }
+
+  if (!dataUrl) {
+    status.textContent = "No graph given (?data=…).";
+    return;
+  }
+  fetchJson(dataUrl).then(draw).catch(function (err) {
+    if (fallback) {
+      window.location.replace(fallback);
+      return;
+    }
+    status.textContent = "Could not load the graph: " + err.message;
+  });
+})();
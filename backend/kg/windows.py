@@ -0,0 +1,119 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from backend.kg.resolution import EntityResolver
+from backend.kg.schema import PROMPT
+
+
+# --------------------------------------------------------------------
+# Page-window extraction for large PDFs
+# --------------------------------------------------------------------
+# A long PDF is split locally into windows of KG_WINDOW_PAGES pages that
+# overlap by KG_WINDOW_OVERLAP pages (so a relation spanning a window
+# boundary is seen whole at least once). Every window is uploaded and
+# extracted on its own, concurrently, into the usual KnowledgeGraph
+# schema; the partial graphs are then merged into one.
+#
+# The model sees a window as a standalone PDF and numbers its pages from
+# 1, so Relation.page is shifted back to the page in the original
+# document when partial graphs are merged.
+#
+# Needs `pip install pypdf`.
+
+KG_WINDOW_MODE = os.getenv("KG_WINDOW_MODE", "auto")  # auto | always | never
+KG_WINDOW_PAGES = int(os.getenv("KG_WINDOW_PAGES", 10))
+KG_WINDOW_OVERLAP = int(os.getenv("KG_WINDOW_OVERLAP", 1))
+KG_WINDOW_WORKERS = int(os.getenv("KG_WINDOW_WORKERS", 16))
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError as exc:
+        raise RuntimeError("page-window extraction requires the 'pypdf' package") from exc
+    return pypdf
+
+
+@dataclass
+class Window:
+    start: int  # first page, 1-based, in the original document
+    end: int    # last page, inclusive
+    data: Optional[bytes] = None  # the window as its own PDF (dropped after upload)
+    file_id: Optional[str] = None
+    kg: Optional[dict] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.start}-{self.end}"
+
+
+def page_count(data: bytes) -> int:
+    return len(_pypdf().PdfReader(io.BytesIO(data)).pages)
+
+
+def plan_windows(pages: int, size: int = KG_WINDOW_PAGES, overlap: int = KG_WINDOW_OVERLAP) -> List[Tuple[int, int]]:
+    """(start, end) page ranges covering 1..pages, consecutive ones sharing overlap pages."""
+    size = max(1, size)
+    step = max(1, size - max(0, overlap))
+    ranges = []
+    start = 1
+    while True:
+        end = min(pages, start + size - 1)
+        ranges.append((start, end))
+        if end >= pages:
+            return ranges
+        start += step
+
+
+def split_pdf(data: bytes, size: int = KG_WINDOW_PAGES, overlap: int = KG_WINDOW_OVERLAP) -> List[Window]:
+    pypdf = _pypdf()
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    windows = []
+    for start, end in plan_windows(len(reader.pages), size, overlap):
+        writer = pypdf.PdfWriter()
+        for i in range(start - 1, end):
+            writer.add_page(reader.pages[i])
+        buf = io.BytesIO()
+        writer.write(buf)
+        windows.append(Window(start, end, buf.getvalue()))
+    return windows
+
+
+def window_prompt(window: Window, pages: int) -> str:
+    return (
+        f"{PROMPT} "
+        f"The attached PDF is an excerpt: pages {window.start}-{window.end} of a "
+        f"{pages}-page document. Number pages within the attached excerpt, starting at 1."
+    )
+
+
+# --------------------------------------------------------------------
+# Reduce: merge partial graphs
+# --------------------------------------------------------------------
+def _shift_page(page: Optional[int], window: Window) -> Optional[int]:
+    if page is None:
+        return None
+    page = int(page)
+    if 1 <= page <= window.end - window.start + 1:
+        return window.start + page - 1
+    # already a document page (the model ignored the instruction)
+    return page if window.start <= page <= window.end else None
+
+
+def merge_graphs(windows: List[Window]) -> dict:
+    """
+    One KnowledgeGraph dict from the windows' partial graphs: relations
+    are paged to the original document, then entities are resolved
+    across windows (resolution.EntityResolver) and relations re-pointed
+    and deduped (overlapping pages yield the same relation twice).
+    """
+    resolver = EntityResolver()
+    for window in sorted(windows, key=lambda w: w.start):
+        relations = [
+            {**r, "page": _shift_page(r.get("page"), window)}
+            for r in window.kg.get("relations", [])
+        ]
+        resolver.add({**window.kg, "relations": relations})
+    return resolver.resolve()
@@ -1,12 +1,104 @@
+import asyncio
+import json
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+from dotenv import load_dotenv
+
+# load .env before any backend module reads its settings (OPENAI_API_KEY, ...)
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 
 # Import Pydantic request/response models
-from backend.models.ask_models import AskRequest, AskResponse
+from backend.models.ask_models import (
+    AskRequest,
+    AskResponse,
+    BatchAskRequest,
+    BatchAskItemResult,
+    BatchAskResponse,
+)
+
+from backend.models.portfolio_models import (
+    PortfolioAskAccount,
+    PortfolioAskRequest,
+    PortfolioAskResponse,
+    PortfolioQueryRequest,
+    PortfolioQueryResponse,
+)
 
 # Import the function that handles Q&A logic
-from backend.services.qa_service import generate_answer
+from backend.services.qa_service import (
+    PORTFOLIO_MAP_MAX_ACCOUNTS,
+    company_label,
+    generate_routed_answer,
+    generate_answers_batch,
+    generate_portfolio_answer,
+    stream_answer,
+)
+
+# Structured fields of every account (columnar, queried in-process)
+from backend.services.portfolio import PortfolioQueryError, portfolio_index
+
+# Persistent knowledge-graph store (entities/relations of all accounts)
+from backend.kg.store import KG_STORE_MAX_NODES, graph_db
+
+# Precomputed per-account subgraphs and centrality (backend/kg/analytics.py)
+from backend.services.graph_analytics import GZIPPED, analytics_store
+
+# In-flight request coalescing counters
+from backend.services.single_flight import single_flight
+
+# Chat sessions
+from backend.services.session_store import session_store
+
+# Account files index (company_id -> file)
+from backend.services.account_store import account_store
+
+# Rate limiting / admission control
+from backend.services.rate_limit import (
+    RateLimited,
+    admission,
+    check_rate_limits,
+    retry_after_header,
+)
+
+# Request deadlines (retries / hedging happen inside this budget)
+from backend.services.upstream import REQUEST_DEADLINE, Deadline, DeadlineExceeded
+
+# Prometheus metrics
+from backend.services.metrics import (
+    REJECTED,
+    REQUESTS,
+    CallbackMetric,
+    MetricsMiddleware,
+    registry,
+    timed,
+)
+
+# Answer cache (hit/miss counters)
+from backend.services.answer_cache import answer_cache
+
+# Shared AsyncOpenAI client lifecycle
+from backend.services.llm_client import close_client
+
+
+# --------------------------------------------------------------------
+# Startup / shutdown: one pooled AsyncOpenAI client per process, created
+# lazily on first use (so each forked worker gets its own) and closed on
+# shutdown after in-flight requests have drained. The account directory
+# is (re)scanned in the background; lookups never wait for it
+# --------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # skips the first scan when preloaded by the production master (serve.py)
+    scanner = asyncio.create_task(account_store.rescan_periodically())
+    yield
+    scanner.cancel()
+    await close_client()
 
 
 # --------------------------------------------------------------------
@@ -16,6 +108,7 @@ app = FastAPI(
     title="Relationship Memory API",
     description="Q&A over organizational relationship memory (Layer 2).",
     version="0.2.0",
+    lifespan=lifespan,
 )
 
 # --------------------------------------------------------------------
@@ -29,34 +122,500 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route HTTP latency histogram
+app.add_middleware(MetricsMiddleware)
+
+
+# --------------------------------------------------------------------
+# Backpressure: rate-limited / overloaded requests get a fast 429
+# --------------------------------------------------------------------
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    REJECTED.inc(reason=exc.reason)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+def request_deadline(request: Request) -> Deadline:
+    """
+    Deadline for this request: X-Request-Timeout header (seconds), capped
+    at REQUEST_DEADLINE, which is also the default.
+    """
+    try:
+        seconds = float(request.headers.get("x-request-timeout", REQUEST_DEADLINE))
+    except ValueError:
+        seconds = REQUEST_DEADLINE
+    return Deadline(min(max(seconds, 0.0), REQUEST_DEADLINE))
+
+
+def client_id(request: Request) -> str:
+    """Caller identity for per-client limits: X-Client-Id header, else IP."""
+    return request.headers.get("x-client-id") or (
+        request.client.host if request.client else "anonymous"
+    )
+
 
 # --------------------------------------------------------------------
 # Endpoint: /ask
 # --------------------------------------------------------------------
 @app.post("/ask", response_model=AskResponse)
-def ask_endpoint(payload: AskRequest):
+async def ask_endpoint(payload: AskRequest, request: Request):
     """
     POST /ask
     Body example:
     {
         "question": "What did we agree on payment terms?",
-        "company_id": "techparts"
+        "company_id": "techparts",
+        "session_id": "optional-client-generated-id"
     }
 
     Returns:
     {
-        "answer": "..."
+        "answer": "...",
+        "session_id": "optional-client-generated-id",
+        "tier": "fast",
+        "model": "gpt-4o-mini"
+    }
+
+    tier/model are the model the answer came from (see model_router.py);
+    both are null for briefing, graph, cached and coalesced answers,
+    which call no model.
+
+    With a session_id, follow-ups are answered with the conversation so
+    far (kept server-side, older turns compacted into a summary).
+    """
+    label = company_label(payload.company_id)
+    REQUESTS.inc(endpoint="/ask", company_id=label)
+    check_rate_limits(client_id(request), payload.company_id)
+    deadline = request_deadline(request)
+    with timed("total", label):
+        answer_text, route = await generate_routed_answer(
+            question=payload.question,
+            company_id=payload.company_id,
+            deadline=deadline,
+            session_id=payload.session_id,
+        )
+        with timed("serialize", label):
+            response = AskResponse(
+                answer=answer_text,
+                session_id=payload.session_id,
+                tier=route.tier if route else None,
+                model=route.model if route else None,
+            )
+    return response
+
+
+# --------------------------------------------------------------------
+# Endpoint: /ask/stream (Server-Sent Events)
+# --------------------------------------------------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(payload: AskRequest, request: Request):
+    """
+    POST /ask/stream
+    Same body as /ask. Responds with text/event-stream:
+
+        event: token
+        data: {"delta": "Payment terms are"}
+
+        ...
+
+        event: done
+        data: {"answer": "...", "company_id": "techparts", "model": "...", "tier": "fast",
+               "usage": {...}, "source": "model", "cached": false}
+
+    source is where the answer came from: "model", "cache", "briefing",
+    "graph" or "unknown_account"; cached is true only for "cache".
+
+    On upstream failure a final `event: error` is sent instead of `done`.
+    """
+
+    REQUESTS.inc(endpoint="/ask/stream", company_id=company_label(payload.company_id))
+    # reject before the 200 + event stream starts
+    check_rate_limits(client_id(request), payload.company_id)
+    admission.check()
+    deadline = request_deadline(request)
+
+    async def event_source():
+        try:
+            async for event in stream_answer(
+                question=payload.question,
+                company_id=payload.company_id,
+                deadline=deadline,
+                session_id=payload.session_id,
+            ):
+                kind = event.pop("type")
+                yield _sse(kind, event)
+        except Exception as exc:
+            yield _sse("error", {"detail": str(exc)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --------------------------------------------------------------------
+# Endpoint: /ask/batch
+# --------------------------------------------------------------------
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+
+
+@app.post("/ask/batch", response_model=BatchAskResponse)
+async def ask_batch_endpoint(payload: BatchAskRequest, request: Request):
+    """
+    POST /ask/batch
+    Body example:
+    {
+        "items": [
+            {"question": "What are the payment terms?", "company_id": "techparts"},
+            {"question": "Red flags?", "company_id": "tacto"}
+        ],
+        "max_concurrency": 8
+    }
+
+    Returns results in request order; failed items carry "error" instead
+    of "answer".
+    """
+    REQUESTS.inc(endpoint="/ask/batch")
+    if len(payload.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload.items)} items (max {BATCH_MAX_ITEMS}).",
+        )
+    # one request for the client, one per item for each item's account;
+    # upstream calls still go through the global admission queue item by item
+    check_rate_limits(client_id(request), *(item.company_id for item in payload.items))
+
+    outcomes = await generate_answers_batch(
+        [(item.question, item.company_id) for item in payload.items],
+        max_concurrency=payload.max_concurrency,
+    )
+    return BatchAskResponse(
+        results=[
+            BatchAskItemResult(
+                question=item.question,
+                company_id=item.company_id,
+                answer=answer,
+                error=error,
+            )
+            for item, (answer, error) in zip(payload.items, outcomes)
+        ]
+    )
+
+
+# --------------------------------------------------------------------
+# Endpoint: /portfolio/query
+# --------------------------------------------------------------------
+@app.post("/portfolio/query", response_model=PortfolioQueryResponse)
+async def portfolio_query_endpoint(payload: PortfolioQueryRequest):
+    """
+    POST /portfolio/query
+    Filter, sort and aggregate structured account fields across the whole
+    portfolio (no LLM). Body examples:
+
+    Accounts Yellow or worse:
+        {"filters": [{"field": "health_rank", "op": "gte", "value": 1}]}
+
+    Where is Net 30 still disputed:
+        {"filters": [{"field": "disputed_terms", "op": "contains", "value": "Net 30"}]}
+
+    Total value at risk with competitor threats:
+        {"filters": [{"field": "competitor_threat", "value": true}],
+         "aggregates": [{"op": "sum", "field": "value_at_risk_eur"}], "limit": 0}
+
+    Fields: see portfolio.COLUMNS. Unknown fields/ops return 400.
+    """
+    REQUESTS.inc(endpoint="/portfolio/query")
+    with timed("portfolio_query"):
+        await asyncio.to_thread(portfolio_index.ensure_fresh, account_store)
+        try:
+            result = portfolio_index.query(
+                filters=[f.model_dump() for f in payload.filters],
+                sort_by=payload.sort_by,
+                descending=payload.descending,
+                limit=payload.limit,
+                fields=payload.fields,
+                aggregates=[a.model_dump() for a in payload.aggregates],
+                group_by=payload.group_by,
+            )
+        except PortfolioQueryError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    return PortfolioQueryResponse(**result)
+
+
+# --------------------------------------------------------------------
+# Endpoint: /portfolio/ask (map-reduce over accounts)
+# --------------------------------------------------------------------
+@app.post("/portfolio/ask", response_model=PortfolioAskResponse)
+async def portfolio_ask_endpoint(payload: PortfolioAskRequest, request: Request):
+    """
+    POST /portfolio/ask
+    Free-text question across accounts, for what /portfolio/query can't
+    express. Body example:
+    {
+        "question": "Which promises are we at risk of breaking this quarter?",
+        "filters": [{"field": "health_rank", "op": "gte", "value": 1}],
+        "max_accounts": 20
     }
+
+    The accounts matching filters (highest value at risk first, at most
+    max_accounts) are each asked the question with bounded concurrency,
+    then one call combines their answers.
     """
-    answer_text = generate_answer(
-        question=payload.question,
-        company_id=payload.company_id,
+    REQUESTS.inc(endpoint="/portfolio/ask")
+    await asyncio.to_thread(portfolio_index.ensure_fresh, account_store)
+    try:
+        selected = portfolio_index.query(
+            filters=[f.model_dump() for f in payload.filters],
+            sort_by="value_at_risk_eur",
+            descending=True,
+            limit=min(payload.max_accounts or PORTFOLIO_MAP_MAX_ACCOUNTS, PORTFOLIO_MAP_MAX_ACCOUNTS),
+            fields=["company_id"],
+        )
+    except PortfolioQueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # every selected account is asked: charge each of them
+    check_rate_limits(client_id(request), *(row["company_id"] for row in selected["rows"]))
+
+    answer, per_account = await generate_portfolio_answer(
+        payload.question,
+        [row["company_id"] for row in selected["rows"]],
+        max_concurrency=payload.max_concurrency,
     )
-    return AskResponse(answer=answer_text)
+    return PortfolioAskResponse(
+        answer=answer,
+        matched=selected["total"],
+        accounts=[
+            PortfolioAskAccount(company_id=c, answer=a, error=e) for c, a, e in per_account
+        ],
+    )
+
+
+# --------------------------------------------------------------------
+# Endpoints: /graph/* (persistent knowledge-graph store)
+# --------------------------------------------------------------------
+def _graph_db():
+    db = graph_db()
+    if db is None:
+        raise HTTPException(status_code=404, detail="No knowledge graph has been ingested.")
+    return db
+
+
+@app.get("/graph/entities")
+def graph_entities_endpoint(name: Optional[str] = None, label: Optional[str] = None, limit: int = 50):
+    """
+    GET /graph/entities?name=M.%20Vogel&label=PERSON
+    Entities across all accounts, by (normalized) name and/or label.
+    """
+    REQUESTS.inc(endpoint="/graph/entities")
+    return {"entities": _graph_db().find_entities(name, label, min(limit, KG_STORE_MAX_NODES))}
+
+
+@app.get("/graph/entities/{entity_id}/neighborhood")
+def graph_neighborhood_endpoint(entity_id: str, radius: int = 1, rel: Optional[str] = None):
+    """
+    GET /graph/entities/{entity_id}/neighborhood?radius=2
+    The entity's neighborhood as a KnowledgeGraph dict (at most
+    KG_STORE_MAX_NODES entities; "truncated" says if the cap was hit).
+    """
+    REQUESTS.inc(endpoint="/graph/neighborhood")
+    with timed("graph_query"):
+        result = _graph_db().neighborhood(entity_id, min(radius, 3), rel)
+    if not result["entities"]:
+        raise HTTPException(status_code=404, detail="Unknown entity.")
+    return result
+
+
+@app.get("/graph/path")
+def graph_path_endpoint(src: str, dst: str, max_depth: int = 4):
+    """
+    GET /graph/path?src=martin_vogel&dst=altus_components
+    Shortest connection between two entities (any relation direction).
+    """
+    REQUESTS.inc(endpoint="/graph/path")
+    with timed("graph_query"):
+        result = _graph_db().shortest_path(src, dst, min(max_depth, 6))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No path within max_depth.")
+    return result
+
+
+# --------------------------------------------------------------------
+# Endpoints: /accounts/{company_id}/graph (precomputed analytics)
+# --------------------------------------------------------------------
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match", "")
+    return any(tag.strip().removeprefix("W/") in (f'"{etag}"', "*") for tag in header.split(","))
+
+
+def _analytics_response(company_id: str, kind: str, request: Request) -> Response:
+    # gzip and identity bodies are different representations: each its own ETag
+    gzipped = kind in GZIPPED and "gzip" in request.headers.get("accept-encoding", "")
+    suffix = "-gz" if gzipped else ""
+    etag = analytics_store.etag(company_id, kind)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="No graph analytics for this account.")
+    headers = {"ETag": f'"{etag}{suffix}"', "Cache-Control": "no-cache"}
+    if kind in GZIPPED:
+        headers["Vary"] = "Accept-Encoding"
+    if _etag_matches(request, etag + suffix):
+        return Response(status_code=304, headers=headers)
+    stored = analytics_store.read(company_id, kind)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No graph analytics for this account.")
+    body, etag = stored  # the manifest may have been reloaded since: use the body's own ETag
+    headers["ETag"] = f'"{etag}{suffix}"'
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    elif kind in GZIPPED:
+        body = analytics_store.decoded(body, kind)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/accounts/{company_id}/graph")
+def account_graph_endpoint(company_id: str, request: Request):
+    """
+    GET /accounts/{company_id}/graph
+    The account's ego subgraph (KG_EGO_RADIUS hops around its company
+    entity) with degree / PageRank / betweenness / community per entity,
+    its most connected people and communities -- precomputed offline
+    (python -m backend.kg.analytics). ETag + If-None-Match -> 304.
+    """
+    REQUESTS.inc(endpoint="/accounts/graph")
+    return _analytics_response(company_id, "analytics", request)
+
+
+@app.get("/accounts/{company_id}/graph/viewer")
+def account_graph_viewer_endpoint(company_id: str, request: Request):
+    """
+    GET /accounts/{company_id}/graph/viewer
+    The same subgraph in the shared viewer's format (positions included):
+    /graph-viewer/index.html?data=/accounts/{company_id}/graph/viewer
+    """
+    REQUESTS.inc(endpoint="/accounts/graph/viewer")
+    return _analytics_response(company_id, "graph", request)
+
+
+@app.get("/accounts/{company_id}/graph/details")
+def account_graph_details_endpoint(company_id: str, request: Request):
+    """
+    GET /accounts/{company_id}/graph/details
+    Entity text fields and relation evidence of the viewer graph (loaded
+    by the viewer on first click).
+    """
+    REQUESTS.inc(endpoint="/accounts/graph/details")
+    return _analytics_response(company_id, "details", request)
+
+
+# the shared static viewer written by the analytics run
+app.mount(
+    "/graph-viewer",
+    StaticFiles(directory=str(analytics_store.viewer_dir), check_dir=False),
+    name="graph-viewer",
+)
+
+
+# --------------------------------------------------------------------
+# Endpoint: DELETE /sessions/{session_id}
+# --------------------------------------------------------------------
+@app.delete("/sessions/{session_id}")
+def delete_session_endpoint(session_id: str):
+    """
+    DELETE /sessions/{session_id}
+    Forget a chat session (e.g. when the user starts a new conversation).
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown session.")
+    return {"deleted": session_id}
+
+
+# --------------------------------------------------------------------
+# Endpoint: /cache/stats
+# --------------------------------------------------------------------
+@app.get("/cache/stats")
+def cache_stats_endpoint():
+    """
+    GET /cache/stats
+    Returns answer-cache backend, size and hit/miss counters.
+    """
+    return answer_cache.stats()
+
+
+# --------------------------------------------------------------------
+# Endpoint: /coalescing/stats
+# --------------------------------------------------------------------
+@app.get("/coalescing/stats")
+def coalescing_stats_endpoint():
+    """
+    GET /coalescing/stats
+    Returns how many upstream calls were issued vs. coalesced onto an
+    identical in-flight call.
+    """
+    return single_flight.stats()
+
+
+# --------------------------------------------------------------------
+# Endpoint: /metrics (Prometheus text format)
+# --------------------------------------------------------------------
+registry.register(CallbackMetric(
+    "answer_cache_hits_total", "Answer cache hits.", lambda: answer_cache.hits, "counter"))
+registry.register(CallbackMetric(
+    "answer_cache_misses_total", "Answer cache misses.", lambda: answer_cache.misses, "counter"))
+registry.register(CallbackMetric(
+    "single_flight_calls_total", "Upstream calls issued.", lambda: single_flight.calls, "counter"))
+registry.register(CallbackMetric(
+    "single_flight_coalesced_total", "Requests coalesced onto an in-flight call.",
+    lambda: single_flight.coalesced, "counter"))
+registry.register(CallbackMetric(
+    "llm_inflight", "Upstream LLM calls in flight.", lambda: admission.inflight))
+registry.register(CallbackMetric(
+    "llm_queued", "Calls waiting for an upstream LLM slot.", lambda: admission.queued))
+registry.register(CallbackMetric(
+    "qa_sessions", "Live chat sessions.", lambda: len(session_store)))
+registry.register(CallbackMetric(
+    "account_store_loaded", "Accounts currently loaded in memory.",
+    lambda: account_store.stats()["loaded"]))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    GET /metrics
+    Prometheus scrape target: per-stage latency histograms, request/error/
+    fallback counters and token usage per company_id and model. One
+    worker's values (labelled worker="<pid>") under backend/serve.py.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# --------------------------------------------------------------------
+# Endpoint: /healthz
+# --------------------------------------------------------------------
+@app.get("/healthz")
+def healthz_endpoint():
+    """
+    GET /healthz
+    Liveness/readiness probe; reports which worker answered.
+    """
+    return {"status": "ok", "pid": os.getpid()}
 
 
 # --------------------------------------------------------------------
-# Local run entrypoint
+# Local run entrypoint (dev, auto-reload).
+# Production: python -m backend.serve --workers N  (see serve.py)
 # --------------------------------------------------------------------
 if __name__ == "__main__":
     import uvicorn
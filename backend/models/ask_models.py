@@ -1,10 +1,40 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
 
 
 class AskRequest(BaseModel):
     question: str
     company_id: str  # e.g. "techparts"
+    session_id: Optional[str] = None  # set to continue a chat conversation
 
 
 class AskResponse(BaseModel):
     answer: str
+    session_id: Optional[str] = None
+    tier: Optional[str] = None  # model tier the question was routed to
+    model: Optional[str] = None
+
+
+class BatchAskItem(BaseModel):
+    # batch items are answered independently and concurrently: no
+    # session_id (a follow-up would race its own conversation) -> 422
+    model_config = ConfigDict(extra="forbid")
+
+    question: str
+    company_id: str
+
+
+class BatchAskRequest(BaseModel):
+    items: List[BatchAskItem]
+    max_concurrency: Optional[int] = None  # capped by BATCH_MAX_CONCURRENCY
+
+
+class BatchAskItemResult(BaseModel):
+    question: str
+    company_id: str
+    answer: Optional[str] = None
+    error: Optional[str] = None  # set instead of answer if this item failed
+
+
+class BatchAskResponse(BaseModel):
+    results: List[BatchAskItemResult]  # same order as request items
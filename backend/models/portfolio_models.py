@@ -0,0 +1,48 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class PortfolioFilter(BaseModel):
+    field: str  # e.g. "health_rank", "disputed_terms", "competitor_threat"
+    op: str = "eq"  # eq, ne, in, gt, gte, lt, lte, contains, exists
+    value: Any = None
+
+
+class PortfolioAggregate(BaseModel):
+    op: str  # count, sum, avg, min, max
+    field: Optional[str] = None  # numeric field; not needed for count
+
+
+class PortfolioQueryRequest(BaseModel):
+    filters: List[PortfolioFilter] = []
+    sort_by: Optional[str] = None
+    descending: bool = False
+    limit: Optional[int] = 100
+    fields: Optional[List[str]] = None  # columns to return (default: all)
+    aggregates: List[PortfolioAggregate] = []
+    group_by: Optional[str] = None
+
+
+class PortfolioQueryResponse(BaseModel):
+    total: int  # rows matching the filters (before limit)
+    rows: List[Dict[str, Any]]
+    aggregates: Optional[Any] = None  # dict, or list of dicts with group_by
+
+
+class PortfolioAskRequest(BaseModel):
+    question: str
+    filters: List[PortfolioFilter] = []  # which accounts to ask (default: all)
+    max_accounts: Optional[int] = None  # capped by PORTFOLIO_MAP_MAX_ACCOUNTS
+    max_concurrency: Optional[int] = None  # capped by BATCH_MAX_CONCURRENCY
+
+
+class PortfolioAskAccount(BaseModel):
+    company_id: str
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PortfolioAskResponse(BaseModel):
+    answer: str
+    matched: int  # accounts matching the filters
+    accounts: List[PortfolioAskAccount]  # the ones actually asked
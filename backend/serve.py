@@ -0,0 +1,153 @@
+"""
+Production entry point: a gunicorn master with N uvicorn workers.
+
+    python -m backend.serve --workers 4 --port 8000
+
+The master imports the app and preloads the account registry (account
+files + retrieval indexes) *before* forking, then freezes the GC so the
+workers share those pages copy-on-write. Per-worker state -- the
+AsyncOpenAI client and its connection pool -- is created lazily in each
+worker's lifespan. SIGTERM drains in-flight requests for up to
+--graceful-timeout seconds before workers exit.
+
+Cold start (master preload, per-worker boot) and memory (RSS/PSS per
+worker) are logged at startup; live values are also on /metrics, where
+each scrape shows the counters of the worker that answered it (samples
+carry a worker="<pid>" label; see services/metrics.py).
+
+For local development keep using `python -m backend.main` (auto-reload).
+"""
+
+import argparse
+import gc
+import logging
+import os
+import time
+
+START = time.monotonic()
+
+# load .env before any backend module reads its settings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from gunicorn.app.base import BaseApplication
+
+from backend.services.metrics import process_memory
+
+MB = 1024 * 1024
+
+# gunicorn's own error log (what server.log / worker.log write to)
+logger = logging.getLogger("gunicorn.error")
+
+
+def _mem_text(mem: dict) -> str:
+    parts = [f"{k}={v / MB:.1f}MB" for k, v in mem.items()]
+    return " ".join(parts)
+
+
+def preload() -> dict:
+    """
+    Index every account file and load up to the store's cache size of
+    accounts (with retrieval indexes) and the portfolio columns into
+    memory, then freeze the GC so
+    forked workers don't dirty the shared pages by touching refcount/GC
+    headers on collection.
+    """
+    from backend.services.account_store import account_store
+    from backend.services.portfolio import portfolio_index
+    from backend.services.retrieval import get_index
+
+    started = time.monotonic()
+    account_store.scan()
+    loaded = 0
+    for company_id in list(account_store)[: account_store.cache_size]:
+        account = account_store.get(company_id)
+        if account is not None:
+            get_index(account)
+            loaded += 1
+    portfolio_index.refresh(account_store)
+    gc.collect()
+    gc.freeze()
+    return {
+        "indexed": len(account_store),
+        "loaded": loaded,
+        "seconds": time.monotonic() - started,
+    }
+
+
+# ---- gunicorn hooks ----------------------------------------------------
+
+def when_ready(server):
+    server.log.info(
+        "master ready in %.2fs (pid %d, %s)",
+        time.monotonic() - START, os.getpid(), _mem_text(process_memory()),
+    )
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.monotonic()
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        "worker %d booted in %.2fs (%.2fs since master start, %s)",
+        os.getpid(),
+        time.monotonic() - getattr(worker, "boot_started", START),
+        time.monotonic() - START,
+        _mem_text(process_memory()),
+    )
+
+
+def worker_exit(server, worker):
+    server.log.info("worker %d exited (%s)", worker.pid, _mem_text(process_memory()))
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # runs once in the master (preload_app=True), before forking
+        from backend.main import app
+
+        stats = preload()
+        logger.info(
+            "preloaded %d/%d accounts in %.2fs (%s)",
+            stats["loaded"], stats["indexed"], stats["seconds"], _mem_text(process_memory()),
+        )
+        return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Relationship Memory API in production mode.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", 30)))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("WORKER_TIMEOUT", 120)))
+    parser.add_argument("--keepalive", type=int, default=int(os.getenv("KEEPALIVE", 5)))
+    args = parser.parse_args(argv)
+
+    ProductionServer({
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.timeout,
+        "keepalive": args.keepalive,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import ast
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from backend.services.answer_cache import context_version
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------------------------
+# Account store
+# --------------------------------------------------------------------
+# Replaces the hand-built ACCOUNT_REGISTRY of imported context modules.
+#
+# On disk: a directory of account files, one per account
+#   - <name>_context.py : COMPANY_ID / COMPANY_NAME / ACCOUNT_CONTEXT as
+#                         plain string literals (the Layer 1 format; read
+#                         with ast, never imported or executed)
+#   - <name>.json       : {"company_id": ..., "company_name": ..., "account_context": ...}
+#
+# In memory:
+#   - an index company_id -> file (built by reading only each file's head),
+#     rebuilt in the background (rescan(), off the event loop); nothing
+#     waits for it: a lookup the index doesn't know yet checks only the
+#     files named after the id (<id>_context.py, <id>.json)
+#   - a bounded LRU of loaded accounts; contexts are parsed on first use
+#   - a cached account's file is re-checked on access (one stat, throttled)
+#     and only that file is re-read when it changed
+
+ACCOUNT_CONTEXT_DIR = os.getenv(
+    "ACCOUNT_CONTEXT_DIR", str(Path(__file__).resolve().parent.parent / "context")
+)
+ACCOUNT_STORE_CACHE_SIZE = int(os.getenv("ACCOUNT_STORE_CACHE_SIZE", 256))
+ACCOUNT_STORE_CHECK_INTERVAL = float(os.getenv("ACCOUNT_STORE_CHECK_INTERVAL", 2.0))
+# full directory rescan (background), for new, removed and renamed files
+ACCOUNT_STORE_SCAN_INTERVAL = float(os.getenv("ACCOUNT_STORE_SCAN_INTERVAL", 30.0))
+ACCOUNT_STORE_STRICT = os.getenv("ACCOUNT_STORE_STRICT", "0") in ("1", "true", "True")
+
+_HEAD_BYTES = 4096
+_PY_ID_RE = re.compile(r"^COMPANY_ID\s*=\s*[\"']([^\"']+)[\"']", re.MULTILINE)
+_JSON_ID_RE = re.compile(r"\"company_id\"\s*:\s*\"([^\"]+)\"")
+
+
+class DuplicateAccountError(ValueError):
+    """Two account files declare the same company_id (strict mode)."""
+
+
+@dataclass
+class Account:
+    company_id: str
+    company_name: str
+    account_context: str
+    path: str
+    mtime_ns: int
+    version: str = ""  # hash of account_context
+    # derived per-account data (e.g. the retrieval index) lives here so it
+    # is dropped together with the account when it is evicted
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.version:
+            self.version = context_version(self.account_context)
+
+
+@dataclass
+class _IndexEntry:
+    path: str
+    mtime_ns: int
+
+
+def _read_company_id(path: Path) -> Optional[str]:
+    """Find a file's company_id by reading its head only."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(_HEAD_BYTES)
+    pattern = _JSON_ID_RE if path.suffix == ".json" else _PY_ID_RE
+    match = pattern.search(head)
+    if match:
+        return match.group(1)
+    # id not in the head: fall back to a full parse
+    return _parse_account_file(path)["company_id"]
+
+
+def _parse_account_file(path: Path) -> Dict[str, str]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        data = json.loads(text)
+        return {
+            "company_id": data["company_id"],
+            "company_name": data.get("company_name") or data["company_id"],
+            "account_context": data["account_context"],
+        }
+
+    values: Dict[str, str] = {}
+    for node in ast.parse(text, filename=str(path)).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Name) and target.id in (
+                "COMPANY_ID", "COMPANY_NAME", "ACCOUNT_CONTEXT"
+            ):
+                values[target.id] = ast.literal_eval(node.value)
+    return {
+        "company_id": values["COMPANY_ID"],
+        "company_name": values.get("COMPANY_NAME") or values["COMPANY_ID"],
+        "account_context": values["ACCOUNT_CONTEXT"],
+    }
+
+
+class AccountStore(Mapping):
+    """
+    company_id -> Account, backed by a directory of account files.
+    Behaves like a read-only dict, so it can stand in for ACCOUNT_REGISTRY.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache_size: int = ACCOUNT_STORE_CACHE_SIZE,
+        check_interval: float = ACCOUNT_STORE_CHECK_INTERVAL,
+        strict: bool = ACCOUNT_STORE_STRICT,
+    ):
+        self.directory = Path(directory)
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.strict = strict
+        self._index: Optional[Dict[str, _IndexEntry]] = None
+        self._file_ids: Dict[str, tuple] = {}  # path -> (company_id, mtime_ns)
+        self._duplicates: Dict[str, List[str]] = {}
+        self._cache: "OrderedDict[str, Account]" = OrderedDict()
+        self._last_checked: Dict[str, float] = {}
+        self._last_scan = 0.0
+        self.loads = 0
+        self.reloads = 0
+
+    # ---- index ------------------------------------------------------
+
+    def _account_files(self) -> List[Path]:
+        files = [
+            p for p in self.directory.iterdir()
+            if p.is_file() and (p.name.endswith("_context.py") or p.suffix == ".json")
+        ]
+        return sorted(files)
+
+    def _read_index(self) -> Tuple[Dict[str, _IndexEntry], Dict[str, tuple], Dict[str, List[str]]]:
+        """
+        (index, file ids, duplicates) from the directory. Files whose
+        mtime hasn't changed since the last scan are not re-read. Touches
+        no shared state, so it can run in a worker thread.
+        """
+        known_ids = self._file_ids
+        file_ids: Dict[str, tuple] = {}
+        claims: Dict[str, List[Path]] = {}
+        mtimes: Dict[str, int] = {}
+        for path in self._account_files():
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            known = known_ids.get(str(path))
+            if known is not None and known[1] == mtime_ns:
+                cid = known[0]
+            else:
+                try:
+                    cid = _read_company_id(path)
+                except Exception as exc:
+                    logger.warning("Skipping unreadable account file %s: %s", path, exc)
+                    continue
+            file_ids[str(path)] = (cid, mtime_ns)
+            claims.setdefault(cid, []).append(path)
+            mtimes[str(path)] = mtime_ns
+
+        index: Dict[str, _IndexEntry] = {}
+        duplicates: Dict[str, List[str]] = {}
+        for cid, paths in claims.items():
+            if len(paths) > 1:
+                duplicates[cid] = [str(p) for p in paths]
+                if self.strict:
+                    raise DuplicateAccountError(
+                        f"company_id {cid!r} declared by {', '.join(p.name for p in paths)}"
+                    )
+                logger.warning(
+                    "Duplicate company_id %r in %s; using %s",
+                    cid, ", ".join(p.name for p in paths), self._pick(cid, paths).name,
+                )
+            chosen = self._pick(cid, paths)
+            index[cid] = _IndexEntry(str(chosen), mtimes[str(chosen)])
+        return index, file_ids, duplicates
+
+    def _install(self, scanned) -> Dict[str, _IndexEntry]:
+        index, file_ids, duplicates = scanned
+        # forget loaded accounts whose file went away or changed owner
+        for cid in list(self._cache):
+            if cid not in index or index[cid].path != self._cache[cid].path:
+                self._cache.pop(cid, None)
+        self._file_ids = file_ids
+        self._index = index
+        self._duplicates = duplicates
+        self._last_scan = time.monotonic()
+        return index
+
+    def scan(self) -> Dict[str, _IndexEntry]:
+        """(Re)build the company_id index now (reads every changed file's head)."""
+        return self._install(self._read_index())
+
+    def entries(self) -> Dict[str, _IndexEntry]:
+        """company_id -> file as on disk now, without installing it as the index."""
+        return self._read_index()[0]
+
+    async def rescan(self) -> Dict[str, _IndexEntry]:
+        """scan() with the directory walk in a worker thread."""
+        return self._install(await asyncio.to_thread(self._read_index))
+
+    async def rescan_periodically(self, interval: float = ACCOUNT_STORE_SCAN_INTERVAL) -> None:
+        """Background task: build the index (unless preloaded), then keep it in line with the directory."""
+        while True:
+            if self._index is not None:
+                await asyncio.sleep(interval)
+            try:
+                await self.rescan()
+            except Exception:
+                logger.exception("Account directory scan failed")
+                if self._index is None:
+                    await asyncio.sleep(interval)
+
+    def _probe(self, company_id: str) -> Optional[_IndexEntry]:
+        """
+        The file for an id the index doesn't know (yet): only the files
+        named after it are looked at, never the whole directory.
+        """
+        for name in (f"{company_id}_context.py", f"{company_id}.json"):
+            path = self.directory / name
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+                if _read_company_id(path) != company_id:
+                    continue
+            except (OSError, ValueError, SyntaxError, KeyError):
+                continue
+            entry = _IndexEntry(str(path), mtime_ns)
+            if self._index is not None:
+                self._index[company_id] = entry
+                self._file_ids[str(path)] = (company_id, mtime_ns)
+            return entry
+        return None
+
+    @staticmethod
+    def _pick(company_id: str, paths: List[Path]) -> Path:
+        """On a duplicate id prefer the file named after it, else the first."""
+        for p in paths:
+            if p.stem in (company_id, f"{company_id}_context"):
+                return p
+        return paths[0]
+
+    @property
+    def indexed(self) -> bool:
+        return self._index is not None
+
+    def _ensure_index(self) -> Dict[str, _IndexEntry]:
+        if self._index is None:
+            return self.scan()
+        return self._index
+
+    # ---- loading ----------------------------------------------------
+
+    def _load(self, company_id: str, entry: _IndexEntry) -> Account:
+        data = _parse_account_file(Path(entry.path))
+        if data["company_id"] != company_id:
+            # the file now declares another id: unknown until the next scan
+            raise KeyError(company_id)
+        self.loads += 1
+        return Account(path=entry.path, mtime_ns=entry.mtime_ns, **data)
+
+    def _current_mtime(self, account: Account) -> Optional[int]:
+        """None while the account's file is unchanged (checked at most every check_interval)."""
+        now = time.monotonic()
+        if now - self._last_checked.get(account.company_id, 0.0) < self.check_interval:
+            return None
+        self._last_checked[account.company_id] = now
+        try:
+            mtime_ns = os.stat(account.path).st_mtime_ns
+        except FileNotFoundError:
+            return -1
+        return None if mtime_ns == account.mtime_ns else mtime_ns
+
+    def _entry(self, company_id: str) -> Optional[_IndexEntry]:
+        entry = self._index.get(company_id) if self._index is not None else None
+        return entry or self._probe(company_id)
+
+    def get(self, company_id: str, default=None) -> Optional[Account]:
+        entry = None
+        account = self._cache.get(company_id)
+        if account is not None:
+            mtime_ns = self._current_mtime(account)
+            if mtime_ns is None:
+                self._cache.move_to_end(company_id)
+                return account
+            # changed or gone: re-read just this file
+            self._cache.pop(company_id, None)
+            self.reloads += 1
+            if mtime_ns >= 0:
+                entry = _IndexEntry(account.path, mtime_ns)
+                if self._index is not None:
+                    self._index[company_id] = entry
+            elif self._index is not None:
+                self._index.pop(company_id, None)
+
+        entry = entry or self._entry(company_id)
+        if entry is None:
+            return default
+        try:
+            account = self._load(company_id, entry)
+        except (KeyError, OSError, ValueError, SyntaxError):
+            if self._index is not None:
+                self._index.pop(company_id, None)
+            return default
+        self._cache[company_id] = account
+        self._last_checked[company_id] = time.monotonic()
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._last_checked.pop(evicted, None)
+        return account
+
+    def read(self, company_id: str, entry: Optional[_IndexEntry] = None) -> Optional[Account]:
+        """
+        The account as currently on disk (at entry, e.g. from entries(),
+        else the indexed file), without touching the LRU. For bulk
+        readers such as the portfolio index; safe in a worker thread.
+        """
+        account = self._cache.get(company_id)
+        if entry is None and self._index is not None:
+            entry = self._index.get(company_id)
+        if account is not None and entry is not None and entry.path == account.path:
+            try:
+                if os.stat(account.path).st_mtime_ns == account.mtime_ns:
+                    return account
+            except FileNotFoundError:
+                return None
+        if entry is None:
+            return None
+        try:
+            data = _parse_account_file(Path(entry.path))
+            mtime_ns = os.stat(entry.path).st_mtime_ns
+        except (OSError, ValueError, SyntaxError, KeyError):
+            return None
+        if data["company_id"] != company_id:
+            return None
+        return Account(path=entry.path, mtime_ns=mtime_ns, **data)
+
+    # ---- Mapping interface -------------------------------------------
+
+    def __getitem__(self, company_id: str) -> Account:
+        account = self.get(company_id)
+        if account is None:
+            raise KeyError(company_id)
+        return account
+
+    def __contains__(self, company_id: object) -> bool:
+        if self._index is not None and company_id in self._index:
+            return True
+        return isinstance(company_id, str) and (
+            company_id in self._cache or self._probe(company_id) is not None
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._ensure_index()))
+
+    def __len__(self) -> int:
+        return len(self._ensure_index())
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "indexed": len(self._index or ()),
+            "loaded": len(self._cache),
+            "cache_size": self.cache_size,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "duplicates": dict(self._duplicates),
+        }
+
+
+account_store = AccountStore(ACCOUNT_CONTEXT_DIR)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+# --------------------------------------------------------------------
+# Answer cache
+# --------------------------------------------------------------------
+# Sits in front of the OpenAI call in qa_service. Keys are built from
+#   company_id + normalized question + hash(ACCOUNT_CONTEXT)
+# so editing a context module changes its hash and old entries simply
+# stop being hit (they age out through LRU / TTL).
+#
+# Backends:
+#   - "memory": in-process OrderedDict with LRU eviction + TTL (default)
+#   - "redis":  shared across workers/pods (needs `pip install redis`)
+
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 4096))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 6 * 3600))
+ANSWER_CACHE_REDIS_URL = os.getenv("ANSWER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing punctuation, so
+    "What are the payment terms?" and "what are the  payment terms" match.
+    """
+    return _WS_RE.sub(" ", question.strip().lower()).rstrip(" ?!.")
+
+
+def context_version(account_context: str) -> str:
+    """Short, stable hash of an account's ACCOUNT_CONTEXT."""
+    return hashlib.sha256(account_context.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(company_id: str, question: str, version: str) -> str:
+    return f"answer:{company_id}:{version}:{normalize_question(question)}"
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """
+    Shared cache in Redis. Eviction is delegated to Redis itself
+    (configure maxmemory-policy allkeys-lru); entries expire after ttl.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError(
+                "ANSWER_CACHE_BACKEND=redis requires the 'redis' package"
+            ) from exc
+        self.ttl = ttl
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        await self._redis.set(key, value, ex=max(1, int(self.ttl)))
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(match="answer:*"):
+            await self._redis.delete(key)
+
+    def __len__(self) -> int:
+        return -1  # unknown without a round trip
+
+
+class AnswerCache:
+    """Backend-agnostic cache front with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            # a broken shared cache must never break /ask
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        try:
+            await self.backend.set(key, value)
+        except Exception:
+            pass
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def _make_backend():
+    if ANSWER_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(ANSWER_CACHE_REDIS_URL, ANSWER_CACHE_TTL)
+    return MemoryCacheBackend(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL)
+
+
+answer_cache = AnswerCache(_make_backend())
@@ -0,0 +1,369 @@
+"""
+Precomputed canonical briefings.
+
+The most common handover questions (payment terms, red flags, first
+conversation, what's at stake, ...) are answered once per account and
+context version at ingest time and served from disk/memory without an LLM
+round trip. /ask routes a question here when it matches a canonical intent
+and the stored answers are for the account's current context version;
+otherwise it falls back to live generation. When a question matches an
+intent but the account has no briefing yet or its context changed, that
+account's briefing is (re)generated in the background -- charged to the
+account's rate limit, only while there is spare upstream capacity, and
+after a failure not again before an exponential backoff has passed.
+
+Generate for every account in ACCOUNT_REGISTRY:
+
+    python -m backend.services.briefings            # only stale/missing
+    python -m backend.services.briefings --force    # everything
+    python -m backend.services.briefings --company techparts
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from backend.services.answer_cache import normalize_question
+from backend.services.metrics import Counter, registry
+from backend.services.rate_limit import admission, company_buckets
+from backend.services.retrieval import tokenize
+
+BRIEFINGS_DIR = os.getenv(
+    "BRIEFINGS_DIR", str(Path(__file__).resolve().parent.parent / "data" / "briefings")
+)
+BRIEFING_QUESTIONS_FILE = os.getenv("BRIEFING_QUESTIONS_FILE")
+BRIEFING_MATCH_THRESHOLD = float(os.getenv("BRIEFING_MATCH_THRESHOLD", 0.6))
+BRIEFING_MAX_QUESTION_TERMS = int(os.getenv("BRIEFING_MAX_QUESTION_TERMS", 8))
+BRIEFING_CONCURRENCY = int(os.getenv("BRIEFING_CONCURRENCY", 8))
+BRIEFING_CACHE_SIZE = int(os.getenv("BRIEFING_CACHE_SIZE", 10_000))
+BRIEFING_CHECK_INTERVAL = float(os.getenv("BRIEFING_CHECK_INTERVAL", 2.0))
+# background regeneration after a failure: wait base * 2**(failures-1), at most max
+BRIEFING_RETRY_BASE = float(os.getenv("BRIEFING_RETRY_BASE", 30.0))
+BRIEFING_RETRY_MAX = float(os.getenv("BRIEFING_RETRY_MAX", 1800.0))
+
+logger = logging.getLogger(__name__)
+
+# intent -> question used for generation + phrasings matched at query time.
+# Override with BRIEFING_QUESTIONS_FILE (same JSON shape).
+DEFAULT_INTENTS: Dict[str, dict] = {
+    "payment_terms": {
+        "question": "What did we agree on payment terms?",
+        "phrasings": [
+            "what did we agree on payment terms",
+            "what are the payment terms",
+            "payment terms",
+            "what are our payment terms",
+        ],
+    },
+    "red_flags": {
+        "question": "What are the red flags to watch?",
+        "phrasings": [
+            "what are the red flags",
+            "red flags",
+            "what red flags should i watch",
+            "what warning signs should i watch for",
+        ],
+    },
+    "first_conversation": {
+        "question": "How should I handle my first conversation as the new account owner?",
+        "phrasings": [
+            "how should i handle my first conversation",
+            "how do i handle the first conversation",
+            "what should i say in my first call",
+            "how should i open the first conversation",
+        ],
+    },
+    "whats_at_stake": {
+        "question": "What's at stake with this account?",
+        "phrasings": [
+            "what is at stake",
+            "whats at stake",
+            "what's at stake with this account",
+            "what do we stand to lose",
+        ],
+    },
+    "relationship_health": {
+        "question": "What is the current relationship health?",
+        "phrasings": [
+            "what is the relationship health",
+            "how healthy is the relationship",
+            "relationship health",
+            "what is the status of the relationship",
+        ],
+    },
+    "key_contact": {
+        "question": "Who is the key contact and how do they prefer to communicate?",
+        "phrasings": [
+            "who is the key contact",
+            "who is the contact",
+            "how does the contact prefer to communicate",
+            "what are the communication preferences",
+        ],
+    },
+}
+
+BRIEFING_HITS = registry.register(Counter(
+    "qa_briefing_hits_total", "Questions answered from a precomputed briefing.", ("intent",),
+))
+BRIEFING_REGENERATIONS = registry.register(Counter(
+    "qa_briefing_regenerations_total", "Briefing (re)generations, by trigger.", ("trigger",),
+))
+
+
+def load_intents() -> Dict[str, dict]:
+    if BRIEFING_QUESTIONS_FILE:
+        with open(BRIEFING_QUESTIONS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return DEFAULT_INTENTS
+
+
+class IntentMatcher:
+    """
+    Maps a question to a canonical intent by term overlap (Jaccard) with
+    the intent's phrasings. Only short questions are routed; anything
+    longer or more specific goes to live generation.
+    """
+
+    def __init__(self, intents: Dict[str, dict]):
+        self._phrasings = [
+            (intent, frozenset(tokenize(p)))
+            for intent, spec in intents.items()
+            for p in spec["phrasings"] + [spec["question"]]
+        ]
+
+    def match(self, question: str) -> Optional[str]:
+        terms = frozenset(tokenize(normalize_question(question)))
+        if not terms or len(terms) > BRIEFING_MAX_QUESTION_TERMS:
+            return None
+        best, best_score = None, 0.0
+        for intent, phrase_terms in self._phrasings:
+            if not phrase_terms:
+                continue
+            score = len(terms & phrase_terms) / len(terms | phrase_terms)
+            if score > best_score:
+                best, best_score = intent, score
+        return best if best_score >= BRIEFING_MATCH_THRESHOLD else None
+
+
+class BriefingStore:
+    """
+    One JSON file per account in BRIEFINGS_DIR:
+        {"company_id": ..., "version": <context hash>, "answers": {intent: answer}}
+    loaded lazily into a bounded in-memory LRU. Cached entries (including
+    "no briefing yet") are rechecked against the file's mtime at most every
+    check_interval seconds, so briefings written by the CLI or another
+    worker are picked up without a restart.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache_size: int = BRIEFING_CACHE_SIZE,
+        check_interval: float = BRIEFING_CHECK_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        # company_id -> (record or None, file mtime_ns or None)
+        self._cache: "OrderedDict[str, Tuple[Optional[dict], Optional[int]]]" = OrderedDict()
+        self._last_checked: Dict[str, float] = {}
+
+    def _path(self, company_id: str) -> Path:
+        return self.directory / f"{company_id}.json"
+
+    def _mtime_ns(self, company_id: str) -> Optional[int]:
+        try:
+            return self._path(company_id).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, company_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        cached = self._cache.get(company_id)
+        if cached is not None:
+            if now - self._last_checked.get(company_id, 0.0) < self.check_interval:
+                self._cache.move_to_end(company_id)
+                return cached[0]
+            mtime_ns = self._mtime_ns(company_id)
+            self._last_checked[company_id] = now
+            if mtime_ns == cached[1]:
+                self._cache.move_to_end(company_id)
+                return cached[0]
+        else:
+            mtime_ns = self._mtime_ns(company_id)
+            self._last_checked[company_id] = now
+        record = None
+        if mtime_ns is not None:
+            try:
+                with open(self._path(company_id), encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+        self._remember(company_id, record, mtime_ns)
+        return record
+
+    def put(self, company_id: str, version: str, answers: Dict[str, str]) -> None:
+        record = {"company_id": company_id, "version": version, "answers": answers}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(company_id).with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._path(company_id))
+        self._last_checked[company_id] = time.monotonic()
+        self._remember(company_id, record, self._mtime_ns(company_id))
+
+    def _remember(self, company_id: str, record: Optional[dict], mtime_ns: Optional[int]) -> None:
+        self._cache[company_id] = (record, mtime_ns)
+        self._cache.move_to_end(company_id)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._last_checked.pop(evicted, None)
+
+
+intents = load_intents()
+matcher = IntentMatcher(intents)
+briefing_store = BriefingStore(BRIEFINGS_DIR)
+
+# answer_fn(question, company_id) -> answer; provided by qa_service
+AnswerFn = Callable[[str, str], Awaitable[str]]
+
+_regenerating: Set[str] = set()
+_background: Set[asyncio.Task] = set()
+# company_id -> (consecutive failures, monotonic time before which not to retry)
+_failures: Dict[str, Tuple[int, float]] = {}
+
+
+def lookup(question: str, account) -> Optional[tuple]:
+    """
+    (intent, answer) if the question matches a canonical intent and a
+    briefing for the account's current context version exists, else None.
+    """
+    intent = matcher.match(question)
+    if intent is None:
+        return None
+    record = briefing_store.get(account.company_id)
+    if record is None or record.get("version") != account.version:
+        return None
+    answer = record["answers"].get(intent)
+    if answer is None:
+        return None
+    BRIEFING_HITS.inc(intent=intent)
+    return intent, answer
+
+
+def is_stale(account) -> bool:
+    """No briefing yet, or one generated from an older context version."""
+    record = briefing_store.get(account.company_id)
+    return record is None or record.get("version") != account.version
+
+
+def context_changed(account) -> bool:
+    """A briefing exists but was generated from an older context version."""
+    record = briefing_store.get(account.company_id)
+    return record is not None and record.get("version") != account.version
+
+
+async def generate(account, answer_fn: AnswerFn, concurrency: int = BRIEFING_CONCURRENCY) -> Dict[str, str]:
+    """Answer every canonical question for one account and store the result."""
+    version = account.version
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(intent: str, spec: dict):
+        async with semaphore:
+            return intent, await answer_fn(spec["question"], account.company_id)
+
+    results = await asyncio.gather(*(one(i, spec) for i, spec in intents.items()))
+    answers = dict(results)
+    briefing_store.put(account.company_id, version, answers)
+    return answers
+
+
+def schedule_regeneration(question: str, account, answer_fn: AnswerFn) -> bool:
+    """
+    Generate a missing or stale briefing in the background, once per
+    account at a time, if the question matches a canonical intent. The
+    calls are charged to the account's rate limit up front, go through
+    admission control like any other model call, and are not started when
+    the upstream has no spare capacity or the account is backing off after
+    a failed run. Returns whether a run was started.
+    """
+    company_id = account.company_id
+    if company_id in _regenerating or matcher.match(question) is None or not is_stale(account):
+        return False
+    _, retry_at = _failures.get(company_id, (0, 0.0))
+    if time.monotonic() < retry_at or not admission.has_capacity():
+        return False
+    allowed, _ = company_buckets.try_acquire(company_id, cost=len(intents))
+    if not allowed:
+        return False
+    _regenerating.add(company_id)
+    BRIEFING_REGENERATIONS.inc(trigger="context_changed" if context_changed(account) else "missing")
+
+    async def run():
+        try:
+            await generate(account, answer_fn)
+            _failures.pop(company_id, None)
+        except Exception:
+            failures = _failures.get(company_id, (0, 0.0))[0] + 1
+            delay = min(BRIEFING_RETRY_MAX, BRIEFING_RETRY_BASE * 2 ** (failures - 1))
+            _failures[company_id] = (failures, time.monotonic() + delay)
+            logger.exception(
+                "Briefing generation for %s failed (%d in a row); next attempt in %.0fs",
+                company_id, failures, delay,
+            )
+        finally:
+            _regenerating.discard(company_id)
+
+    task = asyncio.ensure_future(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return True
+
+
+# --------------------------------------------------------------------
+# Ingest CLI
+# --------------------------------------------------------------------
+async def generate_all(company_ids: List[str], force: bool, answer_fn: AnswerFn, accounts) -> dict:
+    report = {"generated": [], "skipped": [], "failed": {}}
+    for company_id in company_ids:
+        account = accounts.get(company_id)
+        if account is None:
+            report["failed"][company_id] = "unknown company_id"
+            continue
+        if not force and not is_stale(account):
+            report["skipped"].append(company_id)
+            continue
+        try:
+            await generate(account, answer_fn)
+            BRIEFING_REGENERATIONS.inc(trigger="ingest")
+            report["generated"].append(company_id)
+        except Exception as exc:
+            report["failed"][company_id] = f"{type(exc).__name__}: {exc}"
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute canonical briefings per account.")
+    parser.add_argument("--company", action="append", help="only this company_id (repeatable)")
+    parser.add_argument("--force", action="store_true", help="regenerate even if up to date")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from backend.services.qa_service import ACCOUNT_REGISTRY, generate_live_answer
+
+    company_ids = args.company or list(ACCOUNT_REGISTRY)
+    report = asyncio.run(generate_all(company_ids, args.force, generate_live_answer, ACCOUNT_REGISTRY))
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+import gzip
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from backend.kg.analytics import ACCOUNT_FILES, KG_ANALYTICS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------------------------
+# Precomputed per-account graph analytics (read side)
+# --------------------------------------------------------------------
+# backend/kg/analytics.py writes, per account, the analytics JSON and the
+# ego graph in the shared viewer's format under content-addressed names,
+# plus manifest.json with the ETag and file name of each. This serves them
+# as stored:
+#
+#   - the manifest is re-read when it changes (mtime check, throttled),
+#     so a new analytics run is picked up without a restart;
+#   - ETags come from the manifest, so a revalidation (If-None-Match)
+#     is answered without touching the account's files;
+#   - file bytes sit in a small LRU keyed by ETag; the viewer files are
+#     kept gzipped and sent with Content-Encoding: gzip.
+
+GRAPH_ANALYTICS_CACHE_SIZE = int(os.getenv("GRAPH_ANALYTICS_CACHE_SIZE", 256))
+GRAPH_ANALYTICS_CHECK_INTERVAL = float(os.getenv("GRAPH_ANALYTICS_CHECK_INTERVAL", 2.0))
+
+KINDS = tuple(ACCOUNT_FILES)  # analytics | graph | details
+GZIPPED = frozenset({"graph", "details"})
+
+
+class AnalyticsStore:
+    def __init__(
+        self,
+        directory: str = KG_ANALYTICS_DIR,
+        cache_size: int = GRAPH_ANALYTICS_CACHE_SIZE,
+        check_interval: float = GRAPH_ANALYTICS_CHECK_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.viewer_dir = self.directory / "viewer"
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._manifest: Dict[str, dict] = {}
+        self._manifest_mtime_ns: Optional[int] = None
+        self._last_checked = 0.0
+        self._cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._last_checked < self.check_interval:
+            return
+        self._last_checked = now
+        path = self.directory / "manifest.json"
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            self._manifest, self._manifest_mtime_ns = {}, None
+            return
+        if mtime_ns == self._manifest_mtime_ns:
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime_ns = mtime_ns
+        except (OSError, ValueError) as exc:
+            logger.warning("Skipping unreadable graph analytics manifest %s: %s", path, exc)
+
+    def etag(self, company_id: str, kind: str) -> Optional[str]:
+        self._refresh()
+        return self._manifest.get(company_id, {}).get(kind)
+
+    def read(self, company_id: str, kind: str) -> Optional[Tuple[bytes, str]]:
+        """(body as stored, etag), or None if the account has no analytics."""
+        etag = self.etag(company_id, kind)
+        if etag is None:
+            return None
+        key = (company_id, kind, etag)
+        body = self._cache.get(key)
+        if body is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return body, etag
+        # the file is named by its content, so its bytes always match etag
+        name = self._manifest[company_id].get("files", {}).get(kind)
+        try:
+            body = (self.directory / "accounts" / name).read_bytes()
+        except (OSError, TypeError):
+            return None
+        self.misses += 1
+        self._cache[key] = body
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return body, etag
+
+    @staticmethod
+    def decoded(body: bytes, kind: str) -> bytes:
+        """The plain JSON, for clients that don't accept gzip."""
+        return gzip.decompress(body) if kind in GZIPPED else body
+
+    def stats(self) -> dict:
+        self._refresh()
+        return {
+            "directory": str(self.directory),
+            "accounts": len(self._manifest),
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+analytics_store = AnalyticsStore()
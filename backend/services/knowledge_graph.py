@@ -0,0 +1,406 @@
+"""
+Structured fast path over the extracted knowledge graph.
+
+kg4.py extracts typed entities (name, label, information, payment,
+logistics, health, preferences, red_flags) and relations (head, rel, tail,
+page, evidence) from an account's documents. Saved per account as
+
+    <KNOWLEDGE_GRAPH_DIR>/<company_id>.json   # KnowledgeGraph.model_dump()
+
+or, once ingested, read from the persistent graph store (KG_STORE_PATH,
+backend/kg/store.py, which takes precedence and carries entity fields
+merged across all documents),
+
+the graph answers direct lookups -- "who is the key contact", "what are
+the red flags for Martin Vogel", "who is X related to" -- in well under a
+millisecond, citing the evidence it came from. Anything open-ended
+(or not covered by the graph) returns None and goes to the model.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from backend.kg.store import KG_STORE_PATH, graph_db
+from backend.services.answer_cache import normalize_question
+from backend.services.metrics import Counter, registry
+from backend.services.retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_GRAPH_DIR = os.getenv(
+    "KNOWLEDGE_GRAPH_DIR", str(Path(__file__).resolve().parent.parent / "data" / "graphs")
+)
+KG_FAST_PATH_ENABLED = os.getenv("KG_FAST_PATH_ENABLED", "1") not in ("0", "false", "False")
+KG_CACHE_SIZE = int(os.getenv("KG_CACHE_SIZE", 256))
+KG_CHECK_INTERVAL = float(os.getenv("KG_CHECK_INTERVAL", 2.0))
+KG_MAX_QUESTION_TERMS = int(os.getenv("KG_MAX_QUESTION_TERMS", 10))
+KG_MAX_RELATIONS = int(os.getenv("KG_MAX_RELATIONS", 8))
+
+# entity field -> how it's named in an answer
+FIELDS = {
+    "red_flags": "Red flags",
+    "payment": "Payment",
+    "logistics": "Logistics",
+    "health": "Relationship health",
+    "preferences": "Preferences",
+    "information": "Information",
+}
+
+# question pattern -> entity field; first match wins
+_FIELD_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bred flags?\b|\bwarning signs?\b"), "red_flags"),
+    (re.compile(r"\bpayments?\b|\bnet \d+\b|\binvoic"), "payment"),
+    (re.compile(r"\blogistics\b|\bdeliver|\bdispatch\b|\bshipping\b"), "logistics"),
+    (re.compile(r"\bhealth\b|\bhealthy\b"), "health"),
+    (re.compile(r"\bpreferences?\b|\bprefers?\b|\blikes?\b"), "preferences"),
+]
+# kinds about people/organisations and how they connect; /ask tries these
+# before the canonical briefings (the rest are field lookups)
+ENTITY_KINDS = frozenset({"key_contact", "relations", "who_is"})
+
+_KEY_CONTACT_RE = re.compile(r"\b(key|main|primary) (contact|person|stakeholder)\b")
+_RELATIONS_RE = re.compile(
+    r"\b(related|connected|linked) (to|with)\b|\brelations?(hips?)? (of|with|between)\b"
+    r"|\bwho (does|do) .+ work with\b|\bconnections?\b"
+)
+_WHO_IS_RE = re.compile(r"^(who|what) is\b|^tell me about\b")
+# reasoning / advice questions always go to the model
+_OPEN_ENDED_RE = re.compile(
+    r"\b(why|should|how (do|can|should|would)|explain|recommend|suggest|strategy|compare|summari[sz]e)\b"
+)
+_KEY_CONTACT_HINT_RE = re.compile(r"\b(key|main|primary) contact\b|\bdecision[- ]maker\b", re.I)
+
+# extraction fills unknown fields with "", "0", "none", ...
+_EMPTY_VALUES = frozenset({"", "0", "none", "n/a", "na", "unknown", "null", "-"})
+
+KG_HITS = registry.register(Counter(
+    "qa_kg_hits_total", "Questions answered from the knowledge graph.", ("kind",),
+))
+
+
+def _present(value) -> bool:
+    return value is not None and str(value).strip().lower() not in _EMPTY_VALUES
+
+
+@dataclass
+class GraphIndex:
+    """One account's graph, indexed for lookups."""
+
+    company_id: str
+    path: str
+    mtime_ns: int  # file mtime, or the store's update time of the account
+    entities: Dict[str, dict]
+    relations: List[dict]
+    # entity id -> indexes into relations (either direction)
+    edges: Dict[str, List[int]] = field(default_factory=dict)
+    # entity id -> name terms; term -> entity ids
+    name_terms: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    term_index: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, company_id: str, path: str, mtime_ns: int, data: dict) -> "GraphIndex":
+        entities: Dict[str, dict] = {}
+        for e in data.get("entities", []):
+            eid = e.get("id") or e.get("name", "").lower().strip()
+            if eid:
+                entities[eid] = e
+        relations = [
+            r for r in data.get("relations", [])
+            if r.get("head") in entities and r.get("tail") in entities
+        ]
+        graph = cls(company_id, path, mtime_ns, entities, relations)
+        for i, r in enumerate(relations):
+            graph.edges.setdefault(r["head"], []).append(i)
+            if r["tail"] != r["head"]:
+                graph.edges.setdefault(r["tail"], []).append(i)
+        for eid, e in entities.items():
+            terms = frozenset(tokenize(e.get("name") or eid))
+            graph.name_terms[eid] = terms
+            for term in terms:
+                graph.term_index.setdefault(term, []).append(eid)
+        return graph
+
+    def name(self, eid: str) -> str:
+        return self.entities[eid].get("name") or eid
+
+    def find_entity(self, terms: FrozenSet[str]) -> Optional[str]:
+        """
+        The entity named in a question: the one with the most name terms
+        in it, all of them for multi-word names ("martin vogel"), or a
+        single term that names exactly one entity ("vogel").
+        """
+        candidates: Dict[str, int] = {}
+        for term in terms:
+            for eid in self.term_index.get(term, ()):
+                candidates[eid] = candidates.get(eid, 0) + 1
+        if not candidates:
+            return None
+        full = [eid for eid, n in candidates.items() if n == len(self.name_terms[eid])]
+        if full:
+            return max(full, key=lambda eid: (len(self.name_terms[eid]), len(self.edges.get(eid, ()))))
+        partial = [eid for eid, n in candidates.items() if n == max(candidates.values())]
+        return partial[0] if len(partial) == 1 else None
+
+    def key_contact(self) -> Optional[str]:
+        """A person described as the key contact, else the best-connected person."""
+        people = [eid for eid, e in self.entities.items() if e.get("label") == "PERSON"]
+        for eid in people:
+            e = self.entities[eid]
+            if _KEY_CONTACT_HINT_RE.search(f"{e.get('information', '')} {e.get('name', '')}"):
+                return eid
+        if not people:
+            return None
+        return max(people, key=lambda eid: len(self.edges.get(eid, ())))
+
+    def primary_org(self) -> Optional[str]:
+        orgs = [eid for eid, e in self.entities.items() if e.get("label") == "ORG"]
+        if not orgs:
+            return None
+        return max(orgs, key=lambda eid: len(self.edges.get(eid, ())))
+
+    def pages(self, eid: str) -> List[int]:
+        return sorted({
+            self.relations[i]["page"] for i in self.edges.get(eid, ())
+            if self.relations[i].get("page") is not None
+        })
+
+
+_MISSING = object()
+
+
+class GraphStore:
+    """
+    company_id -> GraphIndex, loaded lazily from the graph store (or, for
+    accounts not in it, KNOWLEDGE_GRAPH_DIR) into a bounded LRU. A changed
+    graph is re-indexed on access (version check, throttled); untouched
+    accounts are never re-read.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache_size: int = KG_CACHE_SIZE,
+        check_interval: float = KG_CHECK_INTERVAL,
+        store_path: Optional[str] = KG_STORE_PATH,
+    ):
+        self.directory = Path(directory)
+        self.store_path = store_path
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        # None caches "no graph for this account" (until the check interval)
+        self._cache: "OrderedDict[str, Optional[GraphIndex]]" = OrderedDict()
+        self._last_checked: Dict[str, float] = {}
+        self.loads = 0
+
+    def _path(self, company_id: str) -> Path:
+        return self.directory / f"{company_id}.json"
+
+    def _db(self):
+        return graph_db(self.store_path) if self.store_path else None
+
+    def _mtime_ns(self, company_id: str) -> Optional[int]:
+        db = self._db()
+        if db is not None:
+            version = db.company_version(company_id)
+            if version is not None:
+                return version
+        try:
+            return self._path(company_id).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _cached(self, company_id: str, now: float):
+        """The cached graph (or None) while within the check interval, else _MISSING."""
+        if company_id in self._cache and now - self._last_checked.get(company_id, 0.0) < self.check_interval:
+            self._cache.move_to_end(company_id)
+            return self._cache[company_id]
+        return _MISSING
+
+    def _current(self, company_id: str, cached) -> Optional[GraphIndex]:
+        """cached if the graph's version is unchanged, else (re)loaded (blocking I/O)."""
+        mtime_ns = self._mtime_ns(company_id)
+        if cached is not _MISSING and (
+            (cached is None and mtime_ns is None)
+            or (cached is not None and cached.mtime_ns == mtime_ns)
+        ):
+            return cached
+        return self._load(company_id, mtime_ns) if mtime_ns is not None else None
+
+    def _install(self, company_id: str, graph: Optional[GraphIndex]) -> None:
+        self._cache[company_id] = graph
+        self._cache.move_to_end(company_id)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._last_checked.pop(evicted, None)
+
+    def get(self, company_id: str) -> Optional[GraphIndex]:
+        now = time.monotonic()
+        graph = self._cached(company_id, now)
+        if graph is not _MISSING:
+            return graph
+        self._last_checked[company_id] = now
+        graph = self._current(company_id, self._cache.get(company_id, _MISSING))
+        self._install(company_id, graph)
+        return graph
+
+    async def aget(self, company_id: str) -> Optional[GraphIndex]:
+        """get() for the event loop: the version check and any load run in a worker thread."""
+        now = time.monotonic()
+        graph = self._cached(company_id, now)
+        if graph is not _MISSING:
+            return graph
+        self._last_checked[company_id] = now
+        graph = await asyncio.to_thread(self._current, company_id, self._cache.get(company_id, _MISSING))
+        self._install(company_id, graph)
+        return graph
+
+    def _load(self, company_id: str, mtime_ns: int) -> Optional[GraphIndex]:
+        db = self._db()
+        data = db.company_graph(company_id) if db is not None else None
+        if data is not None:
+            self.loads += 1
+            return GraphIndex.build(company_id, f"{db.path}#{company_id}", mtime_ns, data)
+        path = self._path(company_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning("Skipping unreadable knowledge graph %s: %s", path, exc)
+            return None
+        self.loads += 1
+        return GraphIndex.build(company_id, str(path), mtime_ns, data)
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "store": self.store_path if self._db() is not None else None,
+            "loaded": sum(1 for g in self._cache.values() if g is not None),
+            "cache_size": self.cache_size,
+            "loads": self.loads,
+        }
+
+
+graph_store = GraphStore(KNOWLEDGE_GRAPH_DIR)
+
+
+# --------------------------------------------------------------------
+# Answers
+# --------------------------------------------------------------------
+def _source(graph: GraphIndex, eid: str) -> str:
+    pages = graph.pages(eid)
+    where = f", p. {', '.join(map(str, pages))}" if pages else ""
+    return f"Source: knowledge graph entity '{graph.name(eid)}'{where}."
+
+
+def _field_answer(graph: GraphIndex, eid: str, field_name: str) -> Optional[str]:
+    value = graph.entities[eid].get(field_name)
+    if not _present(value):
+        return None
+    return f"{FIELDS[field_name]} for {graph.name(eid)}: {str(value).strip()}\n\n{_source(graph, eid)}"
+
+
+def _who_is_answer(graph: GraphIndex, eid: str, heading: Optional[str] = None) -> Optional[str]:
+    e = graph.entities[eid]
+    lines = [heading or f"{graph.name(eid)} ({e.get('label') or 'OTHER'})"]
+    for field_name in ("information", "preferences", "red_flags"):
+        if _present(e.get(field_name)):
+            lines.append(f"- {FIELDS[field_name]}: {str(e[field_name]).strip()}")
+    if len(lines) == 1:
+        return None
+    return "\n".join(lines) + f"\n\n{_source(graph, eid)}"
+
+
+def _relations_answer(graph: GraphIndex, eid: str) -> Optional[str]:
+    edge_ids = graph.edges.get(eid, [])
+    if not edge_ids:
+        return None
+    lines = [f"{graph.name(eid)} is connected to:"]
+    for i in edge_ids[:KG_MAX_RELATIONS]:
+        r = graph.relations[i]
+        other = r["tail"] if r["head"] == eid else r["head"]
+        arrow = f"{r.get('rel') or 'REL'} ->" if r["head"] == eid else f"<- {r.get('rel') or 'REL'}"
+        line = f"- {arrow} {graph.name(other)}"
+        cite = []
+        if r.get("page") is not None:
+            cite.append(f"p. {r['page']}")
+        if _present(r.get("evidence")):
+            cite.append(f"\"{str(r['evidence']).strip()}\"")
+        if cite:
+            line += f" ({': '.join(cite)})"
+        lines.append(line)
+    if len(edge_ids) > KG_MAX_RELATIONS:
+        lines.append(f"- ... and {len(edge_ids) - KG_MAX_RELATIONS} more")
+    return "\n".join(lines)
+
+
+def _terms(question: str) -> Optional[Tuple[str, FrozenSet[str]]]:
+    """(normalized text, terms) of a question the graph may answer, else None."""
+    if not KG_FAST_PATH_ENABLED:
+        return None
+    text = normalize_question(question)
+    terms = frozenset(tokenize(text))
+    if not terms or len(terms) > KG_MAX_QUESTION_TERMS or _OPEN_ENDED_RE.search(text):
+        return None
+    return text, terms
+
+
+def _lookup(text: str, terms: FrozenSet[str], graph: Optional[GraphIndex]) -> Optional[Tuple[str, str]]:
+    if graph is None or not graph.entities:
+        return None
+
+    eid = graph.find_entity(terms)
+    result: Optional[Tuple[str, Optional[str]]] = None
+
+    if _KEY_CONTACT_RE.search(text):
+        contact = graph.key_contact()
+        if contact is not None:
+            result = ("key_contact", _who_is_answer(
+                graph, contact, f"Key contact: {graph.name(contact)}"
+            ))
+    elif eid is not None and _RELATIONS_RE.search(text):
+        result = ("relations", _relations_answer(graph, eid))
+    else:
+        for pattern, field_name in _FIELD_PATTERNS:
+            if pattern.search(text):
+                # org-level fields default to the account's main organisation
+                target = eid
+                if target is None and field_name in ("payment", "logistics", "health"):
+                    target = graph.primary_org()
+                if target is not None:
+                    result = (field_name, _field_answer(graph, target, field_name))
+                break
+        else:
+            if eid is not None and _WHO_IS_RE.search(text):
+                result = ("who_is", _who_is_answer(graph, eid))
+
+    if result is None or result[1] is None:
+        return None
+    return result
+
+
+def answer(question: str, company_id: str) -> Optional[Tuple[str, str]]:
+    """
+    (kind, answer) for a direct factual lookup the account's graph can
+    answer, else None (open-ended, no graph, entity or field unknown).
+    The caller counts the answers it uses in KG_HITS.
+    """
+    parsed = _terms(question)
+    if parsed is None:
+        return None
+    return _lookup(*parsed, graph_store.get(company_id))
+
+
+async def answer_async(question: str, company_id: str) -> Optional[Tuple[str, str]]:
+    """answer() without blocking the event loop on the graph store."""
+    parsed = _terms(question)
+    if parsed is None:
+        return None
+    return _lookup(*parsed, await graph_store.aget(company_id))
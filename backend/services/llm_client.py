@@ -0,0 +1,59 @@
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+
+# --------------------------------------------------------------------
+# Shared AsyncOpenAI client
+# --------------------------------------------------------------------
+# One client (and one pooled HTTP connection pool) per process. It is
+# created on first use -- never in a pre-fork master, so each worker owns
+# its sockets -- and closed on shutdown; every request reuses warm
+# keep-alive connections instead of opening new ones.
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 1000))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", 100))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30.0))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60.0))
+# retries are handled deadline-aware in upstream.py, not by the SDK
+OPENAI_SDK_MAX_RETRIES = int(os.getenv("OPENAI_SDK_MAX_RETRIES", 0))
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def init_client() -> AsyncOpenAI:
+    """Create the shared AsyncOpenAI client (idempotent)."""
+    global _client
+    if _client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=OPENAI_TIMEOUT,
+        )
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            max_retries=OPENAI_SDK_MAX_RETRIES,
+        )
+    return _client
+
+
+def get_client() -> AsyncOpenAI:
+    """Return the shared client, creating it on first use."""
+    return _client or init_client()
+
+
+async def close_client() -> None:
+    """
+    Close the shared client and its connection pool.
+    Called from the FastAPI shutdown hook.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
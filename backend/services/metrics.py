@@ -0,0 +1,248 @@
+import os
+import resource
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+# --------------------------------------------------------------------
+# Minimal Prometheus metrics
+# --------------------------------------------------------------------
+# Counters and histograms with labels, rendered in the Prometheus text
+# exposition format on GET /metrics. Recording a sample is a dict lookup
+# plus a bisect -- no locks (single event loop per process), no I/O.
+#
+# Values are per process. Under backend/serve.py each worker keeps its own
+# and a scrape is answered by whichever worker gets it, so every sample
+# carries a worker="<pid>" label: query with sum without (worker) (...)
+# and treat a series as one worker's view, not the server's.
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    # the pid at render time: workers are forked after this module is imported
+    parts.append(f'worker="{os.getpid()}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Unlabelled counter or gauge whose value is read from a callback at
+    scrape time (for stats other modules already keep, e.g. cache hits).
+    """
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.doc = doc
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.doc}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name}{_labels_text((), ())} {float(self.fn())}",
+        ]
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._series[key] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels_text(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            le = _labels_text(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {total[0]}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---- Q&A service metrics ---------------------------------------------
+
+STAGE_SECONDS = registry.register(Histogram(
+    "qa_stage_duration_seconds",
+    "Time spent per /ask stage (registry_lookup, cache_lookup, prompt_build, llm, serialize, total).",
+    ("stage", "company_id", "model"),
+))
+REQUESTS = registry.register(Counter(
+    "qa_requests_total", "Q&A requests handled.", ("endpoint", "company_id"),
+))
+ERRORS = registry.register(Counter(
+    "qa_errors_total", "Q&A requests that failed, by stage and exception type.",
+    ("stage", "error"),
+))
+FALLBACKS = registry.register(Counter(
+    "qa_fallbacks_total", "Requests answered by a fallback instead of the model.", ("reason",),
+))
+REJECTED = registry.register(Counter(
+    "qa_rejected_total", "Requests rejected with 429 (rate limit or admission queue).",
+    ("reason",),
+))
+TOKENS = registry.register(Counter(
+    "qa_tokens_total", "OpenAI token usage from completion.usage.",
+    ("company_id", "model", "kind"),
+))
+HTTP_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "path", "status"),
+))
+
+
+def process_memory() -> dict:
+    """
+    Memory of this process in bytes: rss, plus pss/uss on Linux (pss splits
+    copy-on-write pages shared with the master/other workers fairly, so
+    summing pss across workers gives the real pod footprint).
+    """
+    out = {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        kb = lambda name: int(fields[name].split()[0]) * 1024
+        out["rss"] = kb("Rss")
+        out["pss"] = kb("Pss")
+        out["uss"] = kb("Private_Clean") + kb("Private_Dirty")
+    except (OSError, KeyError, ValueError):
+        pass
+    return out
+
+
+registry.register(CallbackMetric(
+    "process_resident_memory_bytes", "Resident memory of this worker.",
+    lambda: process_memory()["rss"]))
+registry.register(CallbackMetric(
+    "process_proportional_memory_bytes", "Proportional set size (shared pages split) of this worker.",
+    lambda: process_memory().get("pss", 0)))
+registry.register(CallbackMetric(
+    "process_pid", "PID of the worker that served this scrape.", os.getpid))
+
+
+@contextmanager
+def timed(stage: str, company_id: str = "", model: str = "") -> Iterator[None]:
+    """Record the duration of the enclosed block as one stage sample."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(
+            time.perf_counter() - start, stage=stage, company_id=company_id, model=model
+        )
+
+
+def record_usage(company_id: str, model: str, usage) -> None:
+    """Add a completion's usage (object or dict) to the token counters."""
+    if usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = get(kind)
+        if value:
+            TOKENS.inc(value, company_id=company_id, model=model, kind=kind.split("_")[0])
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                path=path,
+                status=str(status["code"]),
+            )
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from backend.services.answer_cache import normalize_question
+from backend.services.metrics import Counter, registry
+from backend.services.retrieval import tokenize
+
+
+# --------------------------------------------------------------------
+# Question-complexity router
+# --------------------------------------------------------------------
+# Picks a model tier per question, locally and in microseconds (no extra
+# LLM call): direct lookups ("who is the contact?") go to a small fast
+# model with a tight token limit, multi-part / reasoning questions ("how
+# should I sequence the Net 30 renegotiation given the Altus threat?") to
+# a larger one.
+#
+# Tiers (MODEL_TIERS, JSON) map a name to a model and its limits:
+#   {"fast":   {"model": "gpt-4o-mini", "max_tokens": 300},
+#    "strong": {"model": "gpt-4o",      "max_tokens": 600}}
+#
+# MODEL_ROUTER selects the classifier: "heuristic" (default) or "fixed"
+# (always MODEL_ROUTER_DEFAULT_TIER). Add classifiers to ROUTERS.
+
+DEFAULT_TIERS: Dict[str, dict] = {
+    "fast": {"model": "gpt-4o-mini", "max_tokens": 300},
+    "strong": {"model": "gpt-4o", "max_tokens": 600},
+}
+MODEL_TIERS: Dict[str, dict] = (
+    json.loads(os.environ["MODEL_TIERS"]) if os.getenv("MODEL_TIERS") else DEFAULT_TIERS
+)
+MODEL_ROUTER = os.getenv("MODEL_ROUTER", "heuristic")
+MODEL_ROUTER_DEFAULT_TIER = os.getenv("MODEL_ROUTER_DEFAULT_TIER", "fast")
+MODEL_ROUTER_STRONG_TIER = os.getenv("MODEL_ROUTER_STRONG_TIER", "strong")
+# score at or above which a question goes to the strong tier
+MODEL_ROUTER_THRESHOLD = float(os.getenv("MODEL_ROUTER_THRESHOLD", 2.0))
+
+# reasoning / planning cues: each adds 1 to the score
+_REASONING_RE = re.compile(
+    r"\b(why|how (should|can|do|would) (i|we)|should (i|we)|what if|strateg\w*|sequence|"
+    r"plan\w*|prioriti[sz]e|trade-?offs?|negotiat\w*|renegotiat\w*|compare|versus|vs|"
+    r"implications?|impact|approach|recommend\w*|best way)\b"
+)
+# clauses that tie several facts together: each adds 0.5
+_CONNECTIVE_RE = re.compile(
+    r"\b(given|considering|while|without|unless|because|but|and then|so that|in light of)\b"
+)
+_LONG_QUESTION_TERMS = 12
+
+
+@dataclass(frozen=True)
+class Route:
+    tier: str
+    model: str
+    max_tokens: Optional[int]
+    reason: str
+
+
+ROUTES = registry.register(Counter(
+    "qa_model_routes_total", "Questions routed to each model tier, by reason.", ("tier", "reason"),
+))
+
+
+def make_route(tier: str, reason: str) -> Route:
+    spec = MODEL_TIERS[tier]
+    return Route(tier, spec["model"], spec.get("max_tokens"), reason)
+
+
+def complexity_score(question: str) -> float:
+    """Cheap lexical estimate of how much reasoning a question needs."""
+    text = normalize_question(question)
+    score = float(len(_REASONING_RE.findall(text)))
+    score += 0.5 * len(_CONNECTIVE_RE.findall(text))
+    terms = len(tokenize(text))
+    if terms > _LONG_QUESTION_TERMS:
+        score += 1.0
+    if text.count("?") + text.count(";") > 0 or (" and " in text and terms > 8):
+        score += 0.5  # several questions / parts in one
+    return score
+
+
+def heuristic_router(question: str) -> Route:
+    score = complexity_score(question)
+    if score >= MODEL_ROUTER_THRESHOLD:
+        return make_route(MODEL_ROUTER_STRONG_TIER, "complex")
+    return make_route(MODEL_ROUTER_DEFAULT_TIER, "simple")
+
+
+def fixed_router(question: str) -> Route:
+    return make_route(MODEL_ROUTER_DEFAULT_TIER, "fixed")
+
+
+ROUTERS: Dict[str, Callable[[str], Route]] = {
+    "heuristic": heuristic_router,
+    "fixed": fixed_router,
+}
+
+
+def route(question: str) -> Route:
+    """Model tier for a question (recorded in qa_model_routes_total)."""
+    decision = ROUTERS[MODEL_ROUTER](question)
+    ROUTES.inc(tier=decision.tier, reason=decision.reason)
+    return decision
@@ -0,0 +1,421 @@
+"""
+Portfolio-wide structured queries over all accounts.
+
+An ingest step pulls a fixed set of structured fields out of every
+ACCOUNT_CONTEXT with local parsing rules (no LLM):
+
+    health_status / health_rank   "Status: Green turning Yellow" -> Yellow / 1
+    value_at_risk_eur             "ANNUAL VALUE AT RISK: ~€1.6M/year" -> 1600000.0
+    renewal_risk                  "Renewal risk: Medium." -> medium
+    payment_terms                 agreed terms, e.g. "Net 45"
+    requested_terms               what the customer asked for, e.g. "Net 30"
+    disputed_terms                requested != agreed and still open
+    key_contact / key_contact_role
+    competitors / competitor_threat
+
+and stores them column by column (one list per field, one row per
+account). Queries filter, sort and aggregate over the columns without
+touching account files, so thousands of accounts answer in milliseconds.
+The index is persisted to PORTFOLIO_INDEX_PATH and refreshed
+incrementally: only account files whose mtime changed are re-parsed.
+A refresh reads account files directly (not through the account LRU),
+builds new columns and swaps them in, so it can run in a worker thread
+while queries keep reading the previous columns.
+
+    python -m backend.services.portfolio            # refresh changed accounts
+    python -m backend.services.portfolio --force    # re-parse everything
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+PORTFOLIO_INDEX_PATH = os.getenv(
+    "PORTFOLIO_INDEX_PATH",
+    str(Path(__file__).resolve().parent.parent / "data" / "portfolio.json"),
+)
+PORTFOLIO_REFRESH_INTERVAL = float(os.getenv("PORTFOLIO_REFRESH_INTERVAL", 30.0))
+PORTFOLIO_MAX_LIMIT = int(os.getenv("PORTFOLIO_MAX_LIMIT", 10_000))
+
+# bump when the extraction rules change so persisted rows are re-parsed
+EXTRACTOR_VERSION = 1
+
+HEALTH_RANKS = {"green": 0, "yellow": 1, "amber": 2, "orange": 2, "red": 3}
+
+# column -> kind ("str", "num", "bool", "list"); the order is the row layout
+COLUMNS: Dict[str, str] = {
+    "company_id": "str",
+    "company_name": "str",
+    "health_status": "str",
+    "health_rank": "num",
+    "value_at_risk_eur": "num",
+    "renewal_risk": "str",
+    "payment_terms": "str",
+    "requested_terms": "str",
+    "disputed_terms": "list",
+    "key_contact": "str",
+    "key_contact_role": "str",
+    "competitors": "list",
+    "competitor_threat": "bool",
+}
+
+_VALUE_RE = re.compile(
+    r"^ANNUAL VALUE AT RISK:\s*~?\s*€\s*([\d.,]+)\s*([KkMm]?)", re.MULTILINE
+)
+_CONTACT_RE = re.compile(r"^KEY CONTACT:\s*([^(\n]+?)\s*(?:\(([^)]*)\))?\s*$", re.MULTILINE)
+_STATUS_RE = re.compile(r"^\s*-?\s*Status:\s*(.+)$", re.MULTILINE | re.IGNORECASE)
+_COLOR_RE = re.compile(r"\b(green|yellow|amber|orange|red)\b", re.IGNORECASE)
+_RENEWAL_RE = re.compile(r"Renewal risk:\s*(low|medium|high)", re.IGNORECASE)
+_NET_RE = re.compile(r"\bNet\s?(\d{1,3})\b")
+_AGREED_RE = re.compile(r"\b(agree\w*|accepted|in force|alignment|through)\b", re.IGNORECASE)
+_REQUESTED_RE = re.compile(r"\b(request\w*|pushed for|asked for|wants)\b", re.IGNORECASE)
+_OPEN_RE = re.compile(
+    r"not signed|no signed|no formal|under discussion|believes|in principle|"
+    r"basically agreed|not documented|diverge|revisit",
+    re.IGNORECASE,
+)
+_COMPETITOR_RE = re.compile(r"\bcompetitors?\s+((?:[A-Z][\w&.-]*\s?)+)")
+_SECTION_RE = re.compile(r"^([A-Z][A-Z /&'’,.\-]*(?:\([^)]*\))?):\s*$", re.MULTILINE)
+
+
+def _section(context: str, prefix: str) -> str:
+    """Body of the first section whose heading starts with prefix."""
+    headings = list(_SECTION_RE.finditer(context))
+    for i, match in enumerate(headings):
+        if match.group(1).startswith(prefix):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(context)
+            return context[match.end():end]
+    return ""
+
+
+def _euros(amount: str, unit: str) -> float:
+    value = float(amount.replace(",", ""))
+    return value * {"k": 1e3, "m": 1e6}.get(unit.lower(), 1.0)
+
+
+def extract_fields(company_id: str, company_name: str, context: str) -> Dict[str, Any]:
+    """One portfolio row from an account context (missing fields are None/empty)."""
+    row: Dict[str, Any] = {
+        "company_id": company_id,
+        "company_name": company_name,
+        "health_status": None,
+        "health_rank": None,
+        "value_at_risk_eur": None,
+        "renewal_risk": None,
+        "payment_terms": None,
+        "requested_terms": None,
+        "disputed_terms": [],
+        "key_contact": None,
+        "key_contact_role": None,
+        "competitors": [],
+        "competitor_threat": False,
+    }
+
+    match = _VALUE_RE.search(context)
+    if match:
+        row["value_at_risk_eur"] = _euros(*match.groups())
+
+    match = _CONTACT_RE.search(context)
+    if match:
+        row["key_contact"] = match.group(1).strip()
+        row["key_contact_role"] = (match.group(2) or "").strip() or None
+
+    health = _section(context, "RELATIONSHIP HEALTH") or context
+    match = _STATUS_RE.search(health)
+    if match:
+        # "Green turning Yellow" / "Green → light yellow": the last colour is current
+        colors = _COLOR_RE.findall(match.group(1))
+        if colors:
+            current = colors[-1].lower()
+            row["health_status"] = current.capitalize()
+            row["health_rank"] = HEALTH_RANKS[current]
+    match = _RENEWAL_RE.search(health)
+    if match:
+        row["renewal_risk"] = match.group(1).lower()
+
+    payment = _section(context, "PAYMENT") or context
+    for line in payment.splitlines():
+        terms = _NET_RE.findall(line)
+        if not terms:
+            continue
+        if row["requested_terms"] is None and _REQUESTED_RE.search(line):
+            row["requested_terms"] = f"Net {terms[0]}"
+        if row["payment_terms"] is None and _AGREED_RE.search(line):
+            row["payment_terms"] = f"Net {terms[0]}"
+    requested, agreed = row["requested_terms"], row["payment_terms"]
+    if requested and agreed and requested != agreed and _OPEN_RE.search(payment):
+        row["disputed_terms"] = [requested]
+
+    competitors = []
+    for name in _COMPETITOR_RE.findall(context):
+        name = name.strip().rstrip(".")
+        if name and name not in competitors:
+            competitors.append(name)
+    row["competitors"] = competitors
+    row["competitor_threat"] = bool(competitors)
+    return row
+
+
+# --------------------------------------------------------------------
+# Columnar index
+# --------------------------------------------------------------------
+def _contains(cell, value) -> bool:
+    if cell is None:
+        return False
+    if isinstance(cell, list):
+        return any(str(value).lower() == str(v).lower() for v in cell)
+    return str(value).lower() in str(cell).lower()
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _compare(op: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    def check(cell, value) -> bool:
+        return cell is not None and op(cell, value)
+    return check
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda cell, value: _lower(cell) == _lower(value),
+    "ne": lambda cell, value: _lower(cell) != _lower(value),
+    "in": lambda cell, values: _lower(cell) in {_lower(v) for v in values},
+    "gt": _compare(lambda a, b: a > b),
+    "gte": _compare(lambda a, b: a >= b),
+    "lt": _compare(lambda a, b: a < b),
+    "lte": _compare(lambda a, b: a <= b),
+    "contains": _contains,
+    "exists": lambda cell, value: (cell not in (None, [], "")) == bool(value),
+}
+
+AGGREGATES: Dict[str, Callable[[List[float]], Optional[float]]] = {
+    "count": lambda values: float(len(values)),
+    "sum": lambda values: float(sum(values)),
+    "avg": lambda values: sum(values) / len(values) if values else None,
+    "min": lambda values: min(values) if values else None,
+    "max": lambda values: max(values) if values else None,
+}
+
+
+class PortfolioQueryError(ValueError):
+    """Unknown field/operator or a value of the wrong type in a query."""
+
+
+class PortfolioIndex:
+    """
+    Columns of extracted account fields, one list per field, rows aligned
+    by position. mtime_ns/versions record what each row was parsed from.
+    """
+
+    def __init__(self, path: str = PORTFOLIO_INDEX_PATH):
+        self.path = Path(path)
+        self.columns: Dict[str, list] = {name: [] for name in COLUMNS}
+        self.mtime_ns: List[int] = []
+        self.rows: Dict[str, int] = {}  # company_id -> row
+        self.loaded = False
+        self.refreshed_at = 0.0
+        self.parsed = 0
+        self._lock = threading.RLock()  # one refresh at a time
+
+    def __len__(self) -> int:
+        return len(self.columns["company_id"])
+
+    # ---- persistence ---------------------------------------------------
+
+    def load(self) -> None:
+        self.loaded = True
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("extractor_version") != EXTRACTOR_VERSION or set(data["columns"]) != set(COLUMNS):
+            return
+        self.columns = data["columns"]
+        self.mtime_ns = data["mtime_ns"]
+        self.rows = {cid: i for i, cid in enumerate(self.columns["company_id"])}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "extractor_version": EXTRACTOR_VERSION,
+                "columns": self.columns,
+                "mtime_ns": self.mtime_ns,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # ---- ingest ---------------------------------------------------------
+
+    def refresh(self, accounts, force: bool = False) -> dict:
+        """
+        Bring the index in line with the account store: parse new and
+        changed account files, drop rows for accounts that went away.
+        """
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            index = accounts.entries()
+            changed = [
+                cid for cid, entry in index.items()
+                if force or cid not in self.rows or self.mtime_ns[self.rows[cid]] != entry.mtime_ns
+            ]
+            removed = [cid for cid in self.rows if cid not in index]
+
+            columns = {name: list(col) for name, col in self.columns.items()}
+            mtime_ns = list(self.mtime_ns)
+            rows = dict(self.rows)
+            for cid in changed:
+                account = accounts.read(cid, index[cid])
+                if account is None:
+                    continue
+                row = extract_fields(cid, account.company_name, account.account_context)
+                i = rows.get(cid)
+                if i is None:
+                    i = len(mtime_ns)
+                    rows[cid] = i
+                    for name in COLUMNS:
+                        columns[name].append(row[name])
+                    mtime_ns.append(account.mtime_ns)
+                else:
+                    for name in COLUMNS:
+                        columns[name][i] = row[name]
+                    mtime_ns[i] = account.mtime_ns
+                self.parsed += 1
+
+            if removed:
+                keep = [i for cid, i in sorted(rows.items(), key=lambda kv: kv[1]) if cid not in removed]
+                columns = {name: [col[i] for i in keep] for name, col in columns.items()}
+                mtime_ns = [mtime_ns[i] for i in keep]
+                rows = {cid: i for i, cid in enumerate(columns["company_id"])}
+
+            # queries read self.columns once, so swapping it last is enough
+            self.mtime_ns, self.rows, self.columns = mtime_ns, rows, columns
+            if changed or removed:
+                self.save()
+            self.refreshed_at = time.monotonic()
+            return {"accounts": len(self), "parsed": len(changed), "removed": len(removed)}
+
+    def _stale(self) -> bool:
+        return not self.loaded or time.monotonic() - self.refreshed_at >= PORTFOLIO_REFRESH_INTERVAL
+
+    def ensure_fresh(self, accounts) -> None:
+        """Refresh when due (blocking; call it from a worker thread in async code)."""
+        if self._stale():
+            with self._lock:
+                if self._stale():  # not already refreshed by the thread we waited for
+                    self.refresh(accounts)
+
+    # ---- queries --------------------------------------------------------
+
+    @staticmethod
+    def _column(columns: Dict[str, list], name: str) -> list:
+        if name not in columns:
+            raise PortfolioQueryError(f"unknown field {name!r}; fields: {', '.join(COLUMNS)}")
+        return columns[name]
+
+    def select(self, filters: Sequence[dict], columns: Optional[Dict[str, list]] = None) -> List[int]:
+        """Row positions matching every filter ({"field", "op", "value"})."""
+        columns = self.columns if columns is None else columns
+        matched = range(len(columns["company_id"]))
+        for f in filters:
+            op = OPERATORS.get(f.get("op", "eq"))
+            if op is None:
+                raise PortfolioQueryError(f"unknown op {f.get('op')!r}; ops: {', '.join(OPERATORS)}")
+            column = self._column(columns, f["field"])
+            value = f.get("value")
+            try:
+                matched = [i for i in matched if op(column[i], value)]
+            except TypeError as exc:
+                raise PortfolioQueryError(f"bad value for {f['field']!r}: {exc}") from None
+        return list(matched)
+
+    def query(
+        self,
+        filters: Sequence[dict] = (),
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = 100,
+        fields: Optional[Sequence[str]] = None,
+        aggregates: Sequence[dict] = (),
+        group_by: Optional[str] = None,
+    ) -> dict:
+        """
+        Filter, then aggregate over all matches (optionally per group_by
+        value) and return up to limit matching rows, sorted by sort_by.
+        """
+        snapshot = self.columns  # unaffected by a concurrent refresh
+        matched = self.select(filters, snapshot)
+        result: Dict[str, Any] = {"total": len(matched)}
+
+        if aggregates:
+            groups: Dict[Any, List[int]] = {None: matched}
+            if group_by:
+                column = self._column(snapshot, group_by)
+                groups = {}
+                for i in matched:
+                    # list fields: one group per element, a row counts in each
+                    keys = dict.fromkeys(column[i] or [None]) if COLUMNS[group_by] == "list" else (column[i],)
+                    for key in keys:
+                        groups.setdefault(key, []).append(i)
+            out = []
+            for key, rows in groups.items():
+                entry: Dict[str, Any] = {group_by: key} if group_by else {}
+                for agg in aggregates:
+                    fn = AGGREGATES.get(agg.get("op", ""))
+                    if fn is None:
+                        raise PortfolioQueryError(
+                            f"unknown aggregate {agg.get('op')!r}; aggregates: {', '.join(AGGREGATES)}"
+                        )
+                    field_name = agg.get("field") or "company_id"
+                    column = self._column(snapshot, field_name)
+                    values = [column[i] for i in rows if column[i] is not None]
+                    if agg["op"] != "count" and COLUMNS[field_name] != "num":
+                        raise PortfolioQueryError(f"{agg['op']} needs a numeric field, got {field_name!r}")
+                    entry[f"{agg['op']}_{field_name}"] = fn(values)
+                out.append(entry)
+            result["aggregates"] = out if group_by else out[0]
+
+        if sort_by:
+            column = self._column(snapshot, sort_by)
+            # rows without a value sort last either way
+            present = [i for i in matched if column[i] is not None]
+            missing = [i for i in matched if column[i] is None]
+            matched = sorted(present, key=lambda i: column[i], reverse=descending) + missing
+
+        names = list(fields) if fields else list(COLUMNS)
+        columns = [(name, self._column(snapshot, name)) for name in names]
+        limit = PORTFOLIO_MAX_LIMIT if limit is None else min(max(limit, 0), PORTFOLIO_MAX_LIMIT)
+        result["rows"] = [{name: col[i] for name, col in columns} for i in matched[:limit]]
+        return result
+
+    def stats(self) -> dict:
+        return {"path": str(self.path), "accounts": len(self), "parsed": self.parsed}
+
+
+portfolio_index = PortfolioIndex()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build the portfolio index of structured account fields.")
+    parser.add_argument("--force", action="store_true", help="re-parse every account")
+    args = parser.parse_args(argv)
+
+    from backend.services.account_store import account_store
+
+    started = time.perf_counter()
+    report = portfolio_index.refresh(account_store, force=args.force)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,26 +1,32 @@
+import asyncio
 import os
-from typing import Dict
-from dotenv import load_dotenv
-from openai import OpenAI
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from openai import NOT_GIVEN
 
-# load env so OPENAI_API_KEY is available
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# ---- import all known account contexts here ----
-from backend.context import techparts_context, tacto_context, google_context, x_context, meta_context
-# in the future you'd also import altus_context, acme_context, etc.
+from backend.services.llm_client import get_client
+from backend.services.answer_cache import answer_cache, make_key
+from backend.services.retrieval import join_sections, select_context, select_sections
+from backend.services.account_store import account_store
+from backend.services.single_flight import single_flight
+from backend.services.rate_limit import admission
+from backend.services.upstream import DEADLINES, Deadline, DeadlineExceeded, call_with_deadline
+from backend.services import briefings, knowledge_graph, model_router
+from backend.services.model_router import Route
+from backend.services.session_store import (
+    SESSION_CONTEXT_TOKEN_BUDGET,
+    SESSION_CONTEXT_TOP_K,
+    SESSION_SUMMARY_MAX_TOKENS,
+    SUMMARY_PROMPT,
+    Session,
+    schedule_compaction,
+    session_store,
+)
+from backend.services.metrics import ERRORS, FALLBACKS, STAGE_SECONDS, record_usage, timed
 
-# registry maps company_id -> the module (so we can scale)
-ACCOUNT_REGISTRY: Dict[str, object] = {
-    techparts_context.COMPANY_ID: techparts_context,
-    tacto_context.COMPANY_ID: tacto_context,
-    google_context.COMPANY_ID: google_context,
-    x_context.COMPANY_ID: x_context,
-    meta_context.COMPANY_ID: meta_context,
-}
+# registry maps company_id -> Account, loaded on demand from the
+# account files in backend/context/ (see account_store.py)
+ACCOUNT_REGISTRY = account_store
 
 
 SYSTEM_PROMPT = (
@@ -33,41 +39,551 @@ SYSTEM_PROMPT = (
 )
 
 
-def generate_answer(question: str, company_id: str) -> str:
+# answers use the tier picked per question by model_router; MODEL is
+# for internal calls (session summaries)
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.2
+
+UNKNOWN_ACCOUNT_ANSWER = (
+    "I don't have memory for that account yet. "
+    "Why this matters: this relationship hasn't been ingested into the system."
+)
+
+
+def _account_block(company_name: str, account_context: str) -> str:
+    return f"ACCOUNT NAME: {company_name}\n\nACCOUNT CONTEXT:\n{account_context}"
+
+
+def build_messages(question: str, company_id: str) -> Optional[List[dict]]:
     """
-    Given a user's question and the selected company_id,
-    return an answer using that account's memory file.
+    Build the chat messages for a question about company_id.
+    Returns None if the account is unknown.
     """
 
-    # 1. resolve company module
-    company_module = ACCOUNT_REGISTRY.get(company_id)
-    if company_module is None:
-        # This is graceful fallback for unknown companies
-        return (
-            "I don't have memory for that account yet. "
-            "Why this matters: this relationship hasn't been ingested into the system."
-        )
+    # 1. resolve account
+    account = ACCOUNT_REGISTRY.get(company_id)
+    if account is None:
+        return None
 
-    account_context = company_module.ACCOUNT_CONTEXT
-    company_name = getattr(company_module, "COMPANY_NAME", company_id)
+    # only the sections relevant to this question go into the prompt
+    account_context = select_context(account, question)
+    company_name = account.company_name
 
     # 2. build the user block for the model
     user_block = (
-        f"ACCOUNT NAME: {company_name}\n\n"
-        f"ACCOUNT CONTEXT:\n{account_context}\n\n"
+        f"{_account_block(company_name, account_context)}\n\n"
         f"QUESTION FROM NEW ACCOUNT OWNER:\n{question}\n\n"
         "Remember: ONLY answer using the account context above."
     )
 
-    # 3. call OpenAI
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_block},
-        ],
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_block},
+    ]
+
+
+def build_session_messages(question: str, account, session: Session) -> List[dict]:
+    """
+    Chat messages for a follow-up in a session, laid out as a stable prefix:
+
+        [system prompt][account context, frozen at first turn]
+        [summary of older turns][recent turns][this question]
+
+    Sections relevant to this question but not in the frozen block are
+    added to the last message only.
+    """
+    if session.context_version != account.version:
+        # first turn, or the account file changed: (re)freeze the context
+        preamble, sections = select_sections(
+            account, question, SESSION_CONTEXT_TOP_K, SESSION_CONTEXT_TOKEN_BUDGET
+        )
+        session.context_version = account.version
+        session.context_block = join_sections(preamble, sections)
+        session.pinned_sections = {s.position for s in sections}
+
+    extra = [
+        s for s in select_sections(account, question)[1]
+        if s.position not in session.pinned_sections
+    ]
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _account_block(account.company_name, session.context_block)},
+    ]
+    if session.summary:
+        messages.append({
+            "role": "user",
+            "content": f"SUMMARY OF THE EARLIER CONVERSATION:\n{session.summary}",
+        })
+    for previous_question, previous_answer in session.turns:
+        messages.append({"role": "user", "content": previous_question})
+        messages.append({"role": "assistant", "content": previous_answer})
+
+    tail = ""
+    if extra:
+        tail += "MORE ACCOUNT CONTEXT FOR THIS QUESTION:\n"
+        tail += "\n\n".join(s.text for s in extra) + "\n\n"
+    tail += (
+        f"QUESTION FROM NEW ACCOUNT OWNER:\n{question}\n\n"
+        "Remember: ONLY answer using the account context above."
     )
+    messages.append({"role": "user", "content": tail})
+    return messages
+
+
+def company_label(company_id: str) -> str:
+    """company_id as a metrics label; unknown ids collapse to "unknown"."""
+    return company_id if company_id in ACCOUNT_REGISTRY else "unknown"
+
 
-    answer = completion.choices[0].message.content.strip()
+def resolve_account(company_id: str):
+    """Account for company_id, or None (counted as a fallback)."""
+    with timed("registry_lookup", company_label(company_id)):
+        account = ACCOUNT_REGISTRY.get(company_id)
+    if account is None:
+        FALLBACKS.inc(reason="unknown_company")
+    return account
+
+
+def briefing_answer(question: str, account) -> Optional[str]:
+    """
+    Precomputed answer if the question matches a canonical intent and the
+    account's briefing is current. If the question matches an intent but
+    the briefing is missing or from an older context version, it is
+    generated in the background (this request goes live).
+    """
+    hit = briefings.lookup(question, account)
+    if hit is not None:
+        return hit[1]
+    briefings.schedule_regeneration(question, account, generate_live_answer)
+    return None
+
+
+async def graph_answer(question: str, account) -> Optional[Tuple[str, str]]:
+    """(kind, answer) for a direct factual lookup from the account's knowledge graph."""
+    with timed("graph_lookup", account.company_id):
+        return await knowledge_graph.answer_async(question, account.company_id)
+
+
+def _graph_hit(fact: Tuple[str, str]) -> str:
+    knowledge_graph.KG_HITS.inc(kind=fact[0])
+    return fact[1]
+
+
+async def generate_live_answer(question: str, company_id: str) -> str:
+    """Always ask the model (no briefing/cache); used to build briefings."""
+    messages = build_messages(question, company_id)
+    if messages is None:
+        return UNKNOWN_ACCOUNT_ANSWER
+    answer, _ = await _call_routed(question, messages, company_id, Deadline())
     return answer
+
+
+async def generate_answer(
+    question: str,
+    company_id: str,
+    deadline: Optional[Deadline] = None,
+    session_id: Optional[str] = None,
+    route: Optional[Route] = None,
+) -> str:
+    """Answer text of generate_routed_answer."""
+    answer, _ = await generate_routed_answer(question, company_id, deadline, session_id, route)
+    return answer
+
+
+async def generate_routed_answer(
+    question: str,
+    company_id: str,
+    deadline: Optional[Deadline] = None,
+    session_id: Optional[str] = None,
+    route: Optional[Route] = None,
+) -> Tuple[str, Optional[Route]]:
+    """
+    Given a user's question and the selected company_id,
+    return an answer using that account's memory file, and the model
+    route that produced it (None if no model was called for this request:
+    briefing, graph, cached or coalesced answers).
+    The upstream call (incl. retries/hedges) must finish within deadline.
+    With a session_id the question is answered as a follow-up in that
+    conversation (no answer cache / coalescing: answers depend on history).
+    route forces a model tier; otherwise it is picked by question
+    complexity right before the model call.
+    """
+    deadline = deadline or Deadline()
+    if session_id is not None:
+        return await _session_answer(question, company_id, session_id, deadline, route)
+
+    account = resolve_account(company_id)
+    if account is None:
+        # This is graceful fallback for unknown companies
+        return UNKNOWN_ACCOUNT_ANSWER, None
+
+    # entity / relationship lookups ("who is the key contact", "who is X
+    # related to") from the graph first: it has the people and the evidence
+    fact = await graph_answer(question, account)
+    if fact is not None and fact[0] in knowledge_graph.ENTITY_KINDS:
+        return _graph_hit(fact), None
+
+    # canonical handover questions: precomputed, no LLM round trip
+    briefing = briefing_answer(question, account)
+    if briefing is not None:
+        return briefing, None
+
+    # field lookups ("payment terms", "red flags for X") the briefing didn't answer
+    if fact is not None:
+        return _graph_hit(fact), None
+
+    key = make_key(company_id, question, account.version)
+    with timed("cache_lookup", company_id):
+        cached = await answer_cache.get(key)
+    if cached is not None:
+        return cached, None
+
+    # identical questions already in flight share one upstream call; each
+    # request waits only as long as its own deadline allows
+    leader = False
+
+    def complete():
+        nonlocal leader
+        leader = True
+        return _complete(question, company_id, key, deadline, route)
+
+    while True:
+        try:
+            answer, used = await single_flight.do(key, complete, deadline.check("coalesced"))
+        except asyncio.TimeoutError:
+            DEADLINES.inc(stage="coalesced")
+            raise DeadlineExceeded("deadline exceeded waiting for a coalesced answer") from None
+        except DeadlineExceeded:
+            # the leader's (shorter) deadline ran out: retry under ours
+            if leader or deadline.remaining() <= 0:
+                raise
+            continue
+        # coalesced onto another request's call: no model ran for this one
+        return answer, used if leader else None
+
+
+async def _complete(
+    question: str, company_id: str, key: str, deadline: Deadline, route: Optional[Route]
+) -> Tuple[str, Route]:
+    with timed("prompt_build", company_id):
+        messages = build_messages(question, company_id)
+
+    answer, route = await _call_routed(question, messages, company_id, deadline, route)
+    await answer_cache.set(key, answer)
+    return answer, route
+
+
+async def _session_answer(
+    question: str, company_id: str, session_id: str, deadline: Deadline, route: Optional[Route]
+) -> Tuple[str, Optional[Route]]:
+    account = resolve_account(company_id)
+    if account is None:
+        return UNKNOWN_ACCOUNT_ANSWER, None
+
+    session = session_store.get_or_create(session_id, company_id)
+    # one turn at a time per session, so turns stay in order
+    async with session.lock:
+        with timed("prompt_build", company_id):
+            messages = build_session_messages(question, account, session)
+        answer, route = await _call_routed(question, messages, company_id, deadline, route)
+        session.add_turn(question, answer)
+    schedule_compaction(session, _summarize)
+    return answer, route
+
+
+async def _call_routed(
+    question: str,
+    messages: List[dict],
+    company_id: str,
+    deadline: Deadline,
+    route: Optional[Route] = None,
+) -> Tuple[str, Route]:
+    """Route the question to a model tier (recorded only here) and call it."""
+    route = route or model_router.route(question)
+    answer = await _call_model(messages, company_id, deadline, route.max_tokens, route.model)
+    return answer, route
+
+
+async def _call_model(
+    messages: List[dict],
+    company_id: str,
+    deadline: Deadline,
+    max_tokens: Optional[int] = None,
+    model: str = MODEL,
+) -> str:
+    # 3. call OpenAI (shared async client, no threadpool slot held)
+    # at most LLM_MAX_INFLIGHT upstream calls at once (bounded queue)
+    async with admission.slot(deadline.check("admission")):
+        try:
+            with timed("llm", company_id, model):
+                completion = await call_with_deadline(
+                    lambda timeout: get_client().chat.completions.create(
+                        model=model,
+                        temperature=TEMPERATURE,
+                        messages=messages,
+                        max_tokens=NOT_GIVEN if max_tokens is None else max_tokens,
+                        timeout=timeout,
+                    ),
+                    deadline,
+                    # a hedge needs a free upstream slot of its own (never queues)
+                    hedge_slot=admission.try_acquire,
+                )
+        except Exception as exc:
+            ERRORS.inc(stage="llm", error=type(exc).__name__)
+            raise
+    record_usage(company_id, model, completion.usage)
+
+    return completion.choices[0].message.content.strip()
+
+
+async def _summarize(previous_summary: str, turns: List[Tuple[str, str]]) -> str:
+    """Model-written running summary for session compaction."""
+    transcript = "\n\n".join(f"Q: {q}\nA: {a}" for q, a in turns)
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"PREVIOUS SUMMARY:\n{previous_summary or '(none)'}\n\n"
+                f"NEW TURNS:\n{transcript}"
+            ),
+        },
+    ]
+    return await _call_model(
+        messages, "session_summary", Deadline(), max_tokens=SESSION_SUMMARY_MAX_TOKENS
+    )
+
+
+def _done_event(
+    company_id: str, answer: str, model, usage, source: str, tier: Optional[str] = None
+) -> dict:
+    """source: "model", "cache", "briefing", "graph" or "unknown_account"."""
+    return {
+        "type": "done",
+        "answer": answer,
+        "company_id": company_id,
+        "model": model,
+        "tier": tier,
+        "usage": usage,
+        "source": source,
+        "cached": source == "cache",
+    }
+
+
+async def stream_answer(
+    question: str,
+    company_id: str,
+    deadline: Optional[Deadline] = None,
+    session_id: Optional[str] = None,
+    route: Optional[Route] = None,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of generate_answer.
+
+    Yields {"type": "token", "delta": "..."} for every content chunk as it
+    arrives, then one {"type": "done", "answer": ..., ...} with the full
+    answer and metadata. Opening the stream is retried within deadline;
+    once tokens flow there are no retries or hedges.
+    """
+    deadline = deadline or Deadline()
+
+    if session_id is not None:
+        account = resolve_account(company_id)
+        if account is None:
+            yield {"type": "token", "delta": UNKNOWN_ACCOUNT_ANSWER}
+            yield _done_event(company_id, UNKNOWN_ACCOUNT_ANSWER, None, None, "unknown_account")
+            return
+        session = session_store.get_or_create(session_id, company_id)
+        async with session.lock:
+            with timed("prompt_build", company_id):
+                messages = build_session_messages(question, account, session)
+            async for event in _stream_model(messages, company_id, deadline, question, route):
+                if event["type"] == "done":
+                    session.add_turn(question, event["answer"])
+                yield event
+        schedule_compaction(session, _summarize)
+        return
+
+    account = resolve_account(company_id)
+    if account is None:
+        yield {"type": "token", "delta": UNKNOWN_ACCOUNT_ANSWER}
+        yield _done_event(company_id, UNKNOWN_ACCOUNT_ANSWER, None, None, "unknown_account")
+        return
+
+    # same precedence as generate_routed_answer
+    fact = await graph_answer(question, account)
+    briefing = None
+    if fact is None or fact[0] not in knowledge_graph.ENTITY_KINDS:
+        briefing = briefing_answer(question, account)
+    if briefing is not None:
+        direct, source = briefing, "briefing"
+    elif fact is not None:
+        direct, source = _graph_hit(fact), "graph"
+    else:
+        direct = source = None
+    if direct is not None:
+        yield {"type": "token", "delta": direct}
+        yield _done_event(company_id, direct, None, None, source)
+        return
+
+    key = make_key(company_id, question, account.version)
+    with timed("cache_lookup", company_id):
+        cached = await answer_cache.get(key)
+    if cached is not None:
+        yield {"type": "token", "delta": cached}
+        yield _done_event(company_id, cached, None, None, "cache")
+        return
+
+    with timed("prompt_build", company_id):
+        messages = build_messages(question, company_id)
+
+    async for event in _stream_model(messages, company_id, deadline, question, route):
+        if event["type"] == "done":
+            await answer_cache.set(key, event["answer"])
+        yield event
+
+
+async def _stream_model(
+    messages: List[dict],
+    company_id: str,
+    deadline: Deadline,
+    question: str,
+    route: Optional[Route] = None,
+) -> AsyncIterator[dict]:
+    route = route or model_router.route(question)
+    parts: List[str] = []
+    usage = None
+    model = route.model
+    async with admission.slot(deadline.check("admission")):
+        start = time.perf_counter()
+        try:
+            stream = await call_with_deadline(
+                lambda timeout: get_client().chat.completions.create(
+                    model=route.model,
+                    temperature=TEMPERATURE,
+                    messages=messages,
+                    max_tokens=NOT_GIVEN if route.max_tokens is None else route.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout,
+                ),
+                deadline,
+                hedge=False,
+            )
+
+            async for chunk in stream:
+                model = getattr(chunk, "model", None) or model
+                if getattr(chunk, "usage", None) is not None:
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens,
+                    }
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        STAGE_SECONDS.observe(
+                            time.perf_counter() - start,
+                            stage="llm_first_token", company_id=company_id, model=route.model,
+                        )
+                    parts.append(delta)
+                    yield {"type": "token", "delta": delta}
+        except Exception as exc:
+            ERRORS.inc(stage="llm", error=type(exc).__name__)
+            raise
+        finally:
+            STAGE_SECONDS.observe(
+                time.perf_counter() - start, stage="llm", company_id=company_id, model=route.model
+            )
+    record_usage(company_id, route.model, usage)
+
+    yield _done_event(company_id, "".join(parts).strip(), model, usage, "model", route.tier)
+
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 16))
+
+
+async def generate_answers_batch(
+    items: List[Tuple[str, str]],
+    max_concurrency: Optional[int] = None,
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Answer many (question, company_id) pairs concurrently, at most
+    max_concurrency upstream calls at a time.
+
+    Returns (answer, error) per item, in the same order as items;
+    one failing item never fails the batch.
+    """
+    limit = min(max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_one(question: str, company_id: str):
+        async with semaphore:
+            try:
+                # each item gets its own deadline once it starts running
+                return await generate_answer(question, company_id, Deadline()), None
+            except Exception as exc:
+                return None, f"{type(exc).__name__}: {exc}"
+
+    return await asyncio.gather(*(run_one(q, c) for q, c in items))
+
+
+# --------------------------------------------------------------------
+# Portfolio questions (map-reduce over accounts)
+# --------------------------------------------------------------------
+# Only for free-text questions the structured portfolio index can't
+# answer: the question is asked of every selected account (map, through
+# the batch path: cache/briefings/graph apply, bounded concurrency), then
+# one call on the strong tier combines the per-account answers (reduce).
+
+PORTFOLIO_MAP_MAX_ACCOUNTS = int(os.getenv("PORTFOLIO_MAP_MAX_ACCOUNTS", 50))
+PORTFOLIO_MAP_ANSWER_CHARS = int(os.getenv("PORTFOLIO_MAP_ANSWER_CHARS", 800))
+
+PORTFOLIO_REDUCE_PROMPT = (
+    "You are Relationship Memory, briefing leadership across a portfolio of accounts. "
+    "You are given one question and each account's answer to it. "
+    "ONLY use those answers. Name the accounts that matter, group similar "
+    "situations, and put the highest-risk accounts first. Answer in 6-10 sentences max."
+)
+
+
+def _company_name(company_id: str) -> str:
+    account = ACCOUNT_REGISTRY.get(company_id)
+    return account.company_name if account is not None else company_id
+
+
+async def generate_portfolio_answer(
+    question: str,
+    company_ids: List[str],
+    max_concurrency: Optional[int] = None,
+) -> Tuple[str, List[Tuple[str, Optional[str], Optional[str]]]]:
+    """
+    Answer a free-text question across accounts: (combined answer,
+    [(company_id, answer, error), ...] per account).
+    """
+    company_ids = company_ids[:PORTFOLIO_MAP_MAX_ACCOUNTS]
+    outcomes = await generate_answers_batch(
+        [(question, company_id) for company_id in company_ids], max_concurrency
+    )
+    per_account = [
+        (company_id, answer, error)
+        for company_id, (answer, error) in zip(company_ids, outcomes)
+    ]
+    answered = [(c, a) for c, a, _ in per_account if a is not None]
+    if not answered:
+        return "I cannot verify this from account history.", per_account
+
+    blocks = "\n\n".join(
+        f"ACCOUNT: {_company_name(c)} ({c})\n{a[:PORTFOLIO_MAP_ANSWER_CHARS]}"
+        for c, a in answered
+    )
+    messages = [
+        {"role": "system", "content": PORTFOLIO_REDUCE_PROMPT},
+        {"role": "user", "content": f"QUESTION:\n{question}\n\nPER-ACCOUNT ANSWERS:\n{blocks}"},
+    ]
+    route = model_router.make_route(model_router.MODEL_ROUTER_STRONG_TIER, "portfolio")
+    answer = await _call_model(messages, "portfolio", Deadline(), route.max_tokens, route.model)
+    return answer, per_account
@@ -0,0 +1,195 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+
+# --------------------------------------------------------------------
+# Rate limiting and admission control
+# --------------------------------------------------------------------
+# Two layers, both rejecting fast with 429 + Retry-After instead of
+# letting requests pile up:
+#
+#   1. Token buckets per company_id and per client (X-Client-Id header or
+#      client IP), checked at the endpoint before any work is done.
+#      Multi-account requests (/ask/batch, /portfolio/ask) charge every
+#      account they ask about.
+#   2. A global cap on in-flight upstream LLM calls with a bounded wait
+#      queue. Cache hits and coalesced requests never take a slot.
+#
+# A rate of 0 disables that bucket.
+
+RATE_LIMIT_COMPANY_RPS = float(os.getenv("RATE_LIMIT_COMPANY_RPS", 20))
+RATE_LIMIT_COMPANY_BURST = float(os.getenv("RATE_LIMIT_COMPANY_BURST", 40))
+RATE_LIMIT_CLIENT_RPS = float(os.getenv("RATE_LIMIT_CLIENT_RPS", 10))
+RATE_LIMIT_CLIENT_BURST = float(os.getenv("RATE_LIMIT_CLIENT_BURST", 30))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", 256))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 512))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10.0))
+LLM_OVERLOAD_RETRY_AFTER = float(os.getenv("LLM_OVERLOAD_RETRY_AFTER", 1.0))
+
+
+class RateLimited(Exception):
+    """Request rejected by a rate limit or the admission queue (-> HTTP 429)."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"rate limited ({reason}); retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """
+    Token buckets keyed by string, refilled lazily on check. Only
+    (tokens, last_refill) is stored per key; the least recently used keys
+    are dropped past max_keys (a dropped bucket simply starts full again).
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def _refill(self, key: str, now: float) -> float:
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - last) * self.rate)
+
+    def _store(self, key: str, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def _cost(self, cost: float) -> float:
+        # a cost above the burst could never be paid; it empties a full bucket instead
+        return min(cost, self.burst)
+
+    def retry_after(self, key: str, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available (0 if they are now); takes nothing."""
+        if self.rate <= 0:
+            return 0.0
+        tokens = self._refill(key, time.monotonic())
+        cost = self._cost(cost)
+        return 0.0 if tokens >= cost else (cost - tokens) / self.rate
+
+    def take(self, key: str, cost: float = 1.0) -> None:
+        """Take `cost` tokens unconditionally (after retry_after returned 0)."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._store(key, max(0.0, self._refill(key, now) - self._cost(cost)), now)
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens. Returns (allowed, retry_after_seconds)."""
+        retry_after = self.retry_after(key, cost)
+        if retry_after > 0:
+            return False, retry_after
+        self.take(key, cost)
+        return True, 0.0
+
+
+company_buckets = TokenBuckets(RATE_LIMIT_COMPANY_RPS, RATE_LIMIT_COMPANY_BURST)
+client_buckets = TokenBuckets(RATE_LIMIT_CLIENT_RPS, RATE_LIMIT_CLIENT_BURST)
+
+
+def check_rate_limits(client_id: str, *company_ids: str) -> None:
+    """
+    Raise RateLimited if the client or any of the companies is over its
+    rate. Each company is charged one token per occurrence (a batch with
+    three questions for one account costs that account three), the client
+    one per request. Nothing is charged unless every bucket allows it.
+    """
+    companies = Counter(c for c in company_ids if c is not None)
+    retry_after = client_buckets.retry_after(client_id)
+    if retry_after > 0:
+        raise RateLimited("client", retry_after)
+    retry_after = max((company_buckets.retry_after(c, n) for c, n in companies.items()), default=0.0)
+    if retry_after > 0:
+        raise RateLimited("company", retry_after)
+    client_buckets.take(client_id)
+    for company_id, n in companies.items():
+        company_buckets.take(company_id, n)
+
+
+class AdmissionController:
+    """
+    Global cap on concurrent upstream LLM calls. Up to max_queue callers
+    may wait (at most queue_timeout) for a slot; beyond that, callers are
+    rejected immediately.
+    """
+
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self.inflight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def check(self) -> None:
+        """Fail fast (without waiting) if a new call couldn't even queue."""
+        if self.inflight + self.queued >= self.max_inflight + self.max_queue:
+            self.rejected += 1
+            raise RateLimited("overloaded", LLM_OVERLOAD_RETRY_AFTER)
+
+    def has_capacity(self) -> bool:
+        """True if a call could start right now without queueing."""
+        return self.inflight < self.max_inflight
+
+    async def try_acquire(self) -> Optional[Callable[[], None]]:
+        """
+        Take a slot only if one is free right now and nobody is queued for
+        it (never waits): returns the function that releases it, else None.
+        """
+        if self._semaphore.locked() or self.queued:
+            return None
+        await self._semaphore.acquire()  # free: returns without suspending
+        self.inflight += 1
+        return self._release
+
+    def _release(self) -> None:
+        self.inflight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one upstream slot; wait at most min(queue_timeout, timeout)."""
+        self.check()
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited("queue_timeout", LLM_OVERLOAD_RETRY_AFTER)
+        finally:
+            self.queued -= 1
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+        }
+
+
+admission = AdmissionController(LLM_MAX_INFLIGHT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+
+def retry_after_header(retry_after: float) -> str:
+    """Retry-After takes whole seconds; never advertise 0."""
+    return str(max(1, math.ceil(retry_after)))
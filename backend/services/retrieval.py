@@ -0,0 +1,223 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+# --------------------------------------------------------------------
+# Section-level retrieval over ACCOUNT_CONTEXT
+# --------------------------------------------------------------------
+# Account contexts are written as headed sections:
+#
+#   ACCOUNT: TechParts GmbH          <- preamble (always sent)
+#   KEY CONTACT: Martin Vogel
+#
+#   PAYMENT TERMS HISTORY:           <- section heading
+#   - ...
+#
+# Each context is split into sections (long sections into chunks), indexed
+# once with BM25, and only the top-k sections for a question -- within a
+# token budget -- are put into the prompt.
+
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") not in ("0", "false", "False")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 4))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", 1500))
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", 400))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# A heading is a line in capitals ending with ':' and nothing after it,
+# e.g. "RED FLAGS TO WATCH:" or "COMMUNICATION PREFERENCES (Martin Vogel):"
+_HEADING_RE = re.compile(r"^[A-Z0-9][A-Z0-9 /&'’,.\-]*(\([^)]*\))?:\s*$")
+_TOKEN_RE = re.compile(r"[a-z0-9€%]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by did do does for from had has have how i "
+    "if in is it its me my of on or our so that the their them there they this "
+    "to us was we were what when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), no tokenizer needed."""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    terms = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        # crude plural folding: "terms" -> "term", "flags" -> "flag"
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        terms.append(tok)
+    return terms
+
+
+@dataclass
+class Section:
+    heading: str
+    text: str          # full text incl. heading line
+    position: int      # order in the original context
+    tokens: int = 0
+
+    def __post_init__(self):
+        self.tokens = estimate_tokens(self.text)
+
+
+def _chunk_section(heading: str, body_lines: List[str], start: int) -> List[Section]:
+    """Split an over-long section into chunks that each repeat the heading."""
+    chunks: List[Section] = []
+    current: List[str] = []
+    size = 0
+    for line in body_lines:
+        line_tokens = estimate_tokens(line)
+        if current and size + line_tokens > RETRIEVAL_CHUNK_TOKENS:
+            chunks.append(Section(heading, "\n".join([heading] + current), start + len(chunks)))
+            current, size = [], 0
+        current.append(line)
+        size += line_tokens
+    if current or not chunks:
+        chunks.append(Section(heading, "\n".join([heading] + current), start + len(chunks)))
+    return chunks
+
+
+def split_sections(account_context: str) -> Tuple[str, List[Section]]:
+    """
+    Split a context into (preamble, sections).
+    The preamble is everything before the first heading.
+    """
+    preamble_lines: List[str] = []
+    sections: List[Section] = []
+    heading = None
+    body: List[str] = []
+
+    def flush():
+        if heading is not None:
+            sections.extend(_chunk_section(heading, body, len(sections)))
+
+    for line in account_context.strip().splitlines():
+        if _HEADING_RE.match(line.strip()):
+            flush()
+            heading, body = line.strip(), []
+        elif heading is None:
+            preamble_lines.append(line)
+        elif line.strip():
+            body.append(line)
+    flush()
+
+    return "\n".join(preamble_lines).strip(), sections
+
+
+@dataclass
+class SectionIndex:
+    """BM25 index over one account's sections."""
+
+    preamble: str
+    sections: List[Section]
+    doc_terms: List[Counter] = field(default_factory=list)
+    idf: Dict[str, float] = field(default_factory=dict)
+    avgdl: float = 0.0
+
+    @classmethod
+    def build(cls, account_context: str) -> "SectionIndex":
+        preamble, sections = split_sections(account_context)
+        index = cls(preamble=preamble, sections=sections)
+        index.doc_terms = [Counter(tokenize(s.text)) for s in sections]
+        n_docs = len(sections)
+        lengths = [sum(c.values()) for c in index.doc_terms]
+        index.avgdl = (sum(lengths) / n_docs) if n_docs else 0.0
+        df: Counter = Counter()
+        for terms in index.doc_terms:
+            df.update(terms.keys())
+        index.idf = {
+            term: math.log(1 + (n_docs - freq + 0.5) / (freq + 0.5))
+            for term, freq in df.items()
+        }
+        return index
+
+    def scores(self, question: str) -> List[float]:
+        query = tokenize(question)
+        out = []
+        for terms in self.doc_terms:
+            dl = sum(terms.values())
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * dl / (self.avgdl or 1))
+            score = 0.0
+            for q in query:
+                tf = terms.get(q)
+                if tf:
+                    score += self.idf[q] * tf * (BM25_K1 + 1) / (tf + norm)
+            out.append(score)
+        return out
+
+    def select(self, question: str, top_k: int, token_budget: int) -> List[Section]:
+        """
+        Top-k sections by BM25 score that fit into token_budget, returned in
+        document order. With no lexical match at all (e.g. "summarize this
+        account") sections are taken in document order instead.
+        """
+        scores = self.scores(question)
+        if any(scores):
+            ranked = sorted(
+                (i for i, sc in enumerate(scores) if sc > 0),
+                key=lambda i: scores[i],
+                reverse=True,
+            )
+        else:
+            ranked = list(range(len(self.sections)))
+
+        chosen: List[Section] = []
+        used = estimate_tokens(self.preamble)
+        for i in ranked:
+            if len(chosen) >= top_k:
+                break
+            section = self.sections[i]
+            if used + section.tokens > token_budget:
+                continue
+            chosen.append(section)
+            used += section.tokens
+        return sorted(chosen, key=lambda s: s.position)
+
+
+def get_index(account) -> SectionIndex:
+    """
+    The account's BM25 index, built once when the account is first used
+    and kept on the Account itself (so it is dropped on eviction/reload).
+    """
+    index = account.extras.get("retrieval_index")
+    if index is None:
+        index = SectionIndex.build(account.account_context)
+        account.extras["retrieval_index"] = index
+    return index
+
+
+def select_sections(
+    account,
+    question: str,
+    top_k: int = RETRIEVAL_TOP_K,
+    token_budget: int = RETRIEVAL_TOKEN_BUDGET,
+) -> Tuple[str, List[Section]]:
+    """(preamble, top-k sections for question) for the account."""
+    index = get_index(account)
+    return index.preamble, index.select(question, top_k, token_budget)
+
+
+def join_sections(preamble: str, sections: List[Section]) -> str:
+    parts = [preamble] + [s.text for s in sections]
+    return "\n\n".join(p for p in parts if p)
+
+
+def select_context(account, question: str) -> str:
+    """
+    Return the part of the account's context to put in the prompt: the
+    preamble plus the most relevant sections for this question.
+    """
+    if not RETRIEVAL_ENABLED:
+        return account.account_context
+    if not get_index(account).sections:
+        return account.account_context
+    return join_sections(*select_sections(account, question))
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from backend.services.metrics import Counter, registry
+from backend.services.retrieval import estimate_tokens
+
+
+# --------------------------------------------------------------------
+# Chat sessions
+# --------------------------------------------------------------------
+# Server-side conversation state for /ask and /ask/stream when the
+# request carries a session_id. Per session we keep:
+#   - a context block frozen at the first turn (preamble + the sections
+#     retrieved for the opening question), so the prompt prefix
+#     [system prompt][account context] is byte-identical across turns and
+#     upstream prompt caching applies
+#   - a running summary of older turns plus the most recent turns verbatim
+#
+# Once the verbatim turns exceed SESSION_COMPACT_THRESHOLD_TOKENS, all but
+# the last SESSION_KEEP_RECENT_TURNS are folded into the summary (in the
+# background, after the answer has been returned), so the per-turn prompt
+# stays roughly constant however long the conversation runs.
+#
+# Sessions live in-process: LRU-bounded (SESSION_MAX_SESSIONS) and dropped
+# after SESSION_TTL seconds idle.
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", 3600))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 10_000))
+SESSION_COMPACT_THRESHOLD_TOKENS = int(os.getenv("SESSION_COMPACT_THRESHOLD_TOKENS", 1200))
+SESSION_KEEP_RECENT_TURNS = int(os.getenv("SESSION_KEEP_RECENT_TURNS", 2))
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", 300))
+SESSION_CONTEXT_TOP_K = int(os.getenv("SESSION_CONTEXT_TOP_K", 6))
+SESSION_CONTEXT_TOKEN_BUDGET = int(os.getenv("SESSION_CONTEXT_TOKEN_BUDGET", 2500))
+
+COMPACTIONS = registry.register(Counter(
+    "qa_session_compactions_total", "Session history compactions, by method.", ("method",),
+))
+
+
+@dataclass
+class Session:
+    session_id: str
+    company_id: str
+    summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (question, answer)
+    # frozen context block and the sections in it
+    context_version: Optional[str] = None
+    context_block: Optional[str] = None
+    pinned_sections: Set[int] = field(default_factory=set)
+    last_access: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    compacting: bool = False
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(q) + estimate_tokens(a) for q, a in self.turns)
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self.turns.append((question, answer))
+        self.last_access = time.monotonic()
+
+    def needs_compaction(self) -> bool:
+        return (
+            not self.compacting
+            and len(self.turns) > SESSION_KEEP_RECENT_TURNS
+            and self.history_tokens() > SESSION_COMPACT_THRESHOLD_TOKENS
+        )
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def get_or_create(self, session_id: str, company_id: str) -> Session:
+        """
+        Return the live session, or start a new one if it is unknown,
+        expired, or belonged to a different account.
+        """
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is not None and (
+            now - session.last_access > self.ttl or session.company_id != company_id
+        ):
+            session = None
+        if session is None:
+            session = Session(session_id=session_id, company_id=company_id)
+            self._sessions[session_id] = session
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        self._evict(now)
+        return session
+
+    def _evict(self, now: float) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        # oldest first: stop at the first session that is still fresh
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore()
+
+
+# --------------------------------------------------------------------
+# Compaction
+# --------------------------------------------------------------------
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a new account owner "
+    "and Relationship Memory, a handover assistant. Merge the previous summary and "
+    "the new turns into one updated summary. Keep facts, numbers, names, commitments "
+    "and open questions; drop pleasantries. At most 150 words, plain prose."
+)
+
+
+def _extractive_summary(previous: str, turns: List[Tuple[str, str]]) -> str:
+    """Fallback when the model is unavailable: first sentence of each answer."""
+    lines = [previous] if previous else []
+    for question, answer in turns:
+        first = answer.split(". ")[0].strip().rstrip(".")
+        lines.append(f"Q: {question} -> {first}.")
+    text = "\n".join(lines)
+    max_chars = SESSION_SUMMARY_MAX_TOKENS * 4
+    return text[-max_chars:]
+
+
+async def compact(session: Session, summarize) -> None:
+    """
+    Fold all but the most recent turns into session.summary.
+    `summarize(previous_summary, turns) -> str` calls the model; on any
+    failure an extractive summary is used instead.
+    """
+    if not session.needs_compaction():
+        return
+    session.compacting = True
+    try:
+        fold = session.turns[:-SESSION_KEEP_RECENT_TURNS] if SESSION_KEEP_RECENT_TURNS else list(session.turns)
+        try:
+            summary = await summarize(session.summary, fold)
+            COMPACTIONS.inc(method="model")
+        except Exception:
+            summary = _extractive_summary(session.summary, fold)
+            COMPACTIONS.inc(method="extractive")
+        # turns are only ever appended at the tail while we were away
+        session.summary = summary
+        del session.turns[: len(fold)]
+    finally:
+        session.compacting = False
+
+
+_background: Set[asyncio.Task] = set()
+
+
+def schedule_compaction(session: Session, summarize) -> None:
+    """Compact in the background so the current answer isn't delayed."""
+    if not session.needs_compaction():
+        return
+    task = asyncio.ensure_future(compact(session, summarize))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# --------------------------------------------------------------------
+# Single-flight request coalescing
+# --------------------------------------------------------------------
+# If an identical request (same key) is already waiting on OpenAI, later
+# arrivals attach to that pending call and share its result instead of
+# issuing a duplicate. Nothing is kept once the call finishes -- this is
+# not a cache, only burst de-duplication. Each caller waits at most its
+# own timeout; the call itself runs under the leader's (first caller's)
+# limits, so a follower whose budget outlasts a failed call can retry.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self.calls = 0       # upstream calls actually issued
+        self.coalesced = 0   # requests that joined an in-flight call
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """
+        fn()'s result, shared with every caller of the same key while it
+        runs. Raises asyncio.TimeoutError after timeout (the call goes on).
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # run as its own task so a cancelled caller (client disconnect)
+            # doesn't cancel the call for everyone else waiting on it
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()
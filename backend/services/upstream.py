@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+# takes a concurrency slot for a hedge without waiting: its release, or None
+HedgeSlot = Callable[[], Awaitable[Optional[Callable[[], None]]]]
+
+import openai
+
+from backend.services.metrics import Counter, registry
+
+T = TypeVar("T")
+
+
+# --------------------------------------------------------------------
+# Deadline-aware upstream LLM calls
+# --------------------------------------------------------------------
+# Every request carries a Deadline from the endpoint. Within it:
+#   - each attempt gets a per-request timeout of min(attempt cap, time left)
+#   - retryable errors (timeouts, connection errors, 429, 5xx) are retried
+#     with capped exponential backoff + full jitter while time remains
+#   - optionally, a hedge (second identical request) is fired if the first
+#     hasn't answered after the p-th percentile of recent latencies and a
+#     slot for it can be taken without waiting (hedge_slot); the first
+#     successful response wins and the other is cancelled
+# The SDK's own retries are disabled (see llm_client.py) so this is the
+# only retry layer.
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", 30.0))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", 20.0))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.2))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", 2.0))
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") in ("1", "true", "True")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.5))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", 500))
+
+RETRIES = registry.register(Counter(
+    "qa_llm_retries_total", "Upstream LLM retries, by error type.", ("error",),
+))
+HEDGES = registry.register(Counter(
+    "qa_llm_hedges_total", "Hedged upstream requests (fired, won, skipped).", ("outcome",),
+))
+DEADLINES = registry.register(Counter(
+    "qa_deadline_exceeded_total", "Requests that ran out of deadline budget.", ("stage",),
+))
+
+_RETRYABLE = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline ran out before an answer was produced (-> 504)."""
+
+
+class Deadline:
+    """Absolute point in (monotonic) time by which a request must finish."""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, stage: str) -> float:
+        """Return the time left, or raise DeadlineExceeded."""
+        left = self.remaining()
+        if left <= 0:
+            DEADLINES.inc(stage=stage)
+            raise DeadlineExceeded(f"deadline exceeded during {stage}")
+        return left
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, _RETRYABLE)
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for the hedge delay percentile."""
+
+    def __init__(self, size: int):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < 20:
+            return None  # not enough data to hedge sensibly yet
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+latency_window = LatencyWindow(LLM_HEDGE_WINDOW)
+
+
+def hedge_delay() -> Optional[float]:
+    p = latency_window.percentile(LLM_HEDGE_PERCENTILE)
+    return None if p is None else max(p, LLM_HEDGE_MIN_DELAY)
+
+
+async def _no_slot_needed() -> Callable[[], None]:
+    return lambda: None
+
+
+async def _hedged(
+    make_call: Callable[[float], Awaitable[T]],
+    timeout: float,
+    hedge_slot: HedgeSlot,
+) -> T:
+    """
+    One attempt; may fire a second identical request after hedge_delay(),
+    holding a slot from hedge_slot until it finishes (no free slot: no hedge).
+    """
+    delay = hedge_delay() if LLM_HEDGE_ENABLED else None
+    if delay is None or delay >= timeout:
+        return await make_call(timeout)
+
+    primary = asyncio.ensure_future(make_call(timeout))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return await primary
+        release = await hedge_slot()
+        if release is None:
+            HEDGES.inc(outcome="skipped")
+            return await primary
+
+        HEDGES.inc(outcome="fired")
+        hedge = asyncio.ensure_future(make_call(max(0.001, timeout - delay)))
+        # runs however the hedge ends, even if cancelled before it started
+        hedge.add_done_callback(lambda _: release())
+        tasks.append(hedge)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        HEDGES.inc(outcome="won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # the loser, or everything if the caller was cancelled / timed out
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_deadline(
+    make_call: Callable[[float], Awaitable[T]],
+    deadline: Deadline,
+    hedge_slot: HedgeSlot = _no_slot_needed,
+    hedge: bool = True,
+) -> T:
+    """
+    Run make_call(timeout) under the deadline with retries and optional
+    hedging. make_call must pass `timeout` on to the SDK request.
+    hedge_slot takes the concurrency slot a hedge runs in.
+    """
+    attempt = 0
+    while True:
+        left = deadline.check("llm")
+        timeout = min(LLM_ATTEMPT_TIMEOUT, left)
+        start = time.monotonic()
+        try:
+            if hedge:
+                result = await _hedged(make_call, timeout, hedge_slot)
+            else:
+                result = await make_call(timeout)
+            latency_window.add(time.monotonic() - start)
+            return result
+        except Exception as exc:
+            if not is_retryable(exc) or attempt >= LLM_MAX_RETRIES:
+                if deadline.remaining() <= 0 and is_retryable(exc):
+                    DEADLINES.inc(stage="llm")
+                    raise DeadlineExceeded("deadline exceeded waiting for the model") from exc
+                raise
+            backoff = random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * 2 ** attempt))
+            if backoff >= deadline.remaining():
+                DEADLINES.inc(stage="llm")
+                raise DeadlineExceeded("no deadline budget left to retry") from exc
+            RETRIES.inc(error=type(exc).__name__)
+            attempt += 1
+            await asyncio.sleep(backoff)
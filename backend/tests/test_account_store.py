@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+
+from backend.services.account_store import AccountStore
+
+
+def _write(directory, company_id, context="ctx", name=None):
+    path = directory / (name or f"{company_id}.json")
+    path.write_text(json.dumps({"company_id": company_id, "account_context": context}))
+    return path
+
+
+def _count_reads(monkeypatch):
+    import backend.services.account_store as module
+    reads = []
+    real = module._read_company_id
+
+    def counting(path):
+        reads.append(path.name)
+        return real(path)
+
+    monkeypatch.setattr(module, "_read_company_id", counting)
+    return reads
+
+
+def test_miss_probes_only_the_requested_files(monkeypatch, tmp_path):
+    for i in range(20):
+        _write(tmp_path, f"acct{i}")
+    store = AccountStore(str(tmp_path), check_interval=0)
+    reads = _count_reads(monkeypatch)
+
+    assert store.get("acct3").account_context == "ctx"
+    assert store.get("missing") is None
+    assert "acct7" in store and "missing" not in store
+    assert not store.indexed
+    assert set(reads) <= {"acct3.json", "acct7.json"}
+
+
+def test_changed_file_reloads_only_that_account(monkeypatch, tmp_path):
+    path = _write(tmp_path, "acme", "v1")
+    _write(tmp_path, "globex")
+    store = AccountStore(str(tmp_path), check_interval=0)
+    store.scan()
+    assert store.get("acme").account_context == "v1"
+    reads = _count_reads(monkeypatch)
+
+    _write(tmp_path, "acme", "v2")
+    os.utime(path, ns=(1, 1))
+    assert store.get("acme").account_context == "v2"
+    assert store.reloads == 1
+    assert reads == []
+
+
+def test_background_rescan_picks_up_other_file_names(tmp_path):
+    store = AccountStore(str(tmp_path), check_interval=0)
+    assert store.get("acme") is None
+    _write(tmp_path, "acme", name="acme_gmbh.json")
+    assert store.get("acme") is None  # not named after the id: needs a scan
+
+    asyncio.run(store.rescan())
+    assert store.get("acme").path.endswith("acme_gmbh.json")
+
+
+def test_rescan_drops_removed_accounts(tmp_path):
+    path = _write(tmp_path, "acme")
+    store = AccountStore(str(tmp_path), check_interval=60)
+    asyncio.run(store.rescan())
+    assert store.get("acme") is not None
+
+    path.unlink()
+    asyncio.run(store.rescan())
+    assert store.get("acme") is None
+    assert list(store) == []
+
+
+def test_read_does_not_touch_the_lru(tmp_path):
+    for company_id in ("a", "b", "c"):
+        _write(tmp_path, company_id)
+    store = AccountStore(str(tmp_path), cache_size=2)
+    store.scan()
+    store.get("a")
+    store.get("b")
+
+    assert store.read("c").company_id == "c"
+    assert list(store._cache) == ["a", "b"]
+    assert store.loads == 2
@@ -0,0 +1,74 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from backend.services import briefings, knowledge_graph, qa_service
+from backend.services.briefings import BriefingStore
+from backend.services.knowledge_graph import GraphStore
+
+ACCOUNT = SimpleNamespace(company_id="acme", company_name="Acme", version="v1")
+
+GRAPH = {
+    "entities": [
+        {"id": "acme", "name": "Acme GmbH", "label": "ORG", "payment": "Net 30"},
+        {"id": "martin_vogel", "name": "Martin Vogel", "label": "PERSON",
+         "information": "Key contact for procurement", "preferences": "Phone, mornings"},
+    ],
+    "relations": [
+        {"head": "martin_vogel", "rel": "WORKS_AT", "tail": "acme", "page": 2, "evidence": "..."},
+    ],
+}
+
+
+def _setup(monkeypatch, tmp_path):
+    (tmp_path / "graphs").mkdir()
+    (tmp_path / "graphs" / "acme.json").write_text(json.dumps(GRAPH))
+    monkeypatch.setattr(knowledge_graph, "graph_store", GraphStore(str(tmp_path / "graphs"), store_path=None))
+
+    store = BriefingStore(str(tmp_path / "briefings"))
+    answers = {intent: f"briefing:{intent}" for intent in briefings.intents}
+    store.put(ACCOUNT.company_id, ACCOUNT.version, answers)
+    monkeypatch.setattr(briefings, "briefing_store", store)
+
+    monkeypatch.setattr(qa_service, "resolve_account", lambda company_id: ACCOUNT)
+
+    async def no_model(*args, **kwargs):
+        raise AssertionError("the model must not be called")
+
+    monkeypatch.setattr(qa_service, "_call_model", no_model)
+
+
+def test_key_contact_question_reaches_graph(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    answer, route = asyncio.run(qa_service.generate_routed_answer("Who is the key contact?", "acme"))
+    assert answer.startswith("Key contact: Martin Vogel")
+    assert route is None
+
+
+def test_key_contact_question_reaches_graph_when_streaming(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+
+    async def collect():
+        return [e async for e in qa_service.stream_answer("Who is the key contact?", "acme")]
+
+    done = asyncio.run(collect())[-1]
+    assert done["type"] == "done"
+    assert done["answer"].startswith("Key contact: Martin Vogel")
+    assert done["source"] == "graph" and done["cached"] is False
+
+
+def test_canonical_field_question_prefers_briefing(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    answer, _ = asyncio.run(qa_service.generate_routed_answer("What are the payment terms?", "acme"))
+    assert answer == "briefing:payment_terms"
+
+
+def test_streamed_briefing_answer_reports_its_source(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+
+    async def collect():
+        return [e async for e in qa_service.stream_answer("What are the payment terms?", "acme")]
+
+    done = asyncio.run(collect())[-1]
+    assert done["answer"] == "briefing:payment_terms"
+    assert done["source"] == "briefing" and done["cached"] is False
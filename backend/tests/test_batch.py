@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import backend.main as main
+
+
+def test_batch_item_session_id_is_rejected():
+    client = TestClient(main.app)
+    response = client.post("/ask/batch", json={
+        "items": [{"question": "Red flags?", "company_id": "acme", "session_id": "s1"}],
+    })
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "items", 0, "session_id"]
+
+
+def test_batch_answers_items_in_order(monkeypatch):
+    async def answers(items, max_concurrency=None):
+        return [(f"{c}: {q}", None) for q, c in items]
+
+    monkeypatch.setattr(main, "generate_answers_batch", answers)
+    client = TestClient(main.app)
+    response = client.post("/ask/batch", json={
+        "items": [{"question": "a", "company_id": "acme"}, {"question": "b", "company_id": "globex"}],
+    })
+    assert response.status_code == 200
+    assert [r["answer"] for r in response.json()["results"]] == ["acme: a", "globex: b"]
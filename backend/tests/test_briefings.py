@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+from backend.services import briefings
+from backend.services.briefings import BriefingStore
+from backend.services.rate_limit import TokenBuckets
+
+ACCOUNT = SimpleNamespace(company_id="acme", company_name="Acme", version="v1")
+
+
+def _setup(monkeypatch, tmp_path, rate: float = 0):
+    store = BriefingStore(str(tmp_path), check_interval=0)
+    monkeypatch.setattr(briefings, "briefing_store", store)
+    monkeypatch.setattr(briefings, "company_buckets", TokenBuckets(rate, 100))
+    monkeypatch.setattr(briefings, "_failures", {})
+    monkeypatch.setattr(briefings, "_regenerating", set())
+    return store
+
+
+async def _answer(question: str, company_id: str) -> str:
+    return f"answer to {question}"
+
+
+async def _drain():
+    await asyncio.gather(*list(briefings._background))
+
+
+def test_store_picks_up_files_written_later(tmp_path):
+    store = BriefingStore(str(tmp_path), check_interval=0)
+    assert store.get("acme") is None
+    path = tmp_path / "acme.json"
+    path.write_text(json.dumps({"company_id": "acme", "version": "v1", "answers": {}}))
+    assert store.get("acme")["version"] == "v1"
+
+    path.write_text(json.dumps({"company_id": "acme", "version": "v2", "answers": {}}))
+    os.utime(path, ns=(1, 1))  # a different mtime, whatever the clock resolution
+    assert store.get("acme")["version"] == "v2"
+
+
+def test_matcher_routes_canonical_phrasings_only():
+    assert briefings.matcher.match("What are the payment terms?") == "payment_terms"
+    assert briefings.matcher.match("Red flags?") == "red_flags"
+    assert briefings.matcher.match("Summarize the last quarterly business review") is None
+
+
+def test_no_regeneration_for_questions_without_an_intent(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+
+    async def run():
+        return briefings.schedule_regeneration("Summarize the last QBR", ACCOUNT, _answer)
+
+    assert asyncio.run(run()) is False
+    assert not os.listdir(tmp_path)
+
+
+def test_missing_briefing_is_generated_for_a_matching_question(monkeypatch, tmp_path):
+    store = _setup(monkeypatch, tmp_path)
+
+    async def run():
+        started = briefings.schedule_regeneration("What are the payment terms?", ACCOUNT, _answer)
+        await _drain()
+        return started
+
+    assert asyncio.run(run()) is True
+    record = store.get("acme")
+    assert record["version"] == "v1"
+    assert set(record["answers"]) == set(briefings.intents)
+    assert briefings.lookup("What are the payment terms?", ACCOUNT)[0] == "payment_terms"
+
+
+def test_regeneration_is_charged_to_the_account_rate_limit(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, rate=1)
+    briefings.company_buckets.try_acquire("acme", cost=100)  # bucket empty
+
+    async def run():
+        return briefings.schedule_regeneration("What are the payment terms?", ACCOUNT, _answer)
+
+    assert asyncio.run(run()) is False
+
+
+def test_failed_regeneration_backs_off(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    calls = []
+
+    async def failing(question: str, company_id: str) -> str:
+        calls.append(question)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        assert briefings.schedule_regeneration("What are the payment terms?", ACCOUNT, failing)
+        await _drain()
+        # retried only once the backoff has passed
+        return briefings.schedule_regeneration("What are the payment terms?", ACCOUNT, failing)
+
+    assert asyncio.run(run()) is False
+    failures, retry_at = briefings._failures["acme"]
+    assert failures == 1 and retry_at > 0
+    assert len(calls) == len(briefings.intents)
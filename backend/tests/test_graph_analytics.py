@@ -0,0 +1,103 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("networkx")
+pytest.importorskip("numpy")
+pytest.importorskip("pyvis")
+
+import backend.main as main  # noqa: E402
+from backend.kg import analytics  # noqa: E402
+from backend.kg.store import GraphDB  # noqa: E402
+from backend.services.graph_analytics import AnalyticsStore  # noqa: E402
+
+
+def _account(company_id: str, people: int) -> dict:
+    org = f"{company_id}_org"
+    return {
+        "entities": [{"id": org, "name": f"{company_id.title()} GmbH", "label": "ORG"}]
+        + [{"id": f"{company_id}_p{i}", "name": f"Person{i} {company_id.title()}", "label": "PERSON"}
+           for i in range(people)],
+        "relations": [
+            {"head": f"{company_id}_p{i}", "rel": "WORKS_AT", "tail": org, "page": 1}
+            for i in range(people)
+        ],
+    }
+
+
+def _ingest(db: GraphDB, company_id: str, people: int) -> None:
+    db.upsert_document(f"{company_id}.pdf", _account(company_id, people), company_id,
+                       f"{company_id}.pdf", f"{company_id}-{people}")
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    db = GraphDB(str(tmp_path / "graph.db"))
+    for company_id in ("acme", "globex"):
+        _ingest(db, company_id, 5)
+    out = tmp_path / "analytics"
+    analytics.run(db, str(out))
+    monkeypatch.setattr(main, "analytics_store", AnalyticsStore(str(out), check_interval=0))
+    return db, out, TestClient(main.app)
+
+
+def test_account_analytics(served):
+    _, _, client = served
+    response = client.get("/accounts/acme/graph")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["center"]["id"] == "acme_org"
+    assert data["stats"]["nodes"] == 6
+    assert len(data["top_people"]) == 5
+    assert client.get("/accounts/unknown/graph").status_code == 404
+
+
+def test_revalidation_returns_304(served):
+    _, _, client = served
+    etag = client.get("/accounts/acme/graph").headers["etag"]
+    assert client.get("/accounts/acme/graph", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/accounts/acme/graph", headers={"If-None-Match": "W/" + etag}).status_code == 304
+
+
+def test_gzip_and_identity_have_their_own_etags(served):
+    _, _, client = served
+    zipped = client.get("/accounts/acme/graph/viewer", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/accounts/acme/graph/viewer", headers={"Accept-Encoding": "identity"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["etag"] != plain.headers["etag"]
+    assert zipped.json() == plain.json()
+    revalidate = {"Accept-Encoding": "identity", "If-None-Match": zipped.headers["etag"]}
+    assert client.get("/accounts/acme/graph/viewer", headers=revalidate).status_code == 200
+
+
+def test_files_are_content_addressed(served):
+    _, out, _ = served
+    manifest = json.loads((out / "manifest.json").read_text())
+    for kind, name in manifest["acme"]["files"].items():
+        body = (out / "accounts" / name).read_bytes()
+        assert analytics._etag(out / "accounts" / name) == manifest["acme"][kind]
+        assert manifest["acme"][kind] in name
+        if kind == "graph":
+            assert json.loads(gzip.decompress(body))["details"] == "details"
+
+
+def test_rerun_updates_etags_and_drops_deleted_accounts(served):
+    db, out, client = served
+    before = client.get("/accounts/acme/graph").headers["etag"]
+    _ingest(db, "acme", 8)
+    db.delete_document("globex.pdf")
+    analytics.run(db, str(out))
+
+    after = client.get("/accounts/acme/graph")
+    assert after.headers["etag"] != before
+    assert after.json()["stats"]["nodes"] == 9
+    assert client.get("/accounts/globex/graph").status_code == 404
+
+
+def test_company_subset_keeps_other_accounts(served):
+    db, out, client = served
+    analytics.run(db, str(out), company_ids=["acme"])
+    assert client.get("/accounts/globex/graph").status_code == 200
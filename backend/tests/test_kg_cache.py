@@ -0,0 +1,15 @@
+import json
+
+from backend.kg.cache import ExtractionCache
+
+
+def test_upload_ids_are_bounded_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_uploads=2)
+    cache.put_upload("a", "file-a")
+    cache.put_upload("b", "file-b")
+    assert cache.get_upload("a") == "file-a"  # now the most recent
+    cache.put_upload("c", "file-c")
+
+    assert cache.get_upload("b") is None
+    assert json.loads((tmp_path / "uploads.json").read_text()) == {"a": "file-a", "c": "file-c"}
+    assert ExtractionCache(str(tmp_path)).get_upload("c") == "file-c"
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from backend.kg import store
+from backend.kg.store import GraphDB, graph_db
+from backend.services.knowledge_graph import GraphStore
+
+
+def _doc(company_id: str, i: int) -> dict:
+    org = f"{company_id}_org"
+    person = f"{company_id}_p{i}"
+    return {
+        "entities": [
+            {"id": org, "name": f"{company_id.title()} GmbH", "label": "ORG"},
+            {"id": person, "name": f"Person{i} {company_id.title()}", "label": "PERSON"},
+        ],
+        "relations": [{"head": person, "rel": "WORKS_AT", "tail": org, "page": i}],
+    }
+
+
+def _ingest(db: GraphDB, company_id: str, docs: int) -> None:
+    for i in range(docs):
+        db.upsert_document(f"{company_id}-{i}.pdf", _doc(company_id, i), company_id)
+
+
+def test_company_graph_chunks_document_ids(monkeypatch, tmp_path):
+    db = GraphDB(str(tmp_path / "graph.db"))
+    _ingest(db, "acme", 5)
+    _ingest(db, "globex", 2)
+    chunk_sizes = []
+    chunks = store._chunks
+
+    def small_chunks(items, size=2):
+        chunk_sizes.append(len(items))
+        return chunks(items, size)
+
+    monkeypatch.setattr(store, "_chunks", small_chunks)
+    graph = db.company_graph("acme")
+    assert len(graph["entities"]) == 6
+    assert [r["page"] for r in graph["relations"]] == [0, 1, 2, 3, 4]
+    assert chunk_sizes and chunk_sizes[0] == 5
+    assert db.company_graph("initech") is None
+
+
+def test_graph_db_is_shared_per_path(tmp_path):
+    assert graph_db(str(tmp_path / "missing.db")) is None
+    GraphDB(str(tmp_path / "a.db"))
+    GraphDB(str(tmp_path / "b.db"))
+    a, b = graph_db(str(tmp_path / "a.db")), graph_db(str(tmp_path / "b.db"))
+    assert a is not b
+    assert graph_db(str(tmp_path / "a.db")) is a
+
+
+def test_async_lookup_reads_the_store_off_the_event_loop(monkeypatch, tmp_path):
+    path = str(tmp_path / "graph.db")
+    _ingest(GraphDB(path), "acme", 2)
+    graphs = GraphStore(str(tmp_path / "graphs"), check_interval=0, store_path=path)
+    threads = []
+    version = GraphDB.company_version
+
+    def recording(self, company_id):
+        threads.append(threading.current_thread())
+        return version(self, company_id)
+
+    monkeypatch.setattr(GraphDB, "company_version", recording)
+
+    async def lookup():
+        first = await graphs.aget("acme")
+        again = await graphs.aget("acme")
+        return first, again
+
+    first, again = asyncio.run(lookup())
+    assert len(first.entities) == 3
+    assert again is first and graphs.loads == 1
+    assert threads and threading.main_thread() not in threads
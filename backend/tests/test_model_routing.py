@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.services import model_router, qa_service
+
+ACCOUNT = SimpleNamespace(company_id="acme", company_name="Acme", version="v1")
+COMPLEX = "How should we sequence the Net 30 renegotiation given the competitor threat?"
+
+
+def _routes():
+    return sum(model_router.ROUTES._values.values())
+
+
+def _setup(monkeypatch, cached=None):
+    class Cache:
+        async def get(self, key):
+            return cached
+
+        async def set(self, key, value):
+            pass
+
+    async def no_graph(question, account):
+        return None
+
+    calls = []
+
+    async def call_model(messages, company_id, deadline, max_tokens=None, model=qa_service.MODEL):
+        calls.append((model, max_tokens))
+        return f"answer from {model}"
+
+    monkeypatch.setattr(qa_service, "resolve_account", lambda company_id: ACCOUNT)
+    monkeypatch.setattr(qa_service, "build_messages", lambda question, company_id: [])
+    monkeypatch.setattr(qa_service, "graph_answer", no_graph)
+    monkeypatch.setattr(qa_service, "briefing_answer", lambda question, account: None)
+    monkeypatch.setattr(qa_service, "answer_cache", Cache())
+    monkeypatch.setattr(qa_service, "_call_model", call_model)
+    return calls
+
+
+def test_complexity_picks_the_tier():
+    assert model_router.heuristic_router("Who is the key contact?").tier == "fast"
+    assert model_router.heuristic_router(COMPLEX).tier == "strong"
+
+
+def test_model_call_uses_the_routed_tier(monkeypatch):
+    calls = _setup(monkeypatch)
+    before = _routes()
+    answer, route = asyncio.run(qa_service.generate_routed_answer(COMPLEX, "acme"))
+    strong = model_router.MODEL_TIERS["strong"]
+    assert route.tier == "strong"
+    assert calls == [(strong["model"], strong["max_tokens"])]
+    assert answer == f"answer from {strong['model']}"
+    assert _routes() == before + 1
+
+
+def test_cached_answer_is_not_routed(monkeypatch):
+    calls = _setup(monkeypatch, cached="cached answer")
+    before = _routes()
+    assert asyncio.run(qa_service.generate_routed_answer(COMPLEX, "acme")) == ("cached answer", None)
+    assert calls == [] and _routes() == before
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+
+from backend.services import portfolio
+from backend.services.account_store import AccountStore
+from backend.services.portfolio import PortfolioIndex
+
+CONTEXT = """RELATIONSHIP HEALTH:
+- Status: {status}
+ANNUAL VALUE AT RISK: ~€{value}M/year
+We compete with competitors {competitors}.
+"""
+
+
+def _write(directory, company_id, status="Green", value=1, competitors="Globex"):
+    path = directory / f"{company_id}.json"
+    context = CONTEXT.format(status=status, value=value, competitors=competitors)
+    path.write_text(json.dumps({"company_id": company_id, "account_context": context}))
+    return path
+
+
+def _setup(tmp_path, accounts=(("acme", "Red", 2, "Globex"), ("initech", "Green", 1, "Globex"))):
+    accounts_dir = tmp_path / "accounts"
+    accounts_dir.mkdir()
+    for company_id, status, value, competitors in accounts:
+        _write(accounts_dir, company_id, status, value, competitors)
+    store = AccountStore(str(accounts_dir), check_interval=0)
+    return store, PortfolioIndex(str(tmp_path / "portfolio.json"))
+
+
+def test_group_by_list_field_counts_each_element(tmp_path):
+    store, index = _setup(tmp_path)
+    index.refresh(store)
+    result = index.query(aggregates=[{"op": "count"}], group_by="competitors")
+    assert result["aggregates"] == [{"competitors": "Globex", "count_company_id": 2.0}]
+
+
+def test_refresh_reads_accounts_without_the_lru(tmp_path):
+    store, index = _setup(tmp_path)
+    index.refresh(store)
+    assert len(index) == 2
+    assert store.loads == 0 and not store._cache
+
+
+def test_refresh_reparses_only_changed_accounts(tmp_path):
+    store, index = _setup(tmp_path)
+    index.refresh(store)
+    path = _write(store.directory, "acme", status="Yellow")
+    os.utime(path, ns=(1, 1))
+
+    report = index.refresh(store)
+    assert report == {"accounts": 2, "parsed": 1, "removed": 0}
+    rows = index.query(filters=[{"field": "health_status", "value": "Yellow"}])["rows"]
+    assert [row["company_id"] for row in rows] == ["acme"]
+
+    (store.directory / "initech.json").unlink()
+    assert index.refresh(store)["removed"] == 1
+    assert index.query()["total"] == 1
+
+
+def test_concurrent_ensure_fresh_refreshes_once(monkeypatch, tmp_path):
+    store, index = _setup(tmp_path)
+    monkeypatch.setattr(portfolio, "PORTFOLIO_REFRESH_INTERVAL", 60.0)
+    calls = []
+    refresh = index.refresh
+    monkeypatch.setattr(index, "refresh", lambda accounts: calls.append(1) or refresh(accounts))
+
+    threads = [threading.Thread(target=index.ensure_fresh, args=(store,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(index) == 2
@@ -0,0 +1,45 @@
+import pytest
+
+from backend.services import rate_limit
+from backend.services.rate_limit import RateLimited, TokenBuckets, check_rate_limits
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    clients, companies = TokenBuckets(1, 5), TokenBuckets(1, 3)
+    monkeypatch.setattr(rate_limit, "client_buckets", clients)
+    monkeypatch.setattr(rate_limit, "company_buckets", companies)
+    return clients, companies
+
+
+def test_bucket_allows_a_burst_then_reports_retry_after():
+    bucket = TokenBuckets(rate=2, burst=2)
+    assert bucket.try_acquire("acme") == (True, 0.0)
+    assert bucket.try_acquire("acme") == (True, 0.0)
+    allowed, retry_after = bucket.try_acquire("acme")
+    assert not allowed and 0 < retry_after <= 0.5
+    assert TokenBuckets(rate=0, burst=1).try_acquire("acme", cost=100) == (True, 0.0)
+
+
+def test_bucket_keys_are_bounded():
+    bucket = TokenBuckets(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        bucket.take(key)
+    assert list(bucket._buckets) == ["b", "c"]
+
+
+def test_multi_account_request_charges_every_account(buckets):
+    _, companies = buckets
+    check_rate_limits("client", "acme", "acme", "globex")
+    assert companies.retry_after("acme", 2) > 0  # 2 of 3 tokens used
+    assert companies.retry_after("globex", 2) == 0
+
+
+def test_rejected_request_charges_nothing(buckets):
+    clients, companies = buckets
+    companies.take("acme")
+    with pytest.raises(RateLimited) as exc:
+        check_rate_limits("client", "acme", "acme", "acme", "globex")
+    assert exc.value.reason == "company" and exc.value.retry_after > 0
+    assert clients.retry_after("client", 5) == 0
+    assert companies.retry_after("globex", 3) == 0
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import qa_service
+from backend.services.single_flight import SingleFlight
+from backend.services.upstream import Deadline, DeadlineExceeded
+
+ACCOUNT = SimpleNamespace(company_id="acme", company_name="Acme", version="v1")
+
+
+def test_identical_calls_share_one_run():
+    flight = SingleFlight()
+    runs = []
+
+    async def call():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", call) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["answer"] * 3
+    assert len(runs) == 1 and flight.coalesced == 2
+
+
+def test_follower_gives_up_at_its_own_timeout():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do("k", call, timeout=0.01)
+        return await leader  # unaffected by the follower giving up
+
+    assert asyncio.run(run()) == "answer"
+
+
+def test_follower_outlives_a_leader_with_a_shorter_deadline(monkeypatch):
+    class NoCache:
+        async def get(self, key):
+            return None
+
+    async def no_graph(question, account):
+        return None
+
+    async def complete(question, company_id, key, deadline, route):
+        if deadline.remaining() < 0.5:
+            await asyncio.sleep(deadline.remaining())
+            raise DeadlineExceeded("leader ran out")
+        return "answer", "route"
+
+    monkeypatch.setattr(qa_service, "resolve_account", lambda company_id: ACCOUNT)
+    monkeypatch.setattr(qa_service, "graph_answer", no_graph)
+    monkeypatch.setattr(qa_service, "briefing_answer", lambda question, account: None)
+    monkeypatch.setattr(qa_service, "answer_cache", NoCache())
+    monkeypatch.setattr(qa_service, "single_flight", SingleFlight())
+    monkeypatch.setattr(qa_service, "_complete", complete)
+
+    async def run():
+        leader = asyncio.ensure_future(qa_service.generate_routed_answer("Q?", "acme", Deadline(0.05)))
+        await asyncio.sleep(0)
+        follower = await qa_service.generate_routed_answer("Q?", "acme", Deadline(5))
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        return follower
+
+    # the follower re-ran the call under its own deadline, as the new leader
+    assert asyncio.run(run()) == ("answer", "route")
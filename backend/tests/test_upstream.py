@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.services import upstream
+from backend.services.rate_limit import AdmissionController
+from backend.services.upstream import Deadline, call_with_deadline
+
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    monkeypatch.setattr(upstream, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(upstream, "hedge_delay", lambda: 0.05)
+
+
+class Calls:
+    """make_call whose first call is slow and later calls fast."""
+
+    def __init__(self, slow: float = 1.0):
+        self.slow = slow
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self, timeout: float) -> str:
+        self.started += 1
+        n = self.started
+        try:
+            await asyncio.sleep(self.slow if n == 1 else 0.01)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"call {n}"
+
+
+def test_hedge_runs_in_its_own_admission_slot():
+    admission = AdmissionController(max_inflight=2, max_queue=0, queue_timeout=1)
+    calls = Calls()
+
+    async def run():
+        async with admission.slot():
+            result = await call_with_deadline(calls, Deadline(5), hedge_slot=admission.try_acquire)
+            await asyncio.sleep(0)  # let the hedge's done callback run
+            return result, admission.inflight
+
+    result, inflight = asyncio.run(run())
+    assert result == "call 2"
+    assert calls.cancelled == 1  # the slow primary
+    assert inflight == 1  # the hedge's slot was given back
+
+
+def test_no_hedge_without_a_free_slot():
+    admission = AdmissionController(max_inflight=1, max_queue=0, queue_timeout=1)
+    calls = Calls(slow=0.2)
+
+    async def run():
+        async with admission.slot():
+            return await call_with_deadline(calls, Deadline(5), hedge_slot=admission.try_acquire)
+
+    assert asyncio.run(run()) == "call 1"
+    assert calls.started == 1
+
+
+def test_cancelled_caller_cancels_both_requests():
+    admission = AdmissionController(max_inflight=2, max_queue=0, queue_timeout=1)
+    calls = Calls(slow=5)
+
+    async def slow_hedge(timeout: float) -> str:
+        return await calls(timeout) if calls.started == 0 else await asyncio.sleep(5)
+
+    async def run():
+        task = asyncio.ensure_future(
+            call_with_deadline(slow_hedge, Deadline(10), hedge_slot=admission.try_acquire)
+        )
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        return admission.inflight
+
+    assert asyncio.run(run()) == 0
+    assert calls.cancelled == 1
@@ -25,6 +25,8 @@ export default function RelationshipChatPanel({ companyId }: RelationshipChatPan
     },
   ]);
   const [question, setQuestion] = useState("");
+  // One server-side conversation per panel, so follow-ups keep context
+  const [sessionId] = useState(() => crypto.randomUUID());
   const [loading, setLoading] = useState(false);
 
   const handleSend = async () => {
@@ -39,36 +41,69 @@ export default function RelationshipChatPanel({ companyId }: RelationshipChatPan
     const thinkingMessage: Message = { from: "assistant", text: "Thinking..." };
     setMessages((prev) => [...prev, thinkingMessage]);
 
+    // Replace the last (assistant) message text
+    const setAssistantText = (text: string) => {
+      setMessages((prev) => {
+        const newMessages = [...prev];
+        newMessages[newMessages.length - 1] = { from: "assistant", text };
+        return newMessages;
+      });
+    };
+
     try {
-      const response = await fetch("http://localhost:8000/ask", {
+      const response = await fetch("http://localhost:8000/ask/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
           question: userMessage.text,
           company_id: contextualCompanyId,
+          session_id: sessionId,
         }),
       });
 
-      const data = await response.json();
-
-      // Replace thinking message with actual response
-      setMessages((prev) => {
-        const newMessages = [...prev];
-        newMessages[newMessages.length - 1] = {
-          from: "assistant",
-          text: data.answer,
-        };
-        return newMessages;
-      });
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      // Read Server-Sent Events: "event: <name>\ndata: <json>\n\n"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          let eventName = "message";
+          let data = "";
+          for (const line of rawEvent.split("\n")) {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          }
+          if (!data) continue;
+          const payload = JSON.parse(data);
+
+          if (eventName === "token") {
+            // Replace thinking message with the tokens received so far
+            answer += payload.delta;
+            setAssistantText(answer);
+          } else if (eventName === "done") {
+            setAssistantText(payload.answer);
+          } else if (eventName === "error") {
+            throw new Error(payload.detail);
+          }
+        }
+      }
     } catch (error) {
-      setMessages((prev) => {
-        const newMessages = [...prev];
-        newMessages[newMessages.length - 1] = {
-          from: "assistant",
-          text: "Sorry, I couldn't process your request right now.",
-        };
-        return newMessages;
-      });
+      setAssistantText("Sorry, I couldn't process your request right now.");
     } finally {
       setLoading(false);
     }
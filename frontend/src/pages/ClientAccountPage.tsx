@@ -711,8 +711,12 @@ export default function ClientAccountPage() {
 
             {/* iframe body */}
             <div className="flex-1 bg-background">
+              {/* the account's precomputed subgraph (backend /accounts/{id}/graph);
+                  falls back to the static full graph if it isn't available */}
               <iframe
-                src="/knowledge_graph.html"
+                src={`http://localhost:8000/graph-viewer/index.html?data=${encodeURIComponent(
+                  `http://localhost:8000/accounts/${encodeURIComponent(contextualKey)}/graph/viewer`
+                )}&fallback=${encodeURIComponent(`${window.location.origin}/knowledge_graph.html`)}`}
                 title="Knowledge Graph"
                 className="w-full h-full border-0"
               />